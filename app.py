@@ -2,6 +2,7 @@ from flask import Flask, request, session, jsonify
 from flask_cors import CORS
 import os
 import threading
+import uuid
 
 # Import our new modules
 from config.settings import Config
@@ -147,9 +148,17 @@ def api_chat():
         logger.info(f"[MODULAR_API] ⚡ Processing message: '{user_message[:50]}...' (optimized)")
         
         # Use the enhanced chat service with caching and response variation
-        answer, updated_session = chat_service.handle_question(user_message, dict(session))
+        # (continuing from any streamed turns, whose state lives server-side)
+        stream_key = session.get("stream_session_key")
+        cookie_session = dict(session)
+        turn_session = streaming_chat_service.session_store.load(stream_key, cookie_session) if stream_key else cookie_session
+        answer, updated_session = chat_service.handle_question(user_message, turn_session)
         
         # Update Flask session
+        if turn_session is not cookie_session:
+            # Continued from streamed turns - the cookie is stale, replace it outright
+            session.clear()
+            streaming_chat_service.session_store.discard(stream_key, updated_session.get("_history_version"))
         for key, value in updated_session.items():
             session[key] = value
         session.modified = True
@@ -220,7 +229,13 @@ def api_chat_stream():
         logger.info(f"[STREAMING] Processing question: {question}")
         
         # Create streaming response
-        generator = streaming_chat_service.stream_response(question, session)
+        # The generator runs after the request context (and the session cookie) is gone - the turn's
+        # session state is saved server-side under a key that goes out in the cookie now
+        stream_key = session.get("stream_session_key")
+        if not stream_key:
+            stream_key = session["stream_session_key"] = uuid.uuid4().hex
+        turn_session = streaming_chat_service.session_store.load(stream_key, dict(session))
+        generator = streaming_chat_service.stream_response(question, turn_session, stream_key)
         return StreamingResponseHandler.create_streaming_response(generator)
         
     except Exception as e:
@@ -21,6 +21,8 @@ class Config:
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     CHROMA_DB_PATH = os.path.join(BASE_DIR, "chroma_db")
     DATA_DIR = os.path.join(BASE_DIR, "data")
+    # Streamed-turn session state, shared by all worker processes on the host
+    STREAM_SESSION_DB_PATH = os.getenv("STREAM_SESSION_DB_PATH", os.path.join(BASE_DIR, "stream_sessions.db"))
     
     # Environment variables
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
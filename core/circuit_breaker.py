@@ -0,0 +1,65 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class CircuitBreaker:
+    """
+    Process-wide circuit breaker for an upstream API.
+    After fail_max consecutive failures the circuit opens and callers skip the upstream for
+    reset_timeout seconds; then a single trial call is let through (half-open) - success closes
+    the circuit again, anything else keeps it open for another period.
+    """
+
+    def __init__(self, name, fail_max=5, reset_timeout=30):
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        """Whether a call may go to the upstream now"""
+        if self._opened_at is None:
+            return True
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_timeout:
+                return False
+            # Half-open: this call is the trial - everyone else stays out for another period
+            self._opened_at = now
+            logger.info(f"[CIRCUIT_BREAKER] {self.name}: half-open - letting a trial call through")
+            return True
+
+    def record_success(self):
+        if self._opened_at is None and not self._failures:
+            return
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info(f"[CIRCUIT_BREAKER] {self.name}: ✅ closed again")
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.fail_max:
+                self._opened_at = time.monotonic()
+                logger.warning(f"[CIRCUIT_BREAKER] {self.name}: ⚠️ open for {self.reset_timeout}s "
+                               f"after {self._failures} consecutive failures")
+
+    def get_stats(self):
+        return {"name": self.name, "state": self.state, "consecutive_failures": self._failures}
@@ -0,0 +1,71 @@
+import io
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_POLL_INTERVAL = 30              # Seconds between status checks
+BATCH_MAX_WAIT = 24 * 3600 + 600      # Completion window plus some slack
+_BATCH_FINAL_STATES = ("completed", "failed", "expired", "cancelled")
+
+def run_chat_completion_batch(client, requests, poll_interval=BATCH_POLL_INTERVAL, max_wait=BATCH_MAX_WAIT):
+    """
+    Run chat completions through the OpenAI Batch API (half price, separate rate limits, up to 24h latency).
+    Only for offline jobs - replaying or evaluating stored conversations - never for live chat.
+
+    Args:
+        client: OpenAI client
+        requests: Mapping of custom_id -> chat.completions.create kwargs (model, messages, temperature, max_tokens)
+        poll_interval: Seconds between batch status checks
+        max_wait: Give up waiting after this many seconds (the batch keeps running server-side)
+
+    Returns:
+        Dict of custom_id -> answer text (None for requests that failed); empty if the batch did not complete
+    """
+    if not requests:
+        return {}
+
+    # One JSONL line per request, uploaded as an in-memory file
+    lines = (
+        json.dumps({"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}, ensure_ascii=False)
+        for custom_id, body in requests.items()
+    )
+    payload = io.BytesIO("\n".join(lines).encode("utf-8"))
+    input_file = client.files.create(file=("chat_batch.jsonl", payload), purpose="batch")
+
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW
+    )
+    logger.info(f"[BATCH_API] Submitted batch {batch.id} with {len(requests)} requests")
+
+    deadline = time.monotonic() + max_wait
+    while batch.status not in _BATCH_FINAL_STATES:
+        if time.monotonic() >= deadline:
+            logger.warning(f"[BATCH_API] Stopped waiting for batch {batch.id} (status: {batch.status})")
+            return {}
+        time.sleep(poll_interval)
+        batch = client.batches.retrieve(batch.id)
+
+    if batch.status != "completed" or not batch.output_file_id:
+        logger.error(f"[BATCH_API] ❌ Batch {batch.id} ended with status {batch.status}")
+        return {}
+
+    answers = dict.fromkeys(requests)
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        response = result.get("response") or {}
+        if result.get("error") or response.get("status_code") != 200:
+            logger.warning(f"[BATCH_API] Request {result.get('custom_id')} failed: {result.get('error') or response.get('status_code')}")
+            continue
+        answers[result["custom_id"]] = response["body"]["choices"][0]["message"]["content"].strip()
+
+    completed = sum(answer is not None for answer in answers.values())
+    logger.info(f"[BATCH_API] ✅ Batch {batch.id} completed: {completed}/{len(requests)} answers")
+    return answers
@@ -1,10 +1,49 @@
 import os
+import hashlib
 import logging
-from openai import OpenAI
+import threading
+import httpx
+from openai import OpenAI, DefaultHttpxClient
 from utils.token_utils import count_tokens, log_token_usage
 
 logger = logging.getLogger(__name__)
 
+# Idle connections survive the time a user spends reading a reply, so the next turn skips TCP+TLS setup
+KEEPALIVE_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=180)
+# Bounded SDK retries (exponential backoff with jitter, honours Retry-After) for 429 / 5xx / connection errors
+OPENAI_MAX_RETRIES = 2
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_cached_openai_client(api_key=None, base_url=None):
+    """
+    Process-wide OpenAI client per (api_key, base_url), so every service shares one keep-alive
+    connection pool. A new client opens its first connection in the background.
+    """
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    cache_key = hashlib.sha256(f"{api_key}|{base_url}".encode()).hexdigest()
+    client = _clients.get(cache_key)
+    if client is not None:
+        return client
+    
+    with _clients_lock:
+        client = _clients.get(cache_key)
+        if client is None:
+            client = OpenAI(api_key=api_key, base_url=base_url, max_retries=OPENAI_MAX_RETRIES,
+                            http_client=DefaultHttpxClient(limits=KEEPALIVE_LIMITS))
+            _clients[cache_key] = client
+            threading.Thread(target=_warmup_openai, args=(client,), name="openai-warmup", daemon=True).start()
+    return client
+
+def _warmup_openai(client):
+    """Establish the TCP+TLS connection before the first user message (a free models listing)"""
+    try:
+        client.models.list()
+        logger.info("[OPENAI] Connection pool warmed up")
+    except Exception as e:
+        logger.debug(f"[OPENAI] Warm-up request failed: {e}")
+
 class OpenAIClient:
     def __init__(self):
         self.client = self.get_client()
@@ -16,7 +55,7 @@ class OpenAIClient:
     def get_client(self):
         """Get OpenAI client"""
         try:
-            return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+            return get_cached_openai_client()
         except Exception as e:
             logger.error(f"Failed to initialize OpenAI client: {e}")
             raise
@@ -38,7 +77,7 @@ class OpenAIClient:
             
             # Log token usage
             token_count = count_tokens(messages, model)
-            log_token_usage(messages, model)
+            log_token_usage(messages, model, token_count=token_count)
             
             if token_count > 8000:  # Safety limit
                 logger.warning(f"Token count too high: {token_count}, truncating history")
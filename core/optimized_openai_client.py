@@ -1,9 +1,8 @@
-import os
 import logging
 import time
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
-from openai import OpenAI
+from core.openai_client import get_cached_openai_client
 from utils.token_utils import count_tokens, log_token_usage
 
 logger = logging.getLogger(__name__)
@@ -35,7 +34,7 @@ class OptimizedOpenAIClient:
     def get_client(self):
         """Get OpenAI client"""
         try:
-            return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+            return get_cached_openai_client()
         except Exception as e:
             logger.error(f"Failed to initialize OpenAI client: {e}")
             raise
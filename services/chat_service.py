@@ -1,19 +1,521 @@
 import logging
 import os
+import re
 import json
 import hashlib
+import threading
+import time
+import openai
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from config.settings import Config
+from core.openai_batch_jobs import run_chat_completion_batch
+from core.circuit_breaker import CircuitBreaker
 from utils.text_utils import detect_language, is_greeting, get_natural_greeting, is_small_talk
 from utils.validation_utils import detect_lead_info, is_vague_gpt_answer, detect_buying_intent
-from utils.token_utils import count_tokens, log_token_usage
+from utils.token_utils import count_tokens, log_token_usage_async, log_completion_usage, estimate_text_tokens
+from utils.phrase_matcher import PhraseMatcher
 from services.advanced_cache_service import AdvancedCacheService
+from services.semantic_cache import SemanticCache
+from services.knowledge_index import KnowledgeIndex
 from services.response_variation_service import ResponseVariationService
 from services.context_manager import context_manager
+from services.intent_service import IntentService
 from services.fast_response_service import fast_response_service
+from services.email_service import EmailService
+from utils.lead_parser import format_lead_notification, extract_lead_details
 
 logger = logging.getLogger(__name__)
 
+# Characters that close a sentence (Latin, Hebrew/Arabic and Devanagari punctuation)
+_SENTENCE_ENDINGS = ('!', '?', '.', ':', '।', '؟', '؛')
+
+# Adaptive completion budget: max_tokens follows an EWMA of the session's recent answer lengths
+_MAX_TOKENS_FLOOR = 120   # Never budget less, so a run of short answers can't truncate a long one
+_ANSWER_LENGTH_HEADROOM = 1.5
+_ANSWER_LENGTH_ALPHA = 0.3
+_HEBREW_CHARS = re.compile(r'[\u0590-\u05FF]')
+
+# Appended to the main prompt when the answer should also open lead collection
+_LEAD_REQUEST_INSTRUCTION = """
+
+The user is enthusiastic about the service. Keep the answer brief, then naturally ask for their
+full name, phone number and email so the team can start setting up their bot."""
+
+# Conversation history kept per session - prompts use at most the last 8 messages
+_MAX_HISTORY_MESSAGES = 16
+# Older user messages are folded into a short running summary instead of being resent verbatim
+_HISTORY_SUMMARY_ITEM_CHARS = 80
+_HISTORY_SUMMARY_MAX_CHARS = 400
+# History token budgets per prompt - paths that also carry retrieved context get less
+_CONTEXT_HISTORY_TOKEN_BUDGET = 1500
+_BASIC_HISTORY_TOKEN_BUDGET = 2500
+
+# Question embeddings kept per process - repeated and refined questions skip the embedding call
+_EMBEDDING_CACHE_SIZE = 2048
+
+# After a context violation, this many clean enhanced answers clear the session's violation-prone flag
+_VIOLATION_PRONE_TURNS = 3
+# Seconds to wait for a speculative correction before regenerating inline
+_SPECULATIVE_CORRECTION_TIMEOUT = 10
+
+# OpenAI failures worth tripping the breaker for - the SDK has already retried them with exponential backoff
+# (max_retries), so a second full GPT call would only double the wait and the spend
+_TRANSIENT_OPENAI_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+# Shared by every ChatService instance in the process: after 5 consecutive transient failures
+# answers skip OpenAI for 30s and get the static "try again shortly" reply instead
+_OPENAI_BREAKER = CircuitBreaker("openai", fail_max=5, reset_timeout=30)
+_OPENAI_UNAVAILABLE_MESSAGES = {
+    "he": "יש לנו כרגע תקלה זמנית. אפשר לנסות שוב בעוד כמה רגעים? 🙏",
+    "en": "We're having a temporary issue on our side. Could you try again in a few moments? 🙏"
+}
+
+# Short supporting replies (_generate_intelligent_response, templated lead confirmations) don't need the flagship model
+_HELPER_MODEL = "gpt-4o-mini"
+# One or two sentence replies get a tight generation budget; answers to the question keep 400
+_HELPER_MAX_TOKENS = {
+    "vague_input": 120,
+    "vague_gpt_response": 120,
+    "technical_error": 120,
+    "lead_request": 120,
+    "speak_to_someone": 120,
+}
+
+# Static bilingual reply used on the error path when there is no useful context to build on
+_STATIC_FALLBACK = {
+    "he": "מצטערת, נתקלתי בבעיה טכנית. אפשר לנסות שוב או לשלוח פרטים ואחזור אליך?",
+    "en": "Sorry, I hit a technical issue. Try again or share your details and I'll follow up."
+}
+
+# Pattern tables for the business / use-case / engagement detectors.
+# Raw tuples are kept for diagnostics; matching goes through one shared Aho-Corasick automaton.
+
+_BUSINESS_PATTERNS_HE = (
+    "יש לי חנות", "יש לי מסעדה", "יש לי קליניקה", "יש לי משרד", "יש לי עסק",
+    "אני עובד", "אני מנהל", "אני בעלים", "אני סוכן", "אני רופא", "אני עורך דין",
+    "חנות", "מסעדה", "קליניקה", "משרד", "בית מרקחת", "מרפאה", "סלון", "מכון כושר",
+    "נדל\"ן", "ביטוח", "רכב", "תכשיטים", "אופנה", "טכנולוגיה", "חינוך", "ייעוץ",
+    "אני עוסק", "אני עובד בתחום", "התחום שלי", "העסק שלי", "החברה שלי"
+)
+
+_BUSINESS_PATTERNS_EN = (
+    "i have a store", "i have a restaurant", "i have a clinic", "i have an office", "i have a business",
+    "i work in", "i manage", "i own", "i am a doctor", "i am a lawyer", "i am an agent",
+    "store", "restaurant", "clinic", "office", "pharmacy", "salon", "gym", "fitness",
+    "real estate", "insurance", "automotive", "jewelry", "fashion", "technology", "education", "consulting",
+    "my business", "my company", "my field", "our business", "our company"
+)
+
+_EDUCATION_PATTERNS = (
+    "מורה", "מלמד", "בית ספר", "תלמידים", "לימודים", "חומר לימודי", "נושא לימודי",
+    "מתמטיקה", "מדעים", "היסטוריה", "שפות", "כיתה", "חינוך", "אקדמיה", "אוניברסיטה",
+    "teacher", "teaching", "school", "students", "education", "learning material", "subject",
+    "mathematics", "science", "history", "languages", "classroom", "university", "academic"
+)
+
+_RECRUITMENT_PATTERNS = (
+    "מגייס עובדים", "גיוס עובדים", "מגייס אנשים", "מחפש עובדים", "רוצה לגייס",
+    "מקבל טלפונים", "מלא טלפונים", "הרבה טלפונים", "טלפונים ללא הפסקה",
+    "לסנן", "לסנן אנשים", "לסנן מועמדים", "סינון", "לא רלוונטי", "לא מתאים",
+    "recruiting", "hiring", "hr", "human resources", "filter candidates", "screen applicants",
+    "too many calls", "phone overload", "unqualified", "irrelevant candidates"
+)
+
+_RESTAURANT_PATTERNS = (
+    "מסעדה", "בר", "קפה", "אוכל", "תפריט", "הזמנות", "מקומות", "שולחנות",
+    "restaurant", "cafe", "bar", "food", "menu", "reservations", "tables", "booking"
+)
+
+_RETAIL_PATTERNS = (
+    "חנות", "קמעונאות", "מוצרים", "מלאי", "מבצעים", "קניות", "לקוחות",
+    "store", "retail", "shop", "products", "inventory", "sales", "customers", "shopping"
+)
+
+_REALESTATE_PATTERNS = (
+    "נדל\"ן", "דירות", "בתים", "השכרה", "מכירה", "נכסים", "סיורים",
+    "real estate", "apartments", "houses", "rental", "property", "tours", "listings"
+)
+
+_MEDICAL_PATTERNS = (
+    "קליניקה", "רופא", "מרפאה", "תורים", "חולים", "ביטוח", "טיפול",
+    "clinic", "doctor", "medical", "appointments", "patients", "insurance", "treatment"
+)
+
+_POSITIVE_PATTERNS_HE = (
+    "זה נשמע טוב", "זה מעניין", "אני מעוניין", "אני רוצה", "זה בדיוק מה שאני צריך",
+    "זה יכול לעזור", "זה נראה טוב", "אני אוהב את זה", "זה נהדר", "זה מושלם",
+    "כן", "בטח", "אפשר", "למה לא", "בואו ננסה", "אני רוצה לנסות",
+    # ✅ NEW: High excitement and satisfaction expressions
+    "אה וואו", "מהמם", "וואו", "איזה כיף", "זה מדהים", "פנטסטי", "מושלם",
+    "בדיוק מה שחיפשתי", "זה נראה מדהים", "אני נרגש", "אני מתרגש", "זה בטח יעזור לי",
+    "אני חייב את זה", "זה בדיוק מה שאני צריך", "זה יכול לשנות הכל", "זה גאוני"
+)
+
+_POSITIVE_PATTERNS_EN = (
+    "sounds good", "interesting", "i'm interested", "i want", "this is exactly what i need",
+    "this could help", "this looks good", "i like this", "this is great", "this is perfect",
+    "yes", "sure", "okay", "why not", "let's try", "i want to try",
+    # ✅ NEW: High excitement and satisfaction expressions
+    "oh wow", "amazing", "awesome", "fantastic", "incredible", "brilliant", "excellent",
+    "that's exactly what I was looking for", "this looks amazing", "I'm excited", "I love it",
+    "I need this", "this could change everything", "this is genius", "impressive",
+    # 🔧 QA FIX: Missing business enthusiasm patterns
+    "perfect for my business", "sounds perfect", "exactly what my business needs",
+    "this is perfect for us", "perfect solution", "ideal for my company",
+    "this fits perfectly", "exactly what we're looking for", "this would be great for us"
+)
+
+def _compile_patterns(patterns):
+    """Compile literal substrings into a single alternation regex (same semantics as any(p in text))"""
+    return re.compile("|".join(map(re.escape, patterns)))
+
+# Conversation-context bridges: (terms in recent history, terms in the follow-up question)
+_BRIDGE_CONTEXT_TERMS = {
+    "whatsapp": ("whatsapp", "וואטסאפ"),
+    "crm": ("crm", "integration", "אינטגרציה", "מערכות"),
+    "pricing": ("price", "cost", "מחיר", "עלות", "שח"),
+    "business": ("business", "עסק", "industry", "תחום"),
+}
+_BRIDGE_QUESTION_TERMS = {
+    "whatsapp": ("meta", "approval", "אישור", "verification", "מאומת", "operator"),
+    "crm": ("how", "איך", "possible", "אפשר", "requirements", "דרישות"),
+    "pricing": ("what about", "מה לגבי", "other", "אחר", "more", "עוד"),
+    "business": ("example", "דוגמה", "how", "איך", "like mine", "כמו שלי"),
+}
+
+_BRIDGE_CONTEXT_MATCHER = PhraseMatcher(_BRIDGE_CONTEXT_TERMS)
+
+# Question classifiers
+_TECHNICAL_PATTERNS = (
+    "איך זה עובד", "איך הבוט עובד", "טכני", "אינטגרציה", "וואטסאפ", "טכנולוגיה",
+    "how does it work", "how does the bot work", "technical", "integration", "whatsapp", "technology"
+)
+_GOODBYE_PATTERNS = (
+    "ביי", "להתראות", "תודה", "תודה רבה", "תודות",
+    "bye", "goodbye", "thank you", "thanks", "farewell"
+)
+
+# Product-market fit: direct buying/purchase intent (strongest signal)
+_DIRECT_BUYING_PATTERNS = (
+    "אני רוצה לקנות", "רוצה לקנות", "רוצה לרכוש", "אני רוצה לרכוש",
+    "i want to buy", "want to buy", "want to purchase", "i want to purchase"
+)
+# Strong conversion signals - require specific commitment language (buying intent included)
+_CONVERSION_PATTERNS = _DIRECT_BUYING_PATTERNS + (
+    # Direct implementation/setup questions (stronger commitment)
+    "איך בונים", "איך מקימים", "איך מתחילים", "איך נתחיל", "איך אפשר להתחיל",
+    "how do we build", "how do we set up", "how do we start", "how can we start",
+    
+    # Specific personal use case questions (stronger intent)
+    "אם אני רוצה לבנות", "אם אני רוצה להקים", "אם אני רוצה ליצור",
+    "if i want to build", "if i want to set up", "if i want to create",
+    
+    # Direct process/next steps questions
+    "מה התהליך", "מה השלבים", "מה צריך לעשות", "איך ממשיכים",
+    "what's the process", "what are the steps", "what do we need to do", "how do we proceed",
+    
+    # Ready-to-start language
+    "רוצה להתחיל", "רוצים להתחיל", "מוכן להתחיל", "איך נקדם",
+    "want to get started", "ready to start", "how do we move forward"
+)
+# Questions that are just seeking general information
+_INFORMATION_SEEKING_PATTERNS = (
+    "מה דוגמאות", "איזה דוגמאות", "אפשר דוגמאות", "תן לי דוגמאות",
+    "what examples", "give me examples", "can you give examples",
+    "איך זה עובד בעסקים", "איך זה עובד למסעדות", "איך זה עובד בכלל",
+    "how does it work for businesses", "how does it work in general",
+    "איזה צבע", "איזה עיצוב", "איך זה יראה", "מה אפשר לעשות",
+    "what color", "what design", "how will it look", "what can we do"
+)
+_INTEREST_PATTERNS = (
+    "זה נשמע", "זה מעניין", "זה טוב", "זה מושלם", "זה בדיוק",
+    "sounds good", "interesting", "perfect", "exactly what"
+)
+
+# ⚡ PERFORMANCE: One automaton answers every question detector (business, use cases, engagement,
+# follow-ups, technical/goodbye, product-market fit, interest) in a single scan per request.
+# Shared phrases become one automaton entry tagged with all of their categories
+_SIGNAL_MATCHER = PhraseMatcher({
+    "business": _BUSINESS_PATTERNS_HE + _BUSINESS_PATTERNS_EN,
+    "education": _EDUCATION_PATTERNS,
+    "recruitment": _RECRUITMENT_PATTERNS,
+    "restaurant": _RESTAURANT_PATTERNS,
+    "retail": _RETAIL_PATTERNS,
+    "real_estate": _REALESTATE_PATTERNS,
+    "medical": _MEDICAL_PATTERNS,
+    "positive": _POSITIVE_PATTERNS_HE + _POSITIVE_PATTERNS_EN,
+    **{f"followup_{bridge}": terms for bridge, terms in _BRIDGE_QUESTION_TERMS.items()},
+    "technical": _TECHNICAL_PATTERNS,
+    "goodbye": _GOODBYE_PATTERNS,
+    "conversion": _CONVERSION_PATTERNS,
+    "information_seeking": _INFORMATION_SEEKING_PATTERNS,
+    "direct_buying": _DIRECT_BUYING_PATTERNS,
+    "interest": _INTEREST_PATTERNS
+})
+
+def _product_market_fit_rule(direct_buying, conversion, positive, use_case, business_type):
+    """The product-market fit rule over its five input flags"""
+    return (
+        # Direct buying intent (immediate trigger)
+        direct_buying or
+        # Strong conversion signal with context AND positive engagement
+        (conversion and positive and (use_case or business_type)) or
+        # Multiple positive indicators together with clear intent
+        (positive and use_case and business_type and conversion)
+    )
+
+# Truth table of the rule, indexed by (direct_buying<<4 | conversion<<3 | positive<<2 | use_case<<1 | business_type)
+_PMF_TABLE = bytes(
+    _product_market_fit_rule(*((index >> shift) & 1 for shift in (4, 3, 2, 1, 0)))
+    for index in range(32)
+)
+
+# ⚡ PERFORMANCE: Data files are read once per process - the chat and streaming services share
+# the same prompt string and parsed intents (and forked workers inherit them when preloaded)
+@lru_cache(maxsize=1)
+def _read_system_prompt():
+    with open(os.path.join(Config.DATA_DIR, "system_prompt_atarize.txt"), "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+@lru_cache(maxsize=1)
+def _read_intents_config():
+    with open(os.path.join(Config.DATA_DIR, "intents_config.json"), "r", encoding="utf-8") as f:
+        intents = json.load(f)
+    logger.info(f"[CHAT_SERVICE] Loaded {len(intents)} intents")
+    return intents
+
+# Session consistency rules: (log level, log messages, keys to clear)
+_SESSION_FIX_RULES = (
+    # Rule 1: lead_collected and interested_lead_pending are mutually exclusive
+    (logging.WARNING, ("[SESSION_FIX] ⚠️ Conflict: lead_collected=True and interested_lead_pending=True",
+                       "[SESSION_FIX] 🔧 Fixing: Removing interested_lead_pending (lead already collected)"),
+     ("interested_lead_pending", "lead_request_count")),
+    # Rule 2: If lead_collected is True, request_count should be cleared
+    (logging.WARNING, ("[SESSION_FIX] ⚠️ Conflict: lead_collected=True but lead_request_count exists",
+                       "[SESSION_FIX] 🔧 Fixing: Clearing lead_request_count"),
+     ("lead_request_count",)),
+    # Rule 3: request_count should not exist without interested_lead_pending
+    (logging.WARNING, ("[SESSION_FIX] ⚠️ Conflict: lead_request_count exists without interested_lead_pending",
+                       "[SESSION_FIX] 🔧 Fixing: Clearing lead_request_count"),
+     ("lead_request_count",)),
+    # Rule 4: buying_intent_detected should not exist without interested_lead_pending (unless lead is collected)
+    (logging.WARNING, ("[SESSION_FIX] ⚠️ Conflict: buying_intent_detected exists without interested_lead_pending and no collected lead",
+                       "[SESSION_FIX] 🔧 Fixing: Clearing buying_intent_detected"),
+     ("buying_intent_detected",)),
+    # Rule 5: Clean up conversion_critical_moment after lead is collected
+    (logging.INFO, ("[SESSION_FIX] 🔧 Lead collected - clearing conversion_critical_moment flag",),
+     ("conversion_critical_moment",)),
+)
+
+def _session_fixes(collected, pending, request_count, buying_intent, critical_moment):
+    """Indices of the rules that fire, in order, for one combination of the five lead flags"""
+    fired = []
+    if collected and pending:
+        fired.append(0)
+        pending = request_count = False
+    if collected and request_count:
+        fired.append(1)
+        request_count = False
+    if request_count and not pending:
+        fired.append(2)
+    if buying_intent and not pending and not collected:
+        fired.append(3)
+    if collected and critical_moment:
+        fired.append(4)
+    return tuple(fired)
+
+# Rules fired per flag signature (collected<<4 | pending<<3 | request_count<<2 | buying_intent<<1 | critical_moment)
+_SESSION_FIX_TABLE = tuple(
+    _session_fixes(*((index >> shift) & 1 for shift in (4, 3, 2, 1, 0)))
+    for index in range(32)
+)
+
+# Detector results are pure functions of the lowered text - short repeats ("כן", "thanks") hit the cache
+@lru_cache(maxsize=2048)
+def _scan_signals(text_lower):
+    return _SIGNAL_MATCHER.scan(text_lower)
+
+def _is_technical_text(text_lower):
+    return "technical" in _scan_signals(text_lower)
+
+def _is_goodbye_text(text_lower):
+    return "goodbye" in _scan_signals(text_lower)
+
+# handle_question routing phrases
+_SPEAK_TO_SOMEONE_PATTERNS = (
+    "i want to speak to someone", "want to speak to someone", "talk to someone",
+    "speak to a person", "talk to a person", "human agent", "real person",
+    "אני רוצה לדבר עם מישהו", "רוצה לדבר עם מישהו", "לדבר עם נציג", "אדם אמיתי"
+)
+_CLOSING_PATTERNS = ("תודה", "תודה רבה", "ביי", "להתראות", "שיהיה לך יום טוב", "thank you", "thanks", "bye", "goodbye", "have a good day")
+_LEAD_STATUS_KEYWORDS = ("lead", "contact", "details", "when", "call", "email", "phone", "פרטים", "מתי", "אימייל", "טלפון", "חזרה", "נציג", "representative")
+_IMPLEMENTATION_PROCESS_KEYWORDS = ("איך זה יכול לעבוד", "איך זה עובד", "איך זה יעבוד", "how will it work", "how does it work", "how will this work")
+_SIMPLE_GOODBYE_PATTERNS = ("ביי", "להתראות", "bye", "goodbye", "תודה רבה", "thank you", "thanks")
+_CONFIRMATION_WORDS = frozenset(("כן", "yes", "אוקיי", "okay", "ok", "טוב", "בסדר", "sure", "נכון", "בטח"))
+# Follow-up category of a confirmation, from the last bot message. Anchored lookaheads keep the
+# pricing-before-technical priority wherever the words appear; the matching group names the category
+_CONFIRM_CATEGORY_RE = re.compile(
+    r"(?=.*?(?:מחיר|price))(?P<pricing_follow>)|(?=.*?(?:טכני|technical))(?P<technical_follow>)",
+    re.IGNORECASE | re.DOTALL,
+)
+_SIMPLE_QUESTION_PATTERNS = ("היי", "שלום", "מה", "כמה", "איך", "hello", "hi", "what", "how", "much")
+
+_SPEAK_TO_SOMEONE_RE = _compile_patterns(_SPEAK_TO_SOMEONE_PATTERNS)
+_CLOSING_RE = _compile_patterns(_CLOSING_PATTERNS)
+_LEAD_STATUS_RE = _compile_patterns(_LEAD_STATUS_KEYWORDS)
+_IMPLEMENTATION_PROCESS_RE = _compile_patterns(_IMPLEMENTATION_PROCESS_KEYWORDS)
+_SIMPLE_GOODBYE_RE = _compile_patterns(_SIMPLE_GOODBYE_PATTERNS)
+_SIMPLE_QUESTION_RE = _compile_patterns(_SIMPLE_QUESTION_PATTERNS)
+
+# Hebrew letters (alef..tav, final forms included) - lead details written in Hebrew
+_HEBREW_LETTERS = re.compile('[א-ת]')
+
+# A complete lead (name + phone + email) always carries an email address and phone digits
+_DIGIT_RE = re.compile(r'\d')
+
+def _question_language(question, session, question_lower=None):
+    """
+    Language of a question. Bare confirmations ("ok", "כן") say little about the user's
+    language - they keep the language of the session's previous turn.
+    """
+    if question_lower is None:
+        question_lower = question.lower().strip()
+    if question_lower in _CONFIRMATION_WORDS and session.get("_last_lang"):
+        return session["_last_lang"]
+    return detect_language(question)
+
+def _is_generic_turn(session, enriched_context=""):
+    """
+    Whether this turn's answer depends only on the question and the knowledge base - no session signals,
+    completed lead, stated business type or past correction - so other users' paraphrases may reuse it
+    """
+    return not (enriched_context or session.get("lead_collected") or session.get("user_business_type")
+                or session.get("user_corrections") or session.get("_violation_prone"))
+
+def _format_context(context_docs, enriched_context=""):
+    """
+    Context block for the enhanced prompt: the enriched signals, then one labelled paragraph per
+    (doc, meta) pair - built in a single join instead of joining and then prefixing the (multi-KB) text
+    """
+    blocks = [f"Context ({meta.get('intent', 'general')}): {doc}" for doc, meta in context_docs]
+    if enriched_context:
+        blocks.insert(0, enriched_context)
+    return "\n\n".join(blocks)
+
+def _could_be_lead(text):
+    """Cheap pre-filter for detect_lead_info - real contact details contain an email address and digits"""
+    return "@" in text and _DIGIT_RE.search(text) is not None
+
+# Context keywords that mean we have specific, actionable information to offer
+_SPECIFIC_INFO_RE = _compile_patterns((
+    "pricing", "cost", "setup", "integration", "features", "examples",
+    "מחיר", "עלות", "הקמה", "אינטגרציה", "תכונות", "דוגמאות"
+))
+
+# Lead collection flow phrases
+_EXIT_PHRASES = ("היי", "עזוב", "לא עכשיו", "שכח מזה", "לא רוצה", "תודה לא", "די", "סגור")
+_LEAD_PROCESS_QUESTIONS = ("איך התהליך עובד", "איך זה עובד", "איך זה יעבוד", "מה התהליך", "how does the process work", "how does it work")
+
+_EXIT_RE = _compile_patterns(_EXIT_PHRASES)
+_LEAD_PROCESS_RE = _compile_patterns(_LEAD_PROCESS_QUESTIONS)
+
+# Lead transition messages: one call-to-action scaffold per language, filled per
+# use case / business / default with (hook, location, tail)
+_LEAD_TRANSITION_TEMPLATES = {
+    "he": ("{hook} רוצה שנתחיל להקים את הבוט{location}? אשמח לקבל את הפרטים שלך{tail}.", {
+        "education": ("נשמע שזה בדיוק מה שאתה צריך!", " לבית הספר שלך", " כדי שנוכל להתחיל"),
+        "restaurant": ("זה נשמע כמו פתרון מושלם למסעדה שלך!", "", " כדי שנוכל להתחיל"),
+        "recruitment": ("זה בדיוק מה שיעזור לך עם הגיוס!", "", ""),
+        "business": ("נשמע שזה בדיוק מה שהעסק שלך צריך!", "", ""),
+        "default": ("נשמע שזה בדיוק מה שאתה צריך!", "", "")
+    }),
+    "en": ("{hook} Want to start setting up the bot{location}? I'd love to get your details{tail}.", {
+        "education": ("This sounds exactly like what you need!", " for your school", " so we can get started"),
+        "restaurant": ("This sounds like the perfect solution for your restaurant!", "", " so we can get started"),
+        "recruitment": ("This is exactly what will help with your recruitment!", "", ""),
+        "business": ("This sounds exactly like what your business needs!", "", ""),
+        "default": ("This sounds exactly like what you need!", "", "")
+    })
+}
+# Composed once at import - lookups stay a single dict access
+_LEAD_TRANSITIONS = {
+    (lang, key): template.format(hook=hook, location=location, tail=tail)
+    for lang, (template, parts) in _LEAD_TRANSITION_TEMPLATES.items()
+    for key, (hook, location, tail) in parts.items()
+}
+
+# Bridges in priority order - the first one matching both sides wins
+_BRIDGES = (
+    ("whatsapp", "faq", "whatsapp_meta_verification",
+     "Meta business verification for WhatsApp integration", "WhatsApp+Meta"),
+    ("crm", "faq", "crm_integration",
+     "CRM and system integration capabilities", "CRM integration"),
+    ("pricing", "pricing", "pricing_details",
+     "Additional pricing information or plan details", "pricing"),
+    ("business", "chatbot_use_cases", "business_specific_examples",
+     "Industry-specific chatbot use cases", "business use case"),
+)
+
+# Use cases in priority order - the first match wins
+_USE_CASE_PRIORITY = ("education", "recruitment", "restaurant", "retail", "real_estate", "medical")
+
+# (session key, context line) pairs for _build_enriched_context - "{}" is filled with the session value
+_ENRICHED_CONTEXT_SIGNALS = (
+    ("specific_use_case", "CONTEXT: User has specific business use case: {}"),
+    ("follow_up_context", "CONTEXT: User is asking follow-up about: {}"),
+    ("positive_engagement", "CONTEXT: User shows positive engagement and interest"),
+    ("conversion_opportunity", "CONTEXT: This is a potential conversion opportunity - be helpful and guide naturally"),
+    ("interested_lead_pending", "CONTEXT: User may be interested in leaving contact details if appropriate"),
+)
+
 class ChatService:
+    # Prompt templates for _build_contextual_prompt
+    _LEAD_CONFIRMATION_TEMPLATE = (
+        "The user has provided complete lead information (name, email, phone).\n"
+        "A lead notification has been sent to the team.\n"
+        "Now provide a warm, professional confirmation message that:\n"
+        "1. Thanks them for their interest\n"
+        "2. Confirms their details were received\n"
+        "3. Mentions someone will contact them soon\n"
+        "4. Maintains the conversational tone\n"
+        "\n"
+        "User message: {question}\n"
+        "\n"
+        "Available context: {context}\n"
+        "\n"
+        "Respond naturally and warmly."
+    )
+    _GENERAL_CONTEXT_TEMPLATE = (
+        "User question: {question}\n"
+        "\n"
+        "Relevant context: {context}\n"
+        "\n"
+        "Provide a helpful, accurate response using the context provided."
+    )
+    # Prompt templates for _generate_ai_response_with_enhanced_context (with / without a closing offer)
+    _ENHANCED_PROMPT_HEAD = (
+        "User question: {question}\n"
+        "\n"
+        "Available context and signals:\n"
+        "{context}\n"
+        "\n"
+        "Provide a helpful, accurate, and contextual response using all available information. \n"
+        "Be conversational, professional, and address the user's specific needs based on the context provided.\n"
+        "\n"
+    )
+    _ENHANCED_OFFER_TEMPLATE = _ENHANCED_PROMPT_HEAD + (
+        "IMPORTANT: End your response with a specific, helpful offer: \"{offer}\"\n"
+        "Only make this offer if you have substantial information to provide.\n"
+        "\n"
+        "LANGUAGE: {lang_instruction} - match the user's language exactly."
+    )
+    _ENHANCED_NO_OFFER_TEMPLATE = _ENHANCED_PROMPT_HEAD + (
+        "IMPORTANT: Do NOT offer to provide more information unless you have substantial, specific details to share.\n"
+        "\n"
+        "LANGUAGE: {lang_instruction} - match the user's language exactly."
+    )
+    
     def __init__(self, db_manager, openai_client):
         self.db_manager = db_manager
         self.openai_client = openai_client
@@ -24,34 +526,169 @@ class ChatService:
             default_ttl=3600  # 1 hour default TTL
         )
         
+        # Worker pool for speculative / overlapped OpenAI and Chroma calls
+        self._executor = ThreadPoolExecutor(max_workers=4)
+        
+        # Single-flight table: identical GPT requests in flight share one call
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        
+        # Knowledge collection handle (resolved lazily, reset by clear_cache)
+        self._knowledge_collection = None
+        # ⚡ PERFORMANCE: In-memory copy of the knowledge embeddings - semantic lookups skip the Chroma query
+        self.knowledge_index = KnowledgeIndex(self._get_knowledge_collection)
+        
+        # LRU of question embeddings (text -> vector) - shared by the semantic cache and Chroma queries
+        self._embedding_cache = OrderedDict()
+        self._embedding_cache_lock = threading.Lock()
+        
+        # Dedicated pool for embedding calls so prefetches never queue behind GPT work
+        self._embedding_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="embed")
+        # In-flight prefetches per question text (guarded by _embedding_cache_lock) - concurrent
+        # requests each find their own, and finished ones drop out once their result is cached
+        self._pending_embeddings = {}
+        
+        # Semantic cache catches paraphrased questions that miss the exact-match cache
+        self.semantic_cache = SemanticCache(self._embed_question, max_size=1000, threshold=0.92,
+                                            ttl_seconds=24 * 3600)
+        
+        # Intent detection service (reused across requests instead of rebuilt per call)
+        self.intent_service = IntentService(db_manager)
+        
+        # Lead notification mailer (reads its SMTP settings once)
+        self.email_service = EmailService()
+        # SMTP sends run here so lead-capture replies don't wait for the mail server
+        self._email_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="email")
+        
         # Initialize response variation service to eliminate repetitive phrases
         self.response_variation = ResponseVariationService()
         
-        # Load system prompt and intents at initialization
+        # Load the system prompt at initialization - intents are only parsed when first used
         self._load_system_prompt()
-        self._load_intents()
     
     def _load_system_prompt(self):
-        """Load system prompt from file"""
+        """
+        Load system prompt from file.
+        self.system_prompt must stay immutable after __init__ and always be sent byte-identical
+        as the first message, so OpenAI's automatic prompt caching can reuse the prefix.
+        Per-call instructions belong in later messages, never in the system prompt itself.
+        """
         try:
-            system_prompt_path = os.path.join(Config.DATA_DIR, "system_prompt_atarize.txt")
-            with open(system_prompt_path, "r", encoding="utf-8") as f:
-                self.system_prompt = f.read().strip()
-                logger.info("[CHAT_SERVICE] System prompt loaded successfully")
+            self.system_prompt = _read_system_prompt()
+            logger.info("[CHAT_SERVICE] System prompt loaded successfully")
         except Exception as e:
             logger.error(f"[CHAT_SERVICE] Failed to load system prompt: {e}")
             self.system_prompt = "You are a helpful assistant for Atarize."
+        # ⚡ PERFORMANCE: One shared (never mutated) system message object leads every prompt
+        self._system_message = {"role": "system", "content": self.system_prompt}
     
-    def _load_intents(self):
-        """Load intents configuration from file"""
+    @property
+    def intents(self):
+        """Intents configuration, parsed on first access"""
         try:
-            intents_path = os.path.join(Config.DATA_DIR, "intents_config.json")
-            with open(intents_path, "r", encoding="utf-8") as f:
-                self.intents = json.load(f)
-                logger.info(f"[CHAT_SERVICE] Loaded {len(self.intents)} intents")
+            return _read_intents_config()
         except Exception as e:
             logger.error(f"[CHAT_SERVICE] Failed to load intents: {e}")
-            self.intents = []
+            return []
+    
+    def _cached_embedding(self, text):
+        """Embedding from the LRU (refreshing its position), or None"""
+        with self._embedding_cache_lock:
+            embedding = self._embedding_cache.get(text)
+            if embedding is not None:
+                self._embedding_cache.move_to_end(text)
+            return embedding
+    
+    def _compute_embedding(self, text):
+        """Embed text with the same embedding function that populates Chroma and remember it"""
+        embedding = self.db_manager.embedding_func([text])[0]
+        with self._embedding_cache_lock:
+            self._embedding_cache[text] = embedding
+            self._embedding_cache.move_to_end(text)
+            if len(self._embedding_cache) > _EMBEDDING_CACHE_SIZE:
+                self._embedding_cache.popitem(last=False)
+        return embedding
+    
+    def _embed_question(self, text):
+        """Embed a question, reusing cached and prefetched embeddings"""
+        embedding = self._cached_embedding(text)
+        if embedding is not None:
+            return embedding
+        
+        with self._embedding_cache_lock:
+            pending_future = self._pending_embeddings.get(text)
+        if pending_future is not None:
+            try:
+                return pending_future.result(timeout=10)
+            except Exception as e:
+                logger.warning(f"[EMBEDDING] Prefetched embedding failed, retrying inline: {e}")
+        
+        return self._compute_embedding(text)
+    
+    def _prefetch_question_embedding(self, text):
+        """Start embedding the question in the background so it overlaps intent detection"""
+        if self._cached_embedding(text) is not None:
+            return
+        with self._embedding_cache_lock:
+            if text in self._pending_embeddings:
+                return
+            future = self._embedding_executor.submit(self._compute_embedding, text)
+            self._pending_embeddings[text] = future
+        future.add_done_callback(lambda _: self._drop_pending_embedding(text, future))
+    
+    def _drop_pending_embedding(self, text, future):
+        """Forget a finished prefetch (its embedding is in the LRU by now, unless it failed)"""
+        with self._embedding_cache_lock:
+            if self._pending_embeddings.get(text) is future:
+                del self._pending_embeddings[text]
+    
+    def _append_history(self, session, role, content):
+        """Append a message to the session history, keeping only the most recent messages"""
+        history = session["history"]
+        history.append({"role": role, "content": content})
+        # Bumped on every write so history-derived values (ContextManager's session id) can be cached
+        session["_history_version"] = session.get("_history_version", 0) + 1
+        # Bounded: the session cookie stays small and prompts only ever use the tail
+        if len(history) > _MAX_HISTORY_MESSAGES:
+            dropped = history[:-_MAX_HISTORY_MESSAGES]
+            del history[:-_MAX_HISTORY_MESSAGES]
+            self._fold_into_summary(session, dropped)
+        if role == "assistant":
+            # ⚡ PERFORMANCE: Confirmations read the last bot message from here instead of scanning history
+            session["_last_assistant_content"] = content
+    
+    def _fold_into_summary(self, session, messages):
+        """Fold trimmed messages into session["history_summary"] (plain concat - no extra GPT call)"""
+        items = [msg["content"][:_HISTORY_SUMMARY_ITEM_CHARS] for msg in messages
+                 if msg.get("role") == "user" and msg.get("content")]
+        if not items:
+            return
+        previous = session.get("history_summary")
+        summary = " | ".join([previous, *items] if previous else items)
+        # Keep the most recent part so the cookie and the prompt stay bounded
+        session["history_summary"] = summary[-_HISTORY_SUMMARY_MAX_CHARS:]
+    
+    def _recent_history(self, session, count, token_budget=None):
+        """
+        The last count history messages (newest first within token_budget, if given),
+        preceded by the running summary of older turns if any
+        """
+        recent = session.get("history", [])[-count:]
+        if token_budget is not None and recent:
+            # ⚡ PERFORMANCE: Walk back from the newest message until the budget is spent -
+            # a few long messages no longer blow up the prompt, short ones aren't cut needlessly
+            kept = 0
+            used = 0
+            for message in reversed(recent):
+                used += estimate_text_tokens(message.get("content") or "") + 4  # per-message overhead
+                if used > token_budget and kept:
+                    break
+                kept += 1
+            recent = recent[-kept:]
+        summary = session.get("history_summary")
+        if summary:
+            return [{"role": "system", "content": f"Conversation so far (earlier user messages): {summary}"}, *recent]
+        return recent
     
     def _get_session_id(self, session):
         """Generate consistent session ID for response variation tracking"""
@@ -63,32 +700,42 @@ class ChatService:
             session["session_id"] = session_id
         return session["session_id"]
     
-    def handle_question(self, question, session, lang=None):
+    def handle_question(self, question, session, lang=None, stream_callback=None):
         """
         Main chat handling logic - Fixed version with consistent intent detection
+        
+        Args:
+            stream_callback: Optional callable receiving answer text deltas as the model generates them
         """
         # Performance timing
-        import time
         overall_start_time = time.time()
         
         # Initialize variables to prevent UnboundLocalError
         answer = None
         intent_name = "unknown"
         
+        # ⚡ PERFORMANCE: Lowercase the question once and reuse it for all pattern checks
+        question_lower = question.lower().strip()
+        
+        # ⚡ PERFORMANCE: Detect the question's language once per request and pass it down
+        is_confirmation = question_lower in _CONFIRMATION_WORDS
+        question_lang = _question_language(question, session, question_lower)
+        session["_last_lang"] = question_lang
+        
         # 🔧 FIX: LANGUAGE DETECTION FALLBACK
         if not lang:
-            lang = detect_language(question)
-            logger.debug(f"[LANGUAGE_FALLBACK] Auto-detected language: {lang} for question: '{question[:30]}...'")
+            lang = question_lang
+            logger.debug("[LANGUAGE_FALLBACK] Auto-detected language: %s for question: '%.30s...'", lang, question)
         else:
-            logger.debug(f"[LANGUAGE_PROVIDED] Using provided language: {lang}")
+            logger.debug("[LANGUAGE_PROVIDED] Using provided language: %s", lang)
         
-        logger.debug(f"\n{'='*60}")
+        logger.debug("\n%s", "=" * 60)
         logger.info(f"[CHAT_SERVICE] Starting processing for: '{question}' (lang: {lang})")
         
         # Initialize session keys if they don't exist
         if "history" not in session:
             session["history"] = []
-            logger.debug(f"[SESSION_INIT] Initialized empty history")
+            logger.debug("[SESSION_INIT] Initialized empty history")
         if "greeted" not in session:
             session["greeted"] = False
         if "intro_given" not in session:
@@ -100,30 +747,41 @@ class ChatService:
         
         # Validate session state consistency
         self._validate_session_state(session)
-        
-        # 🔧 FIX 1: CONSISTENT INTENT DETECTION AT START
-        from services.intent_service import IntentService
-        intent_service = IntentService(self.db_manager)
-        intent_name = intent_service.detect_intent_chroma(question)
-        if not intent_name:
-            intent_name = "unknown"
-        logger.info(f"[INTENT_DETECTION] Detected intent: {intent_name} for question: '{question[:50]}...'")
+        # ⚡ PERFORMANCE: Bind hot session values once (history is appended/trimmed in place)
+        history = session["history"]
+        intro_given = session["intro_given"]
+        
+        # ⚡ PERFORMANCE: Bare confirmations are answered from the response variations (or by the
+        # lead flow) - they never need the question embedding, knowledge retrieval or intent detection
+        is_simple_question = len(question.split()) <= 3 and _SIMPLE_QUESTION_RE.search(question_lower) is not None
+        if not is_confirmation:
+            # ⚡ PERFORMANCE: Intent detection, the semantic cache and knowledge retrieval all need the
+            # question embedding - start it once in the background and share it
+            self._prefetch_question_embedding(question)
+            
+            # 🔧 FIX 1: CONSISTENT INTENT DETECTION AT START
+            # (reuses the shared embedding instead of letting Chroma embed the question again)
+            try:
+                question_embedding = self._embed_question(question)
+            except Exception as e:
+                logger.warning(f"[INTENT_DETECTION] Question embedding failed, letting Chroma embed: {e}")
+                question_embedding = None
+            intent_name = self.intent_service.detect_intent_chroma(question, query_embedding=question_embedding)
+            if not intent_name:
+                intent_name = "unknown"
+            logger.info(f"[INTENT_DETECTION] Detected intent: {intent_name} for question: '{question[:50]}...'")
         
         # ✅ REMOVED: HIGH-CONFIDENCE INTENTS BYPASS 
         # All intents now follow proper GPT-FIRST → VAGUE-FALLBACK → CONTEXT-ENHANCED flow
         # Intent detection is logged but doesn't trigger automatic responses
         
         # 🔧 UX FIX: Handle "speak to someone" requests without assumptions
-        speak_to_someone_patterns = [
-            "i want to speak to someone", "want to speak to someone", "talk to someone", 
-            "speak to a person", "talk to a person", "human agent", "real person",
-            "אני רוצה לדבר עם מישהו", "רוצה לדבר עם מישהו", "לדבר עם נציג", "אדם אמיתי"
-        ]
-        if any(pattern in question.lower() for pattern in speak_to_someone_patterns):
+        if _SPEAK_TO_SOMEONE_RE.search(question_lower):
             logger.info(f"[SPEAK_TO_SOMEONE] Detected request to speak to someone")
-            speak_response = self._generate_intelligent_response("speak_to_someone", question, session)
+            speak_response = self._generate_intelligent_response("speak_to_someone", question, session, lang=question_lang,
+                                                                 stream_callback=stream_callback)
             if speak_response:
-                session["history"].append({"role": "assistant", "content": speak_response})
+                self._append_history(session, "assistant", speak_response)
                 return speak_response, session
         
         # Note: Response variation is handled by the existing ResponseVariationService
@@ -133,11 +791,8 @@ class ChatService:
         if session.get("lead_collected"):
             logger.info(f"[LEAD_COMPLETED] Lead already collected - checking message type")
             
-            question_lower = question.lower().strip()
-            
             # Check for goodbye/thank you messages - provide warm closure
-            goodbye_patterns = ["תודה", "תודה רבה", "ביי", "להתראות", "שיהיה לך יום טוב", "thank you", "thanks", "bye", "goodbye", "have a good day"]
-            if any(pattern in question_lower for pattern in goodbye_patterns):
+            if _CLOSING_RE.search(question_lower):
                 logger.info(f"[LEAD_COMPLETED] Goodbye/thank you detected - providing warm closure")
                 # Using already detected lang
                 if lang == "he":
@@ -147,8 +802,7 @@ class ChatService:
                 return final_message, session
             
             # Check for lead status questions
-            lead_status_keywords = ["lead", "contact", "details", "when", "call", "email", "phone", "פרטים", "מתי", "אימייל", "טלפון", "חזרה", "נציג", "representative"]
-            if any(keyword in question_lower for keyword in lead_status_keywords):
+            if _LEAD_STATUS_RE.search(question_lower):
                 logger.info(f"[LEAD_COMPLETED] User asking about lead status - providing status update")
                 # Using already detected lang
                 if lang == "he":
@@ -161,8 +815,7 @@ class ChatService:
             logger.info(f"[LEAD_COMPLETED] User asking new question - continuing conversation while preserving lead status")
             
             # Check if this is a process/implementation question - provide focused answer
-            process_keywords = ["איך זה יכול לעבוד", "איך זה עובד", "איך זה יעבוד", "how will it work", "how does it work", "how will this work"]
-            if any(keyword in question_lower for keyword in process_keywords):
+            if _IMPLEMENTATION_PROCESS_RE.search(question_lower):
                 logger.info(f"[LEAD_COMPLETED] Process question after lead collection - providing focused implementation answer")
                 # Get relevant context and provide a focused answer about implementation
                 context = self._get_context_from_chroma(question, "implementation_process")
@@ -181,28 +834,26 @@ class ChatService:
                 
                 Answer their implementation question while maintaining the excitement about their decision."""
                 
-                answer = self._generate_ai_response_with_enhanced_context(question, session, implementation_prompt)
-                session["history"].append({"role": "assistant", "content": answer})
+                answer = self._generate_ai_response_with_enhanced_context(question, session, implementation_prompt,
+                                                                           lang=question_lang)
+                self._append_history(session, "assistant", answer)
                 return answer, session
             
             # For other questions, continue with normal flow but maintain lead status
             # DON'T remove lead_collected - just continue with normal flow
         
         # Add user message to history
-        session["history"].append({"role": "user", "content": question})
-        
-        # Debug: Always test lead detection on every input
-        from utils.validation_utils import detect_lead_info
-        lead_test = detect_lead_info(question)
-        logger.debug(f"[DEBUG] Lead detection test on '{question}': {lead_test}")
+        self._append_history(session, "user", question)
+        session["turn_count"] = session.get("turn_count", 0) + 1
         
         # Step 1: Detect greeting context for GPT enrichment (no early returns)
-        is_first_greeting = is_greeting(question) and not session.get("intro_given")
-        is_repeat_greeting = is_greeting(question) and session.get("intro_given")
+        question_is_greeting = is_greeting(question)
+        is_first_greeting = question_is_greeting and not intro_given
+        is_repeat_greeting = question_is_greeting and intro_given
         
         if is_first_greeting:
             logger.info(f"[CONTEXT] First-time greeting detected - will enrich GPT context")
-            session["intro_given"] = True
+            intro_given = session["intro_given"] = True
         elif is_repeat_greeting:
             logger.debug(f"[CONTEXT] Repeat greeting detected - will enrich GPT context")
         
@@ -210,32 +861,70 @@ class ChatService:
         greeting_context = {
             "is_first_greeting": is_first_greeting,
             "is_repeat_greeting": is_repeat_greeting,
-            "intro_given": session.get("intro_given", False)
+            "intro_given": intro_given
         }
         
         # Step 2: Advanced context detection with context manager
         # Update user context with the new question
-        context_manager.update_user_context(session, question)
+        context_manager.update_user_context(session, question, question_lower=question_lower)
+        
+        # ⚡ PERFORMANCE: One automaton scan answers the business, use-case and engagement detectors
+        signals = _scan_signals(question_lower)
+        
+        # ✅ ENHANCED: Detect positive engagement with improved satisfaction recognition
+        if self._detect_positive_engagement(question, signals):
+            session["positive_engagement"] = True
+            # ✅ NEW: Track consecutive positive engagement for stronger lead signals
+            session["positive_engagement_count"] = session.get("positive_engagement_count", 0) + 1
+            # Remember the turn so product-market fit checks don't rescan history
+            session["last_positive_engagement_turn"] = session["turn_count"]
+            logger.info(f"[ENGAGEMENT] Positive engagement detected (count: {session['positive_engagement_count']})")
+        
+        # ⚡ PERFORMANCE: Confirmations ("yes", "כן") can't carry lead details, buying intent, a business
+        # type or a greeting - answer them before the remaining detectors. An active lead flow
+        # still gets them (the user is answering the request for details)
+        if is_confirmation and not session.get("interested_lead_pending"):
+            logger.info(f"[CHAT_SERVICE] ✅ Confirmation detected: '{question}' - using Response Variation Service")
+            
+            # Get the last bot message to understand context
+            last_bot_message = session.get("_last_assistant_content")
+            if last_bot_message is None:
+                # Sessions started before the pointer existed
+                last_bot_message = next((msg.get("content", "") for msg in reversed(history)
+                                         if msg.get("role") == "assistant"), "")
+            
+            # Use existing Response Variation Service for varied responses
+            session_id = self._get_session_id(session)
+            lang = question_lang
+            
+            # Determine response category based on conversation context
+            category_match = _CONFIRM_CATEGORY_RE.match(last_bot_message)
+            category = category_match.lastgroup if category_match else "general_help"
+            
+            # Get varied response from Response Variation Service
+            varied_response = self.response_variation.select_varied_response(
+                category=category,
+                language=lang,
+                session_id=session_id,
+                context="confirmation"
+            )
+            
+            logger.info(f"[RESPONSE_VARIATION] Generated varied confirmation response (category: {category})")
+            self._append_history(session, "assistant", varied_response)
+            return varied_response, session
         
         # Detect business type and use cases (only for information purposes, not for early customization)
-        if self._detect_business_type(question):
+        if self._detect_business_type(question, signals):
             session["business_type_detected"] = True
             logger.info(f"[CONTEXT] Business type detected in: '{question}' (for information only)")
         
-        specific_use_case = self._detect_specific_use_case(question)
+        specific_use_case = self._detect_specific_use_case(question, signals)
         if specific_use_case:
             session["specific_use_case"] = specific_use_case
             logger.info(f"[CONTEXT] Specific use case detected: {specific_use_case} (for information only)")
         
-        # ✅ ENHANCED: Detect positive engagement with improved satisfaction recognition
-        if self._detect_positive_engagement(question):
-            session["positive_engagement"] = True
-            # ✅ NEW: Track consecutive positive engagement for stronger lead signals
-            session["positive_engagement_count"] = session.get("positive_engagement_count", 0) + 1
-            logger.info(f"[ENGAGEMENT] Positive engagement detected (count: {session['positive_engagement_count']})")
-        
         # Detect conversation context for follow-up questions
-        contextual_intent, context_info = self._get_conversation_context(question, session)
+        contextual_intent, context_info = self._get_conversation_context(question, session, question_lower, signals)
         if contextual_intent:
             session["follow_up_context"] = context_info.get("topic")
             logger.info(f"[CONTEXT] Follow-up context detected: {context_info.get('topic')}")
@@ -244,35 +933,22 @@ class ChatService:
         # This section is now handled earlier in the flow
         
         # Check for lead information (after buying intent detection)
-        if detect_lead_info(question):
+        if _could_be_lead(question) and detect_lead_info(question):
             logger.info(f"[LEAD_FLOW] ✅ COMPLETE LEAD INFO DETECTED!")
             logger.info(f"[LEAD_FLOW] User message: '{question}'")
             
-            from services.email_service import EmailService
-            from utils.lead_parser import format_lead_notification, extract_lead_details
-            
-            # Extract and log lead details
-            lead_details = extract_lead_details(question)
-            logger.info(f"[LEAD_FLOW] 📋 Extracted details:")
-            logger.info(f"[LEAD_FLOW]   👤 Name: {lead_details.get('name', 'Not found')}")
-            logger.info(f"[LEAD_FLOW]   📞 Phone: {lead_details.get('phone', 'Not found')}")
-            logger.info(f"[LEAD_FLOW]   📧 Email: {lead_details.get('email', 'Not found')}")
-            
-            # Prepare and send email
-            email_service = EmailService()
-            formatted_message = format_lead_notification(question)
-            
-            logger.info(f"[LEAD_FLOW] 📤 Attempting to send email notification...")
-            email_success = email_service.send_email_notification(
-                subject="🆕 New Lead from Atarize Chatbot",
-                message=formatted_message
-            )
-            
-            if email_success:
-                logger.info(f"[LEAD_FLOW] ✅ EMAIL NOTIFICATION SENT SUCCESSFULLY!")
-            else:
-                logger.error(f"[LEAD_FLOW] ❌ EMAIL NOTIFICATION FAILED!")
-                logger.error(f"[LEAD_FLOW] Lead details will be lost! Consider manual follow-up.")
+            # Extract and log lead details (the extraction only feeds these logs)
+            if logger.isEnabledFor(logging.INFO):
+                lead_details = extract_lead_details(question)
+                logger.info(f"[LEAD_FLOW] 📋 Extracted details:")
+                logger.info(f"[LEAD_FLOW]   👤 Name: {lead_details.get('name', 'Not found')}")
+                logger.info(f"[LEAD_FLOW]   📞 Phone: {lead_details.get('phone', 'Not found')}")
+                logger.info(f"[LEAD_FLOW]   📧 Email: {lead_details.get('email', 'Not found')}")
+            
+            # ⚡ PERFORMANCE: Prepare and send the email in the background - the confirmation
+            # reply doesn't depend on the SMTP round trip
+            logger.info(f"[LEAD_FLOW] 📤 Queueing email notification...")
+            self._email_executor.submit(self._send_lead_email, question)
                 
             session.pop("interested_lead_pending", None)
             session.pop("lead_request_count", None)
@@ -280,8 +956,8 @@ class ChatService:
             
             # Use Response Variation Service for varied lead confirmations
             session_id = self._get_session_id(session)
-            has_hebrew_name = any(char in question for char in 'אבגדהוזחטיכלמנסעפצקרשתךםןףץ')
-            lang = detect_language(question)
+            has_hebrew_name = _HEBREW_LETTERS.search(question) is not None
+            lang = question_lang
             
             # Force Hebrew if we detect Hebrew characters in the lead info  
             if lang == "he" or has_hebrew_name:
@@ -299,12 +975,11 @@ class ChatService:
             
             logger.info(f"[RESPONSE_VARIATION] Generated varied lead confirmation (lang: {response_lang})")
             
-            session["history"].append({"role": "assistant", "content": answer})
+            self._append_history(session, "assistant", answer)
             return answer, session
         
         # Check for buying intent FIRST (before greeting logic) - HIGHEST PRIORITY
-        from utils.validation_utils import detect_buying_intent
-        if detect_buying_intent(question):
+        if detect_buying_intent(question, question_lower):
             logger.info(f"[BUYING_INTENT] 🎯 IMMEDIATE BUYING INTENT DETECTED - PRIORITY FLOW!")
             logger.info(f"[BUYING_INTENT] User message: '{question}'")
             session["interested_lead_pending"] = True
@@ -312,20 +987,20 @@ class ChatService:
             session["conversion_critical_moment"] = True
             
             # Pure buying intent - request lead details
-            lang = detect_language(question)
+            lang = question_lang
             if lang == "he":
                 buying_response = "מעולה! כדי שנתקדם, אשמח שתשאיר את הפרטים שלך: שם מלא, טלפון ואימייל – ונחזור אליך לתיאום ההקמה."
             else:
                 buying_response = "Excellent! To proceed, I'd be happy if you could share your details: full name, phone, and email – and we'll get back to you to coordinate the setup."
             
-            session["history"].append({"role": "assistant", "content": buying_response})
+            self._append_history(session, "assistant", buying_response)
             return buying_response, session
 
         # Handle greeting logic (AFTER buying intent check)
-        if is_greeting(question) and not session.get("greeted") and not session.get("buying_intent_detected"):
+        if question_is_greeting and not session.get("greeted") and not session.get("buying_intent_detected"):
             session["greeted"] = True
             session["intro_given"] = True
-            lang = detect_language(question)
+            lang = question_lang
             
             # Use GPT with context for greeting instead of hardcoded response
             context = self._get_context_from_chroma(question, "greeting")
@@ -341,8 +1016,9 @@ class ChatService:
             
             Respond in {"Hebrew" if lang == "he" else "English"} naturally and warmly."""
             
-            greeting_response = self._generate_ai_response_with_enhanced_context(question, session, greeting_prompt)
-            session["history"].append({"role": "assistant", "content": greeting_response})
+            greeting_response = self._generate_ai_response_with_enhanced_context(question, session, greeting_prompt,
+                                                                                 lang=question_lang)
+            self._append_history(session, "assistant", greeting_response)
             return greeting_response, session
         
         # Continue with other logic after buying intent and greeting detection
@@ -350,11 +1026,9 @@ class ChatService:
         # REMOVED: Automatic pricing detection - all responses now come from context only
 
         # Check for simple goodbye OR thank you BEFORE processing 
-        simple_goodbye_patterns = ["ביי", "להתראות", "bye", "goodbye", "תודה רבה", "thank you", "thanks"]
-        question_lower = question.lower().strip()
-        if any(pattern in question_lower for pattern in simple_goodbye_patterns) and not session.get("lead_collected"):
+        if _SIMPLE_GOODBYE_RE.search(question_lower) and not session.get("lead_collected"):
             logger.info(f"[GOODBYE] Simple goodbye/thank you detected - providing clean closure")
-            lang = detect_language(question)
+            lang = question_lang
             if "תודה" in question_lower or "thank" in question_lower:
                 if lang == "he":
                     goodbye_response = "בשמחה! אם תצטרך עזרה בעתיד, אני כאן 😊"
@@ -365,54 +1039,16 @@ class ChatService:
                     goodbye_response = "להתראות! אם תצטרך עזרה בעתיד, אני כאן 😊"
                 else:
                     goodbye_response = "Goodbye! If you need help in the future, I'm here 😊"
-            session["history"].append({"role": "assistant", "content": goodbye_response})
+            self._append_history(session, "assistant", goodbye_response)
             return goodbye_response, session
 
         # Handle lead collection flow
         if session.get("interested_lead_pending"):
             logger.info(f"[CHAT_SERVICE] 🔄 Lead collection mode active - processing user input")
-            return self._handle_lead_collection(question, session)
-        
-        # Check for confirmation responses BEFORE treating as vague input
-        confirmation_words = ["כן", "yes", "אוקיי", "okay", "ok", "טוב", "בסדר", "sure", "נכון", "בטח"]
-        question_lower = question.lower().strip()
-        
-        if question_lower in confirmation_words and len(session.get("history", [])) > 0:
-            logger.info(f"[CHAT_SERVICE] ✅ Confirmation detected: '{question}' - using Response Variation Service")
-            
-            # Get the last bot message to understand context
-            last_bot_message = ""
-            for msg in reversed(session.get("history", [])):
-                if msg.get("role") == "assistant":
-                    last_bot_message = msg.get("content", "")
-                    break
-            
-            # Use existing Response Variation Service for varied responses
-            session_id = self._get_session_id(session)
-            lang = detect_language(question)
-            
-            # Determine response category based on conversation context
-            if "מחיר" in last_bot_message or "price" in last_bot_message.lower():
-                category = "pricing_follow"
-            elif "טכני" in last_bot_message or "technical" in last_bot_message.lower():
-                category = "technical_follow"
-            else:
-                category = "general_help"
-            
-            # Get varied response from Response Variation Service
-            varied_response = self.response_variation.select_varied_response(
-                category=category,
-                language=lang,
-                session_id=session_id,
-                context="confirmation"
-            )
-            
-            logger.info(f"[RESPONSE_VARIATION] Generated varied confirmation response (category: {category})")
-            session["history"].append({"role": "assistant", "content": varied_response})
-            return varied_response, session
+            return self._handle_lead_collection(question, session, question_lang, stream_callback, question_lower)
         
         # Check for vague input (only for truly unclear messages)
-        if len(question.strip()) < 3 and question_lower not in confirmation_words:
+        if len(question_lower) < 3:
             logger.info(f"[CHAT_SERVICE] Very short input - will try to understand and offer help naturally")
             # Don't immediately set lead_pending - let GPT try to understand first
             # If GPT can't help, then we'll offer assistance as a natural follow-up
@@ -420,32 +1056,18 @@ class ChatService:
         # Generate AI response using OpenAI with enhanced context
         try:
             # ⚡ PERFORMANCE OPTIMIZATION: Use lighter context for simple questions
-            lang = detect_language(question)
-            
-            # Check if this is a simple question that doesn't need heavy context
-            simple_patterns = ["היי", "שלום", "מה", "כמה", "איך", "hello", "hi", "what", "how", "much"]
-            is_simple_question = len(question.split()) <= 3 and any(pattern in question.lower() for pattern in simple_patterns)
-            
-            if is_simple_question:
-                # Fast path for simple questions - minimal context
-                context = self._get_context_from_chroma(question, "general")
-                logger.info(f"[PERFORMANCE] ⚡ Fast path for simple question: '{question}'")
-            else:
-                # Full context for complex questions
+            lang = question_lang
+            
+            # ⚡ PERFORMANCE: Knowledge retrieval depends only on the question and its language - start it
+            # now (past every early-return route, so it is never wasted) and overlap it with the signal checks below
+            retrieval_future = None
+            enriched_context = ""
+            if not is_simple_question:
+                retrieval_future = self._executor.submit(
+                    self._get_enhanced_context_retrieval, question, None, question_lang
+                )
                 enriched_context = self._build_enriched_context(question, session, greeting_context)
                 intent_name = contextual_intent if contextual_intent else "general"
-                context_docs = self._get_enhanced_context_retrieval(question, intent_name, lang)
-                
-                # Build context string from documents
-                context_parts = []
-                for doc, meta in context_docs:
-                    context_parts.append(f"Context ({meta.get('intent', 'general')}): {doc}")
-                
-                context = "\n\n".join(context_parts)
-                
-                # Add enriched context signals
-                if enriched_context:
-                    context = f"{enriched_context}\n\n{context}"
             
             # Buying intent detection now handled at the start of the method
             # Check if buying intent was already detected earlier
@@ -454,13 +1076,36 @@ class ChatService:
                 logger.info(f"[BUYING_INTENT] Using previously detected buying intent")
             
             # Check for product-market fit (for non-buying intent cases)
-            product_market_fit_detected = self._detect_product_market_fit(question, session)
+            product_market_fit_detected = self._detect_product_market_fit(question, session, question_lower)
             if product_market_fit_detected and not buying_intent_detected:
                 logger.info(f"[LEAD_TRANSITION] 🎯 Product-market fit detected - will answer question then offer assistance")
                 session["product_market_fit_detected"] = True
                 # Continue to generate answer first, then we'll add assistance offer
             
-            answer = self._generate_ai_response_with_enhanced_context(question, session, context, is_simple_question)
+            # ⚡ PERFORMANCE: If this answer will push engagement over the lead threshold, ask for the
+            # lead details in the same completion instead of a second GPT call afterwards
+            lead_request = (not buying_intent_detected and
+                            self._should_initiate_lead_collection_from_engagement(session, answer_pending=True))
+            
+            if is_simple_question:
+                # Fast path for simple questions - minimal context
+                context = self._get_context_from_chroma(question, "general")
+                logger.info(f"[PERFORMANCE] ⚡ Fast path for simple question: '{question}'")
+            else:
+                # Full context for complex questions
+                try:
+                    context_docs = retrieval_future.result(timeout=10)
+                except FutureTimeoutError:
+                    logger.warning("[PERFORMANCE] Prefetched knowledge retrieval timed out - retrieving inline")
+                    context_docs = self._get_enhanced_context_retrieval(question, None, question_lang)
+                
+                # Build context string from the enriched signals and documents
+                context = _format_context(context_docs, enriched_context)
+            
+            answer = self._generate_ai_response_with_enhanced_context(question, session, context, is_simple_question,
+                                                                      stream_callback=stream_callback,
+                                                                      lead_request=lead_request, lang=question_lang,
+                                                                      semantic_cache=_is_generic_turn(session, enriched_context))
             
             # 🔧 FIX 4: IMPROVED VAGUE GPT FALLBACK WITH CHROMA RETRY
             if not answer or is_vague_gpt_answer(answer):
@@ -471,16 +1116,18 @@ class ChatService:
                 if context_fallback and len(context_fallback.strip()) > 100:
                     logger.info(f"[VAGUE_FALLBACK] ✅ Retrieved Chroma context ({len(context_fallback)} chars) - generating GPT response")
                     # ✅ FIXED: Use GPT with Chroma context instead of raw Chroma content
-                    answer = self._generate_ai_response_with_enhanced_context(question, session, context_fallback, is_simple_question)
+                    answer = self._generate_ai_response_with_enhanced_context(question, session, context_fallback, is_simple_question,
+                                                                              lead_request=lead_request, lang=question_lang)
                     # 🔧 FIX 3: CLEAN SESSION FLAGS after successful fallback
                     session.pop("interested_lead_pending", None)
                     session.pop("lead_request_count", None)
                     self._mark_information_provided(session)
                 else:
                     # Second try: Generate alternative response
-                    alternative_response = self._generate_intelligent_response("helpful_alternative", question, session)
+                    alternative_response = self._generate_intelligent_response("helpful_alternative", question, session, lang=question_lang)
                     if alternative_response and not is_vague_gpt_answer(alternative_response):
                         answer = alternative_response
+                        lead_request = False  # The alternative doesn't carry the lead request
                         logger.info(f"[VAGUE_FALLBACK] ✅ Generated better alternative response")
                         self._mark_information_provided(session)
                     else:
@@ -488,21 +1135,21 @@ class ChatService:
                         if session.get("information_provided", False) or session.get("helpful_responses_count", 0) >= 1:
                             logger.info(f"[VAGUE_FALLBACK] Could not generate helpful response - offering assistance after providing info")
                             session["interested_lead_pending"] = True
-                            assistance_response = self._generate_intelligent_response("vague_gpt_response", question, session)
-                            session["history"].append({"role": "assistant", "content": assistance_response})
+                            assistance_response = self._generate_intelligent_response("vague_gpt_response", question, session, lang=question_lang)
+                            self._append_history(session, "assistant", assistance_response)
                             return assistance_response, session
                         else:
                             # ✅ FIXED: Generate helpful response via GPT instead of hardcoded text
                             logger.info(f"[VAGUE_FALLBACK] Generating helpful response via GPT instead of lead collection")
-                            gpt_helpful_response = self._generate_intelligent_response("helpful_fallback", question, session)
+                            gpt_helpful_response = self._generate_intelligent_response("helpful_fallback", question, session, lang=question_lang)
                             if gpt_helpful_response:
-                                session["history"].append({"role": "assistant", "content": gpt_helpful_response})
+                                self._append_history(session, "assistant", gpt_helpful_response)
                                 return gpt_helpful_response, session
                             else:
                                 # Final fallback only if GPT generation fails
                                 logger.warning(f"[VAGUE_FALLBACK] GPT generation failed - using minimal fallback")
                                 minimal_response = self._generate_ai_response("אני כאן לעזור לך! איך אני יכולה לסייע?", session)
-                                session["history"].append({"role": "assistant", "content": minimal_response})
+                                self._append_history(session, "assistant", minimal_response)
                                 return minimal_response, session
             
             # Mark that helpful information was provided (if we have a good answer)
@@ -519,33 +1166,38 @@ class ChatService:
             # ✅ ENHANCED: Check for high engagement that warrants immediate lead collection
             elif self._should_initiate_lead_collection_from_engagement(session) and answer:
                 logger.info(f"[LEAD_TRANSITION] 🎯 High engagement detected - initiating natural lead collection")
-                # ✅ GPT-FIRST: Generate natural lead collection transition via GPT
-                lead_transition = self._generate_intelligent_response("high_engagement_lead_collection", question, session)
+                if lead_request:
+                    # The main answer already closes with the request for contact details
+                    lead_transition = None
+                    session["interested_lead_pending"] = True
+                else:
+                    # ✅ GPT-FIRST: Generate natural lead collection transition via GPT
+                    lead_transition = self._generate_intelligent_response("high_engagement_lead_collection", question, session, lang=question_lang)
                 if lead_transition:
                     answer = f"{answer}\n\n{lead_transition}"
                     session["interested_lead_pending"] = True
-                else:
+                elif not lead_request:
                     # Fallback to assistance offer if GPT generation fails
-                    assistance_offer = self._generate_assistance_offer(question, session, lang)
+                    assistance_offer = self._generate_assistance_offer(question, session, lang, question_lower)
                     if assistance_offer:
                         answer = f"{answer}\n\n{assistance_offer}"
                         session["interested_lead_pending"] = True
             # If product-market fit was detected (and no buying intent), add helpful offer to the answer
             elif product_market_fit_detected and answer:
                 logger.info(f"[LEAD_TRANSITION] Adding helpful assistance offer to answer")
-                assistance_offer = self._generate_assistance_offer(question, session, lang)
+                assistance_offer = self._generate_assistance_offer(question, session, lang, question_lower)
                 if assistance_offer:
                     answer = f"{answer}\n\n{assistance_offer}"
                     session["interested_lead_pending"] = True  # Now it's appropriate to collect lead
             
             # 🎯 RESPONSE VARIATION: Add natural ending to avoid repetitive patterns
             # SKIP if this is a technical question, or goodbye/thank you to avoid lead collection triggers
-            is_info_only = (self._is_technical_question(question) or
-                           self._is_goodbye_or_thanks(question))
+            is_info_only = (self._is_technical_question(question, question_lower) or
+                           self._is_goodbye_or_thanks(question, question_lower))
             
             if not is_info_only:
                 session_id = self._get_session_id(session)
-                lang = detect_language(question)
+                lang = question_lang
                 
                 # Only add ending if appropriate (not too long, not already ending with question)
                 if (self.response_variation.should_add_ending(answer, session_id) and 
@@ -563,7 +1215,7 @@ class ChatService:
                 logger.info(f"[RESPONSE_VARIATION] Skipping response variation for info-only response")
             
             # Success - add to history and return
-            session["history"].append({"role": "assistant", "content": answer})
+            self._append_history(session, "assistant", answer)
             
             # Performance summary
             total_time = time.time() - overall_start_time
@@ -578,17 +1230,37 @@ class ChatService:
             # Try to provide a helpful fallback response instead of immediately going to lead collection
             fallback_response = self._generate_fallback_response(question, session)
             if fallback_response:
-                session["history"].append({"role": "assistant", "content": fallback_response})
+                self._append_history(session, "assistant", fallback_response)
                 return fallback_response, session
             else:
                 # Only if fallback fails, then offer assistance
                 session["interested_lead_pending"] = True
-                intelligent_response = self._generate_intelligent_response("technical_error", question, session)
-                session["history"].append({"role": "assistant", "content": intelligent_response})
+                intelligent_response = self._generate_intelligent_response("technical_error", question, session, lang=question_lang)
+                self._append_history(session, "assistant", intelligent_response)
                 return intelligent_response, session
     
-    def _handle_lead_collection(self, question, session):
-        """Handle lead collection flow"""
+    def _send_lead_email(self, lead_text):
+        """Format and send the lead notification (runs on the email executor)"""
+        try:
+            email_success = self.email_service.send_email_notification(
+                subject="🆕 New Lead from Atarize Chatbot",
+                message=format_lead_notification(lead_text)
+            )
+        except Exception as e:
+            logger.error(f"[LEAD_FLOW] ❌ Email notification crashed: {e}")
+            email_success = False
+        
+        if email_success:
+            logger.info(f"[LEAD_FLOW] ✅ EMAIL NOTIFICATION SENT SUCCESSFULLY!")
+        else:
+            logger.error(f"[LEAD_FLOW] ❌ EMAIL NOTIFICATION FAILED!")
+            logger.error(f"[LEAD_FLOW] Lead details will be lost! Consider manual follow-up.")
+        return email_success
+    
+    def _handle_lead_collection(self, question, session, lang=None, stream_callback=None, question_lower=None):
+        """Handle lead collection flow (lang: the question's language, detected here if not given)"""
+        if lang is None:
+            lang = detect_language(question)
         logger.info(f"[LEAD_FLOW] 🚀 LEAD COLLECTION MODE ACTIVE")
         logger.info(f"[LEAD_FLOW] Processing user input: '{question}'")
         
@@ -597,27 +1269,24 @@ class ChatService:
         is_buying_intent = session.get("buying_intent_detected", False)
         
         # Check for exit phrases
-        exit_phrases = ["היי", "עזוב", "לא עכשיו", "שכח מזה", "לא רוצה", "תודה לא", "די", "סגור"]
-        question_lower = question.lower().strip()
+        if question_lower is None:
+            question_lower = question.lower().strip()
         
-        for phrase in exit_phrases:
-            if phrase in question_lower:
-                logger.info(f"[LEAD_FLOW] ✅ Exit phrase detected: '{phrase}' - resetting lead mode")
-                session.pop("interested_lead_pending", None)
-                session.pop("lead_request_count", None)
-                session.pop("product_market_fit_detected", None)
-                session.pop("buying_intent_detected", None)
-                lang = detect_language(question)
-                if lang == "he":
-                    return "בסדר גמור! אם תרצה עזרה בעתיד, אני כאן. איך אפשר לעזור? 😊", session
-                else:
-                    return "No worries, let's continue. Feel free to ask me anything! 😊", session
+        exit_match = _EXIT_RE.search(question_lower)
+        if exit_match:
+            logger.info(f"[LEAD_FLOW] ✅ Exit phrase detected: '{exit_match.group()}' - resetting lead mode")
+            session.pop("interested_lead_pending", None)
+            session.pop("lead_request_count", None)
+            session.pop("product_market_fit_detected", None)
+            session.pop("buying_intent_detected", None)
+            if lang == "he":
+                return "בסדר גמור! אם תרצה עזרה בעתיד, אני כאן. איך אפשר לעזור? 😊", session
+            else:
+                return "No worries, let's continue. Feel free to ask me anything! 😊", session
         
         # Check for process questions during lead collection - answer them first
-        process_questions = ["איך התהליך עובד", "איך זה עובד", "איך זה יעבוד", "מה התהליך", "how does the process work", "how does it work"]
-        if any(pattern in question_lower for pattern in process_questions):
+        if _LEAD_PROCESS_RE.search(question_lower):
             logger.info(f"[LEAD_FLOW] Process question during lead collection - providing answer first")
-            lang = detect_language(question)
             if lang == "he":
                 process_answer = "התהליך פשוט: קודם נאסוף את הפרטים שלך, אז מישהו מהצוות יחזור אליך תוך 24 שעות להתחיל את ההקמה. בתהליך נגדיר יחד מה הבוט צריך לדעת ולענות, ובתוך 2-5 ימי עבודה תקבל את הבוט המותאם אישית לעסק שלך.\n\nאפשר שם מלא, טלפון ואימייל?"
             else:
@@ -637,7 +1306,6 @@ class ChatService:
         # For buying intent, provide context first then ask for details
         if is_buying_intent or session.get("conversion_critical_moment"):
             logger.info(f"[LEAD_FLOW] 🎯 Buying intent detected - providing contextual lead collection")
-            lang = detect_language(question)
             
             # First, acknowledge their excitement and briefly explain the process
             if lang == "he":
@@ -663,11 +1331,11 @@ class ChatService:
             session.pop("product_market_fit_detected", None)
             session.pop("buying_intent_detected", None)
             # Continue to normal processing
-            return self._generate_ai_response_with_enhanced_context(question, session, ""), session
+            return self._generate_ai_response_with_enhanced_context(question, session, "",
+                                                                    stream_callback=stream_callback, lang=lang), session
         else:
             # Generate context-aware lead request based on use case
             if is_pmf_triggered:
-                lang = detect_language(question)
                 use_case = session.get("specific_use_case")
                 
                 if use_case == "education" and lang == "he":
@@ -682,40 +1350,24 @@ class ChatService:
                 return context_message, session
             else:
                 # Ask for details again with intelligent response
-                intelligent_response = self._generate_intelligent_response("lead_request", question, session)
+                intelligent_response = self._generate_intelligent_response("lead_request", question, session, lang=lang,
+                                                                           stream_callback=stream_callback)
                 return intelligent_response, session
     
     def _validate_session_state(self, session):
         """Validate session state consistency and fix conflicts"""
-        # Rule 1: lead_collected and interested_lead_pending are mutually exclusive
-        if session.get("lead_collected") and session.get("interested_lead_pending"):
-            logger.warning("[SESSION_FIX] ⚠️ Conflict: lead_collected=True and interested_lead_pending=True")
-            logger.warning("[SESSION_FIX] 🔧 Fixing: Removing interested_lead_pending (lead already collected)")
-            session.pop("interested_lead_pending", None)
-            session.pop("lead_request_count", None)
-        
-        # Rule 2: If lead_collected is True, request_count should be cleared
-        if session.get("lead_collected") and session.get("lead_request_count"):
-            logger.warning("[SESSION_FIX] ⚠️ Conflict: lead_collected=True but lead_request_count exists")
-            logger.warning("[SESSION_FIX] 🔧 Fixing: Clearing lead_request_count")
-            session.pop("lead_request_count", None)
-        
-        # Rule 3: request_count should not exist without interested_lead_pending
-        if session.get("lead_request_count") and not session.get("interested_lead_pending"):
-            logger.warning("[SESSION_FIX] ⚠️ Conflict: lead_request_count exists without interested_lead_pending")
-            logger.warning("[SESSION_FIX] 🔧 Fixing: Clearing lead_request_count")
-            session.pop("lead_request_count", None)
-        
-        # Rule 4: buying_intent_detected should not exist without interested_lead_pending (unless lead is collected)
-        if session.get("buying_intent_detected") and not session.get("interested_lead_pending") and not session.get("lead_collected"):
-            logger.warning("[SESSION_FIX] ⚠️ Conflict: buying_intent_detected exists without interested_lead_pending and no collected lead")
-            logger.warning("[SESSION_FIX] 🔧 Fixing: Clearing buying_intent_detected")
-            session.pop("buying_intent_detected", None)
-        
-        # Rule 5: Clean up conversion_critical_moment after lead is collected
-        if session.get("lead_collected") and session.get("conversion_critical_moment"):
-            logger.info("[SESSION_FIX] 🔧 Lead collected - clearing conversion_critical_moment flag")
-            session.pop("conversion_critical_moment", None)
+        # ⚡ PERFORMANCE: Read the five lead flags once and look up which rules fire for that
+        # combination - a consistent session (the common case) maps to no fixes at all
+        get = session.get
+        signature = ((bool(get("lead_collected")) << 4) | (bool(get("interested_lead_pending")) << 3) |
+                     (bool(get("lead_request_count")) << 2) | (bool(get("buying_intent_detected")) << 1) |
+                     bool(get("conversion_critical_moment")))
+        for rule in _SESSION_FIX_TABLE[signature]:
+            level, messages, stale_keys = _SESSION_FIX_RULES[rule]
+            for message in messages:
+                logger.log(level, message)
+            for key in stale_keys:
+                session.pop(key, None)
         
         # Rule 6: History should always be a list
         if "history" in session and not isinstance(session["history"], list):
@@ -723,31 +1375,31 @@ class ChatService:
             logger.warning("[SESSION_FIX] 🔧 Fixing: Resetting history to empty list")
             session["history"] = []
         
-        # Log current session state for debugging
-        logger.debug(f"[SESSION_STATE] greeted={session.get('greeted', False)}, "
-                    f"intro_given={session.get('intro_given', False)}, "
-                    f"lead_pending={session.get('interested_lead_pending', False)}, "
-                    f"lead_collected={session.get('lead_collected', False)}, "
-                    f"buying_intent={session.get('buying_intent_detected', False)}, "
-                    f"info_provided={session.get('information_provided', False)}, "
-                    f"helpful_count={session.get('helpful_responses_count', 0)}, "
-                    f"request_count={session.get('lead_request_count', 0)}, "
-                    f"history_length={len(session.get('history', []))}")
+        # Log current session state for debugging (nine lookups - only when DEBUG is on)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"[SESSION_STATE] greeted={session.get('greeted', False)}, "
+                        f"intro_given={session.get('intro_given', False)}, "
+                        f"lead_pending={session.get('interested_lead_pending', False)}, "
+                        f"lead_collected={session.get('lead_collected', False)}, "
+                        f"buying_intent={session.get('buying_intent_detected', False)}, "
+                        f"info_provided={session.get('information_provided', False)}, "
+                        f"helpful_count={session.get('helpful_responses_count', 0)}, "
+                        f"request_count={session.get('lead_request_count', 0)}, "
+                        f"history_length={len(session.get('history', []))}")
 
-    def _generate_intelligent_response(self, context_type, user_input, session, reason=""):
-        """Generate contextually appropriate, language-aware responses using GPT"""
-        from utils.text_utils import detect_language
-        
-        lang = detect_language(user_input)
-        
-        # Get context from Chroma for better responses
-        context = self._get_context_from_chroma(user_input, context_type)
+    def _generate_intelligent_response(self, context_type, user_input, session, reason="", lang=None,
+                                       stream_callback=None):
+        """Generate contextually appropriate, language-aware responses using GPT (streamed to stream_callback if given)"""
+        if lang is None:
+            lang = detect_language(user_input)
         
         # 🔧 UX FIX: Simplified cache for faster lookup
         cache_key = f"{context_type}:{user_input[:50]}"  # Shortened key for performance
         cached_response = self.cache_manager.get(cache_key, session)
         if cached_response:
             logger.info(f"[CACHE_HIT] Fast cached response for {context_type}")
+            if stream_callback:
+                stream_callback(cached_response)
             return cached_response
         
         # 🔧 QA FIX: Add explicit language consistency instruction
@@ -755,6 +1407,8 @@ class ChatService:
         
         # Build context-specific prompt
         if context_type == "vague_input":
+            # ⚡ PERFORMANCE: Only this prompt uses Chroma context - the others skip the serial query
+            context = self._get_context_from_chroma(user_input, context_type)
             if lang == "he":
                 context_prompt = f"המשתמש שלח הודעה קצרה או לא ברורה: '{user_input}'. תענה בחום ותבקש ממנו לפרט מה הוא מחפש. {lang_instruction} הקשר רלוונטי: {context}"
             else:
@@ -812,25 +1466,44 @@ class ChatService:
         try:
             # Create messages for OpenAI
             messages = [
-                {"role": "system", "content": self.system_prompt},
+                self._system_message,
                 {"role": "user", "content": context_prompt}
             ]
             
-            # Call OpenAI for intelligent response
-            completion = self.openai_client.chat.completions.create(
-                model="gpt-4-turbo",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=400  # Increased to prevent truncation
-            )
-            
-            response = completion.choices[0].message.content.strip()
+            # ⚡ PERFORMANCE: Smaller model and generation budget for these supporting replies
+            max_tokens = _HELPER_MAX_TOKENS.get(context_type, 400)
+            if stream_callback:
+                # ⚡ PERFORMANCE: This reply is the whole answer - forward tokens as they arrive
+                response = self._stream_completion(
+                    stream_callback,
+                    model=_HELPER_MODEL,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=max_tokens
+                )
+            else:
+                # Call OpenAI for intelligent response
+                def create_response():
+                    completion = self.openai_client.chat.completions.create(
+                        model=_HELPER_MODEL,
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=max_tokens
+                    )
+                    log_completion_usage(completion, _HELPER_MODEL)
+                    return completion.choices[0].message.content.strip()
+                
+                # ⚡ PERFORMANCE: Only identical helper prompts arriving together share one call
+                inflight_key = hashlib.blake2b(
+                    f"{_HELPER_MODEL}:{max_tokens}:{context_prompt}".encode(), digest_size=16
+                ).hexdigest()
+                response, _ = self._single_flight(inflight_key, create_response)
             # Ensure complete sentences
             response = self._ensure_complete_sentence(response)
             logger.info(f"[INTELLIGENT_RESPONSE] Generated {context_type} response for '{user_input[:30]}...' (length: {len(response)} chars)")
             
             # 💾 PERFORMANCE: Cache response for future fast lookup
-            self.cache_manager.set(f"{context_type}:{user_input}", response, session)
+            self.cache_manager.set(cache_key, response, session)
             
             return response
             
@@ -842,13 +1515,14 @@ class ChatService:
             else:
                 return "I'd love to help you! Would you like someone from our team to follow up? Please share your name, phone, and email."
     
-    def _generate_assistance_offer(self, question, session, lang):
+    def _generate_assistance_offer(self, question, session, lang, question_lower=None):
         """Generate a varied assistance offer using response variation service"""
         # Get session ID for tracking
         session_id = self._get_session_id(session)
         
         # Determine category based on question context
-        question_lower = question.lower()
+        if question_lower is None:
+            question_lower = question.lower()
         if "pricing" in question_lower or "cost" in question_lower or "מחיר" in question_lower:
             category = "pricing_follow"
         elif "technical" in question_lower or "integration" in question_lower or "טכני" in question_lower:
@@ -872,9 +1546,14 @@ class ChatService:
     def _generate_fallback_response(self, question, session):
         """Generate a helpful fallback response when technical errors occur"""
         try:
-            lang = detect_language(question)
+            lang = _question_language(question, session)
             context = self._get_context_from_chroma(question, "general")
             
+            # ⚡ PERFORMANCE: Don't re-enter the slow model on the error path without useful context
+            if not self._should_offer_help(context, question):
+                logger.info(f"[FALLBACK] No actionable context - using static fallback ({lang})")
+                return _STATIC_FALLBACK.get(lang, _STATIC_FALLBACK["en"])
+            
             if lang == "he":
                 fallback_prompt = f"""המשתמש שאל: '{question}'. 
                 
@@ -890,12 +1569,12 @@ class ChatService:
                 
                 If there's not enough information, write a general helpful response about Atarize's service."""
             
-            # Add language enforcement to system prompt
+            # Add language enforcement to the user message (keeps the system prompt prefix cacheable)
             lang_instruction = "Respond in Hebrew" if lang == "he" else "Respond in English"
-            enhanced_system_prompt = f"{self.system_prompt}\n\nCRITICAL: {lang_instruction} - match the user's language exactly."
+            fallback_prompt = f"{fallback_prompt}\n\nCRITICAL: {lang_instruction} - match the user's language exactly."
             
             messages = [
-                {"role": "system", "content": enhanced_system_prompt},
+                self._system_message,
                 {"role": "user", "content": fallback_prompt}
             ]
             
@@ -914,28 +1593,25 @@ class ChatService:
             logger.error(f"[FALLBACK] Failed to generate fallback: {e}")
             return None
 
-    def _should_offer_help(self, context, user_input):
+    def _should_offer_help(self, context, user_input, context_lower=None):
         """Determine if we should offer help based on available context"""
         # Only offer help if we have substantial context
         if not context or len(context.strip()) < 50:
             return False
         
         # Check if context contains specific, actionable information
-        context_lower = context.lower()
-        has_specific_info = any(keyword in context_lower for keyword in [
-            "pricing", "cost", "setup", "integration", "features", "examples",
-            "מחיר", "עלות", "הקמה", "אינטגרציה", "תכונות", "דוגמאות"
-        ])
-        
-        return has_specific_info
+        if context_lower is None:
+            context_lower = context.lower()
+        return _SPECIFIC_INFO_RE.search(context_lower) is not None
 
-    def _generate_helpful_offer(self, context, user_input, lang="he", session=None):
+    def _generate_helpful_offer(self, context, user_input, lang="he", session=None, context_lower=None):
         """Generate a varied, helpful offer based on context using response variation service"""
         # Get session ID for tracking
         session_id = self._get_session_id(session) if session else "default"
         
         # Determine category based on context
-        context_lower = context.lower()
+        if context_lower is None:
+            context_lower = context.lower()
         if "pricing" in context_lower or "מחיר" in context_lower or "cost" in context_lower:
             category = "pricing_follow"
         elif "integration" in context_lower or "אינטגרציה" in context_lower or "technical" in context_lower:
@@ -954,8 +1630,8 @@ class ChatService:
         logger.info(f"[RESPONSE_VARIATION] Generated varied offer (category: {category}, lang: {lang})")
         return varied_offer
 
-    def _generate_ai_response(self, question, session):
-        """Generate AI response using OpenAI"""
+    def _generate_ai_response(self, question, session, stream_callback=None, lang=None):
+        """Generate AI response using OpenAI (streamed to stream_callback if given; lang: the question's language)"""
         try:
             # 🚀 PERFORMANCE: Check cache first for fast response
             cached_response = self.cache_manager.get(question, session)
@@ -966,34 +1642,45 @@ class ChatService:
                     return cached_response.get("answer", "")
                 return cached_response
             
-            # Detect language and add language instruction
-            lang = detect_language(question)
+            # Add language instruction (detected here only if the caller didn't pass it)
+            if lang is None:
+                lang = detect_language(question)
             lang_instruction = "Respond in Hebrew" if lang == "he" else "Respond in English"
             
             # Prepare messages for OpenAI with language enforcement
-            enhanced_system_prompt = f"{self.system_prompt}\n\nIMPORTANT: {lang_instruction} - match the user's language exactly."
-            messages = [{"role": "system", "content": enhanced_system_prompt}]
-            
-            # ⚡ OPTIMIZED: Minimal conversation history for speed
-            history = session.get("history", [])
-            if len(history) > 3:  # Keep only last 3 messages for faster processing
-                history = history[-3:]
-            
-            messages.extend(history)
+            # (instruction goes in its own message so the system prompt prefix stays byte-identical)
+            # ⚡ OPTIMIZED: Only the last 3 history messages for speed
+            messages = [
+                self._system_message,
+                {"role": "system", "content": f"IMPORTANT: {lang_instruction} - match the user's language exactly."},
+                *self._recent_history(session, 3, _BASIC_HISTORY_TOKEN_BUDGET)
+            ]
             
-            # Log token usage
-            log_token_usage(messages, "gpt-4-turbo")
+            # Log token usage (local tokenization only when debugging, on the background logger thread)
+            if logger.isEnabledFor(logging.DEBUG):
+                log_token_usage_async(messages, "gpt-4-turbo")
             
             # ⚡ OPTIMIZED: Fast OpenAI call with reduced tokens
             logger.debug(f"[OPENAI] Fast GPT-4 Turbo call with {len(messages)} messages")
-            completion = self.openai_client.chat.completions.create(
-                model="gpt-4-turbo",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=250  # Reduced for faster generation
-            )
-            
-            answer = completion.choices[0].message.content.strip()
+            if stream_callback:
+                # ⚡ PERFORMANCE: Forward tokens as they arrive; the full text is still buffered for caching
+                answer = self._stream_completion(
+                    stream_callback,
+                    model="gpt-4-turbo",
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=250
+                )
+            else:
+                completion = self.openai_client.chat.completions.create(
+                    model="gpt-4-turbo",
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=250  # Reduced for faster generation
+                )
+                
+                log_completion_usage(completion, "gpt-4-turbo")
+                answer = completion.choices[0].message.content.strip()
             
             # Ensure complete sentences - if response ends mid-sentence, truncate to last complete sentence
             answer = self._ensure_complete_sentence(answer)
@@ -1017,54 +1704,38 @@ class ChatService:
         if not text or len(text) < 10:  # Very short responses are probably complete
             return text
             
-        # Hebrew sentence endings
-        hebrew_sentence_endings = ['!', '?', '.', ':', '।', '؟', '؛']
-        
         # Check if the text already ends properly
-        if text[-1] in hebrew_sentence_endings:
+        if text[-1] in _SENTENCE_ENDINGS:
             return text
             
-        # Find the last complete sentence
-        last_good_pos = -1
-        for i, char in enumerate(text):
-            if char in hebrew_sentence_endings:
-                # Look ahead to see if there's meaningful content after this
-                remaining = text[i+1:].strip()
-                if len(remaining) > 3:  # More than just a few characters left
-                    last_good_pos = i + 1
-                else:
-                    # This might be the end, keep the ending punctuation
-                    return text[:i+1]
-        
-        # If we found a good truncation point, use it
-        if last_good_pos > 0:
-            return text[:last_good_pos].strip()
-            
-        # If no good truncation point found, check for common incomplete patterns
-        incomplete_patterns = [
-            'נ', 'ה', 'ו', 'ב', 'מ', 'ל', 'כ', 'ש',  # Hebrew prefixes that suggest incomplete words
-            'המ', 'העל', 'הת', 'את',  # Common Hebrew incomplete endings
-            'אי', 'בי', 'על', 'מה'   # Other incomplete patterns
-        ]
+        # ⚡ PERFORMANCE: Find the last sentence ending with C-level rfind scans instead of a per-char loop
+        last_end = max(text.rfind(char) for char in _SENTENCE_ENDINGS)
+        if last_end >= 0:
+            # Keep the ending punctuation; only strip when dropping a longer unfinished tail
+            if len(text[last_end + 1:].strip()) > 3:
+                return text[:last_end + 1].strip()
+            return text[:last_end + 1]
         
-        # Look for word boundaries and avoid cutting mid-word
+        # No sentence ending at all - drop the (likely cut-off) last word
         words = text.split()
         if len(words) > 1:
-            # Remove the last word if it looks incomplete
-            last_word = words[-1]
-            if (len(last_word) < 3 or 
-                any(last_word.endswith(pattern) for pattern in incomplete_patterns) or
-                not any(char in hebrew_sentence_endings for char in last_word)):
-                return ' '.join(words[:-1]) + '.'
+            return ' '.join(words[:-1]) + '.'
         
-        # If all else fails, add a period if it doesn't end with punctuation
-        if text and text[-1] not in hebrew_sentence_endings:
-            return text + '.'
-            
-        return text
+        return text + '.'
 
-    def _generate_ai_response_with_context(self, question, session, context_type="general"):
-        """Generate AI response with enhanced context from Chroma"""
+    def _generate_ai_response_with_context(self, question, session, context_type="general", stream_callback=None,
+                                           model=None, lang=None):
+        """
+        Generate AI response with enhanced context from Chroma (streamed to stream_callback if given).
+        The templated lead confirmation defaults to the fast helper model, everything else to GPT-4 Turbo.
+        """
+        if model is None:
+            model = _HELPER_MODEL if context_type == "lead_confirmation" else "gpt-4-turbo"
+        if lang is None:
+            lang = detect_language(question)
+        if not _OPENAI_BREAKER.allow():
+            logger.warning("[OPENAI_CONTEXT] Circuit open - skipping GPT call")
+            return _OPENAI_UNAVAILABLE_MESSAGES[lang]
         try:
             # Get context from Chroma
             context = self._get_context_from_chroma(question, context_type)
@@ -1072,50 +1743,72 @@ class ChatService:
             # Build enhanced prompt with context
             enhanced_prompt = self._build_contextual_prompt(question, context, context_type)
             
-            # Prepare messages for OpenAI
+            # Prepare messages for OpenAI with the last 8 history messages (leaves room for context)
             messages = [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": enhanced_prompt}
+                self._system_message,
+                {"role": "user", "content": enhanced_prompt},
+                *self._recent_history(session, 8, _CONTEXT_HISTORY_TOKEN_BUDGET)
             ]
             
-            # Add conversation history (limit to prevent token overflow)
-            history = session.get("history", [])
-            if len(history) > 8:  # Keep last 8 messages to leave room for context
-                history = history[-8:]
-            
-            # Add history as separate messages
-            for msg in history:
-                messages.append(msg)
-            
-            # Log token usage
-            log_token_usage(messages, "gpt-4-turbo")
+            # Log token usage (local tokenization only when debugging, on the background logger thread)
+            if logger.isEnabledFor(logging.DEBUG):
+                log_token_usage_async(messages, model)
             
             # Call OpenAI
-            logger.debug(f"[OPENAI_CONTEXT] Calling GPT-4 Turbo with enhanced context")
-            completion = self.openai_client.chat.completions.create(
-                model="gpt-4-turbo",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=450  # Reduced slightly but still allows complete sentences
-            )
-            
-            answer = completion.choices[0].message.content.strip()
+            logger.debug(f"[OPENAI_CONTEXT] Calling {model} with enhanced context ({context_type})")
+            # ⚡ PERFORMANCE: Capped at 300 - answers are short and the first token no longer waits on the tail
+            max_tokens = self._adaptive_max_tokens(session, 300)
+            if stream_callback:
+                answer = self._stream_completion(
+                    stream_callback,
+                    model=model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=max_tokens
+                )
+            else:
+                completion = self.openai_client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=max_tokens
+                )
+                
+                log_completion_usage(completion, model)
+                answer = completion.choices[0].message.content.strip()
+            _OPENAI_BREAKER.record_success()
+            self._record_answer_length(session, answer)
             # Ensure complete sentences
             answer = self._ensure_complete_sentence(answer)
             logger.info(f"[OPENAI_CONTEXT] ✅ Response generated with context successfully (length: {len(answer)} chars)")
             
             return answer
             
+        except _TRANSIENT_OPENAI_ERRORS as e:
+            _OPENAI_BREAKER.record_failure()
+            logger.error(f"[OPENAI_CONTEXT] OpenAI unavailable after retries: {e}")
+            return _OPENAI_UNAVAILABLE_MESSAGES[lang]
         except Exception as e:
             logger.error(f"[OPENAI_CONTEXT] Error calling GPT with context: {e}")
             # Fallback to regular response
-            return self._generate_ai_response(question, session)
+            return self._generate_ai_response(question, session, lang=lang)
 
-    def _generate_ai_response_with_enhanced_context(self, question, session, context, is_simple_question=False):
-        """Generate AI response with enhanced context from multiple sources"""
+    def _generate_ai_response_with_enhanced_context(self, question, session, context, is_simple_question=False,
+                                                    stream_callback=None, lead_request=False, lang=None,
+                                                    semantic_cache=False):
+        """
+        Generate AI response with enhanced context from multiple sources (streamed to stream_callback if given).
+        lang is the request's question language (detected here only when not passed).
+        semantic_cache lets paraphrases from other sessions share the answer - only for generic knowledge
+        answers (see _is_generic_turn), never for prompts built from this session's state.
+        With lead_request the answer also closes by asking for the user's contact details; such answers are
+        specific to the turn, so they bypass the response caches.
+        """
+        if lang is None:
+            lang = detect_language(question)
         try:
             # 🚀 PERFORMANCE: Check cache first for fast enhanced response
-            cached_response = self.cache_manager.get(question, session)
+            cached_response = None if lead_request else self.cache_manager.get(question, session)
             if cached_response:
                 logger.info(f"[CACHE_HIT] Fast cached enhanced response for: '{question[:30]}...'")
                 # Handle both string and dict cached responses
@@ -1123,171 +1816,321 @@ class ChatService:
                     return cached_response.get("answer", "")
                 return cached_response
             
-            # Check if we should offer help based on available context
-            should_offer = self._should_offer_help(context, question)
-            lang = detect_language(question)
-            
-            # Build enhanced prompt with context-aware management
-            lang_instruction = "Respond in Hebrew" if lang == "he" else "Respond in English"
-            
-            if should_offer:
-                helpful_offer = self._generate_helpful_offer(context, question, lang, session)
-                base_prompt = f"""User question: {question}
-
-Available context and signals:
-{context}
-
-Provide a helpful, accurate, and contextual response using all available information. 
-Be conversational, professional, and address the user's specific needs based on the context provided.
-
-IMPORTANT: End your response with a specific, helpful offer: "{helpful_offer}"
-Only make this offer if you have substantial information to provide.
-
-LANGUAGE: {lang_instruction} - match the user's language exactly."""
-            else:
-                base_prompt = f"""User question: {question}
-
-Available context and signals:
-{context}
-
-Provide a helpful, accurate, and contextual response using all available information. 
-Be conversational, professional, and address the user's specific needs based on the context provided.
-
-IMPORTANT: Do NOT offer to provide more information unless you have substantial, specific details to share.
-
-LANGUAGE: {lang_instruction} - match the user's language exactly."""
-            
-            # Use context manager to create context-aware prompt
-            enhanced_prompt = context_manager.get_context_aware_prompt(session, question, base_prompt)
-            
-            # Prepare messages for OpenAI
-            messages = [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": enhanced_prompt}
-            ]
-            
-            # ⚡ ULTRA-OPTIMIZED: Minimal conversation history for maximum speed
-            history = session.get("history", [])
-            if len(history) > 2:  # Keep only last 2 messages for fastest processing
-                history = history[-2:]
-            
-            # Add history as separate messages
-            for msg in history:
-                messages.append(msg)
+            # 🚀 PERFORMANCE: Fall back to semantic cache for paraphrased questions
+            semantic_answer = (self.semantic_cache.get(question, namespace=lang)
+                               if semantic_cache and not lead_request else None)
+            if semantic_answer:
+                logger.info(f"[CACHE_HIT] Semantic cached enhanced response for: '{question[:30]}...'")
+                return semantic_answer
             
-            # Log token usage
-            log_token_usage(messages, "gpt-4-turbo")
+            # Caches still answer during an outage - only the GPT call is skipped while the circuit is open
+            if not _OPENAI_BREAKER.allow():
+                logger.warning("[OPENAI_ENHANCED] Circuit open - skipping GPT call")
+                return _OPENAI_UNAVAILABLE_MESSAGES[lang]
             
-            # ⚡ PERFORMANCE: Use faster model for simple questions
-            if is_simple_question:
-                model = "gpt-3.5-turbo"
-                max_tokens = 200
-                logger.debug(f"[OPENAI_ENHANCED] ⚡ Fast GPT-3.5 call for simple question")
-            else:
-                model = "gpt-4-turbo"
-                max_tokens = 300
-                logger.debug(f"[OPENAI_ENHANCED] Standard GPT-4 Turbo call with enhanced context")
-            
-            completion = self.openai_client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=max_tokens
+            model, messages, max_tokens, base_prompt = self._build_enhanced_request(
+                question, session, context, lang, is_simple_question, lead_request
             )
-            
-            answer = completion.choices[0].message.content.strip()
+            # Log token usage (local tokenization only when debugging, on the background logger thread)
+            if logger.isEnabledFor(logging.DEBUG):
+                log_token_usage_async(messages, model)
+            
+            # ⚡ PERFORMANCE: Sessions that violated their context before are likely to again -
+            # start the stricter regeneration in parallel so it doesn't add a second round trip
+            # Only questions that name a business type can trigger a violation worth correcting
+            speculative_correction = None
+            if session.get("_violation_prone") and context_manager.detect_business_type(question):
+                correction_prompt = self._build_correction_prompt(base_prompt, session)
+                speculative_correction = self._executor.submit(
+                    self._generate_context_correction, correction_prompt, is_simple_question
+                )
+                logger.debug(f"[CONTEXT_VALIDATION] Started speculative correction for violation-prone session")
+            
+            def create_answer():
+                if stream_callback:
+                    # ⚡ PERFORMANCE: Forward tokens as they arrive - sentence completion,
+                    # validation and caching run on the accumulated text once the stream closes
+                    return self._stream_completion(
+                        stream_callback,
+                        model=model,
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=max_tokens
+                    )
+                completion = self.openai_client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=max_tokens
+                )
+                log_completion_usage(completion, model)
+                return completion.choices[0].message.content.strip()
+            
+            # ⚡ PERFORMANCE: Identical prompts arriving together (cache warm-up races) share one call
+            inflight_key = hashlib.blake2b(
+                f"{model}:{max_tokens}:{json.dumps(messages, ensure_ascii=False)}".encode(), digest_size=16
+            ).hexdigest()
+            answer, coalesced = self._single_flight(inflight_key, create_answer)
+            if coalesced and stream_callback:
+                stream_callback(answer)
+            _OPENAI_BREAKER.record_success()
+            self._record_answer_length(session, answer)
             # Ensure complete sentences
             answer = self._ensure_complete_sentence(answer)
             
             # 🔍 CONTEXT VALIDATION: Check if response respects user context
             if not context_manager.validate_response_context(answer, session):
                 logger.warning(f"[CONTEXT_VALIDATION] Response violates user context, regenerating...")
-                # Try to regenerate with stronger context awareness
-                correction_prompt = f"""{base_prompt}
-
-CRITICAL: The user has previously stated their business type. Do NOT ask about unrelated business types.
-Current user business: {context_manager.get_context_summary(session).get('business_type', 'unknown')}
-
-Provide a response that is appropriate for the user's actual business type."""
-                
-                completion = self.openai_client.chat.completions.create(
-                    model="gpt-4-turbo",
-                    messages=[
-                        {"role": "system", "content": self.system_prompt},
-                        {"role": "user", "content": correction_prompt}
-                    ],
-                    temperature=0.7,
-                    max_tokens=300
-                )
-                answer = completion.choices[0].message.content.strip()
-                answer = self._ensure_complete_sentence(answer)
-                logger.info(f"[CONTEXT_VALIDATION] ✅ Regenerated response with proper context awareness")
+                session["_violation_prone"] = _VIOLATION_PRONE_TURNS
+                semantic_cache = False  # The corrected answer is specific to this user's business
+                answer = None
+                if speculative_correction is not None:
+                    # Speculative regeneration was started alongside the main call
+                    # Any failure of the side call (timeout, its own OpenAI errors) must not cost the user the
+                    # answer or count against the breaker - the main completion already succeeded
+                    try:
+                        answer = speculative_correction.result(timeout=_SPECULATIVE_CORRECTION_TIMEOUT)
+                    except FutureTimeoutError:
+                        logger.warning("[CONTEXT_VALIDATION] Speculative correction timed out, regenerating inline")
+                    except Exception as e:
+                        logger.warning(f"[CONTEXT_VALIDATION] Speculative correction failed ({e}), regenerating inline")
+                if answer is None:
+                    # Try to regenerate with stronger context awareness
+                    correction_prompt = self._build_correction_prompt(base_prompt, session)
+                    answer = self._generate_context_correction(correction_prompt, is_simple_question)
+            else:
+                if speculative_correction is not None:
+                    # Main answer was fine - drop the speculative regeneration (a no-op once it has started)
+                    speculative_correction.cancel()
+                # Clean answers decay the flag so one violation doesn't double every later turn
+                violation_prone = session.get("_violation_prone")
+                if violation_prone:
+                    if violation_prone > 1:
+                        session["_violation_prone"] = violation_prone - 1
+                    else:
+                        session.pop("_violation_prone", None)
             
             logger.info(f"[OPENAI_ENHANCED] ✅ Response generated with enhanced context successfully (length: {len(answer)} chars)")
             
             # 💾 PERFORMANCE: Cache enhanced response for future fast lookup
-            self.cache_manager.set(question, {"answer": answer, "cached": True, "enhanced_context": True}, session)
+            if not lead_request:
+                self.cache_manager.set(question, {"answer": answer, "cached": True, "enhanced_context": True}, session)
+                if semantic_cache:
+                    self.semantic_cache.set(question, answer, namespace=lang)
             
             return answer
             
+        except _TRANSIENT_OPENAI_ERRORS as e:
+            _OPENAI_BREAKER.record_failure()
+            logger.error(f"[OPENAI_ENHANCED] OpenAI unavailable after retries: {e}")
+            return _OPENAI_UNAVAILABLE_MESSAGES[lang]
         except Exception as e:
             logger.error(f"[OPENAI_ENHANCED] Error calling GPT with enhanced context: {e}")
             # Fallback to regular response
-            return self._generate_ai_response(question, session)
+            return self._generate_ai_response(question, session, lang=lang)
+
+    def _build_enhanced_request(self, question, session, context, lang, is_simple_question=False, lead_request=False):
+        """Build (model, messages, max_tokens, base_prompt) for an enhanced-context answer"""
+        # Check if we should offer help based on available context
+        # Lowercase the (potentially large) context once for both keyword scans
+        context_lower = context.lower() if context else ""
+        should_offer = not lead_request and self._should_offer_help(context, question, context_lower)
+        
+        # Build enhanced prompt with context-aware management
+        lang_instruction = "Respond in Hebrew" if lang == "he" else "Respond in English"
+        
+        if should_offer:
+            helpful_offer = self._generate_helpful_offer(context, question, lang, session, context_lower)
+            base_prompt = self._ENHANCED_OFFER_TEMPLATE.format(
+                question=question, context=context, offer=helpful_offer, lang_instruction=lang_instruction
+            )
+        else:
+            base_prompt = self._ENHANCED_NO_OFFER_TEMPLATE.format(
+                question=question, context=context, lang_instruction=lang_instruction
+            )
+        
+        if lead_request:
+            base_prompt += _LEAD_REQUEST_INSTRUCTION
+        
+        # Use context manager to create context-aware prompt
+        enhanced_prompt = context_manager.get_context_aware_prompt(session, question, base_prompt)
+        
+        # Prepare messages for OpenAI
+        # ⚡ ULTRA-OPTIMIZED: Only the last 2 history messages for fastest processing
+        messages = [
+            self._system_message,
+            {"role": "user", "content": enhanced_prompt},
+            *self._recent_history(session, 2, _CONTEXT_HISTORY_TOKEN_BUDGET)
+        ]
+        
+        # ⚡ PERFORMANCE: Use faster model for simple questions
+        if is_simple_question:
+            model = "gpt-3.5-turbo"
+            max_tokens = 200
+            logger.debug(f"[OPENAI_ENHANCED] ⚡ Fast GPT-3.5 call for simple question")
+        else:
+            model = "gpt-4-turbo"
+            max_tokens = 300
+            logger.debug(f"[OPENAI_ENHANCED] Standard GPT-4 Turbo call with enhanced context")
+        max_tokens = self._adaptive_max_tokens(session, max_tokens)
+        
+        return model, messages, max_tokens, base_prompt
+
+    def _adaptive_max_tokens(self, session, cap):
+        """Budget max_tokens from the session's recent answer lengths (floor .. cap)"""
+        recent = session.get("_answer_tokens_ewma")
+        if recent is None:
+            return cap
+        return int(max(_MAX_TOKENS_FLOOR, min(cap, _ANSWER_LENGTH_HEADROOM * recent)))
+
+    def _record_answer_length(self, session, answer):
+        """Update the session's EWMA of generated answer length (estimated tokens)"""
+        if not answer:
+            return
+        # cl100k averages roughly 2 chars per token for Hebrew and 4 for English
+        hebrew_chars = len(_HEBREW_CHARS.findall(answer))
+        estimated_tokens = hebrew_chars / 2 + (len(answer) - hebrew_chars) / 4
+        recent = session.get("_answer_tokens_ewma")
+        if recent is not None:
+            estimated_tokens = (1 - _ANSWER_LENGTH_ALPHA) * recent + _ANSWER_LENGTH_ALPHA * estimated_tokens
+        session["_answer_tokens_ewma"] = round(estimated_tokens, 1)
+
+    def _single_flight(self, key, fn, timeout=15):
+        """
+        Run fn once per key at a time - concurrent callers with the same key wait for the leader's result.
+        Returns (result, coalesced) where coalesced is True for callers that reused another call.
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._inflight[key] = future
+        
+        if not is_leader:
+            logger.info(f"[COALESCE] ⚡ Awaiting identical in-flight request")
+            return future.result(timeout=timeout), True
+        
+        try:
+            result = fn()
+            future.set_result(result)
+            return result, False
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _stream_completion(self, stream_callback, **kwargs):
+        """Run a streamed chat completion, passing each text delta to stream_callback; returns the full text"""
+        stream = self.openai_client.chat.completions.create(stream=True, **kwargs)
+        buffer = []
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                buffer.append(delta)
+                stream_callback(delta)
+        return "".join(buffer).strip()
+
+    def _build_correction_prompt(self, base_prompt, session):
+        """Build the stricter prompt used when a response ignores the user's stated business"""
+        # update_user_context mirrors the profile's business type onto the session every turn -
+        # read it there instead of re-deriving the profile id and building a full context summary
+        return f"""{base_prompt}
+
+CRITICAL: The user has previously stated their business type. Do NOT ask about unrelated business types.
+Current user business: {session.get("user_business_type") or "unknown"}
+
+Provide a response that is appropriate for the user's actual business type."""
+
+    def _generate_context_correction(self, correction_prompt, is_simple_question=False):
+        """Regenerate a response with stronger context awareness (safe to run in a worker thread)"""
+        # 🚀 PERFORMANCE: Reuse a previous regeneration for the same correction prompt
+        cached_correction = self.cache_manager.get(correction_prompt)
+        if cached_correction:
+            logger.info(f"[CACHE_HIT] Fast cached context correction")
+            return cached_correction.get("answer", "") if isinstance(cached_correction, dict) else cached_correction
+        
+        # ⚡ PERFORMANCE: Don't escalate simple questions to the slow model on the correction path
+        correction_model = "gpt-3.5-turbo" if is_simple_question else "gpt-4-turbo"
+        correction_max_tokens = 200 if is_simple_question else 300
+        completion = self.openai_client.chat.completions.create(
+            model=correction_model,
+            messages=[
+                self._system_message,
+                {"role": "user", "content": correction_prompt}
+            ],
+            temperature=0.7,
+            max_tokens=correction_max_tokens,
+            timeout=8  # Keep the regeneration inside the latency budget
+        )
+        answer = completion.choices[0].message.content.strip()
+        answer = self._ensure_complete_sentence(answer)
+        self.cache_manager.set(correction_prompt, {"answer": answer, "cached": True, "context_correction": True})
+        logger.info(f"[CONTEXT_VALIDATION] ✅ Regenerated response with proper context awareness ({correction_model})")
+        return answer
 
     def _get_context_from_chroma(self, question, context_type="general"):
         """🔧 ENHANCED: Combined intent + semantic context retrieval (called during vague response fallback)"""
         try:
-            # 🚀 PERFORMANCE: Check database cache first for fast context retrieval
-            query_key = f"{question}:{context_type}"
+            # 🚀 PERFORMANCE: Check database cache first for fast context retrieval.
+            # Keyed by the normalized question only - context_type doesn't change what is retrieved,
+            # and the digest keeps long questions from colliding on the cache's 100-char key prefix
+            normalized_question = " ".join(question.lower().split())
+            query_key = f"chroma_context:{hashlib.md5(normalized_question.encode()).hexdigest()}"
             cached_context = self.cache_manager.get_db_query(query_key)
             if cached_context:
                 logger.info(f"[CACHE_HIT] Fast cached context for: '{question[:30]}...' ({context_type})")
                 return cached_context
             
             # Get knowledge collection
-            knowledge_collection = self.db_manager.get_knowledge_collection()
+            knowledge_collection = self._get_knowledge_collection()
             if not knowledge_collection:
                 logger.warning("[CONTEXT] No knowledge collection available")
                 return ""
             
-            # 🔧 COMBINED RETRIEVAL: Intent + Semantic approach for better context
-            combined_context = ""
+            # ⚡ PERFORMANCE: Embed the question once (LRU-cached) for both the intent and the semantic lookup
+            question_embedding = self._embed_question(question)
             
+            # 🔧 COMBINED RETRIEVAL: Intent + Semantic approach for better context
             # STEP 1: Try intent-based retrieval first (if we can detect intent)
-            from services.intent_service import IntentService
-            intent_service = IntentService(self.db_manager)
-            intent_name = intent_service.detect_intent_chroma(question)
+            intent_name = self.intent_service.detect_intent_chroma(question, query_embedding=question_embedding)
             
             if intent_name and intent_name != "unknown":
                 logger.debug(f"[COMBINED_CONTEXT] Detected intent: {intent_name} - getting intent-based docs")
-                intent_docs = self._get_knowledge_by_intent(intent_name)
-                if intent_docs:
-                    # Use the first (best) intent document
-                    best_intent_doc = intent_docs[0][0] if intent_docs[0] else ""
-                    if best_intent_doc and len(best_intent_doc.strip()) > 100:
-                        combined_context = best_intent_doc[:500]  # Limit for performance
-                        logger.info(f"[COMBINED_CONTEXT] ✅ Using intent-based context ({len(combined_context)} chars)")
-            
-            # STEP 2: If no good intent context, fall back to semantic search
-            if not combined_context:
-                logger.debug(f"[COMBINED_CONTEXT] No intent context found, using semantic search")
+                intent_docs = self._get_knowledge_by_intent(intent_name, include_metadata=False)
+                # Use the first (best) intent document that is long enough to be useful
+                best_intent_doc = intent_docs[0][0] if intent_docs and intent_docs[0] else ""
+                if best_intent_doc and len(best_intent_doc.strip()) > 100:
+                    combined_context = best_intent_doc[:500]  # Limit for performance
+                    logger.info(f"[COMBINED_CONTEXT] ✅ Using intent-based context ({len(combined_context)} chars)")
+                    # ⚡ Good intent match - skip the semantic query entirely
+                    self.cache_manager.cache_db_query(query_key, combined_context, ttl=2400)  # 40 minutes TTL
+                    return combined_context
+            
+            # STEP 2: No good intent context, fall back to semantic search
+            logger.debug(f"[COMBINED_CONTEXT] No intent context found, using semantic search")
+            hits = self.knowledge_index.query(question_embedding, n_results=1)
+            if hits is not None:
+                doc = hits[0][0] if hits else ""
+            else:
                 results = knowledge_collection.query(
-                    query_texts=[question[:100]],  # Limit query length for speed
+                    query_embeddings=[question_embedding],
                     n_results=1,  # Single best result for fastest retrieval
-                    include=["documents", "metadatas"]  # Only include what we need
+                    include=["documents"]  # Metadata is not used here
                 )
-                
-                if results and results['documents']:
-                    doc = results['documents'][0][0] if results['documents'][0] else ""
-                    combined_context = doc[:500] if doc else ""  # Limit context length for speed
-                    logger.info(f"[COMBINED_CONTEXT] ✅ Using semantic context ({len(combined_context)} chars)")
-            
-            # STEP 3: Final fallback if still no context
-            if not combined_context:
+                doc = results['documents'][0][0] if results and results['documents'] and results['documents'][0] else ""
+            if not doc:
+                # STEP 3: Final fallback if still no context
                 logger.debug("[COMBINED_CONTEXT] No relevant context found")
                 return ""
             
+            combined_context = doc[:500]  # Limit context length for speed
+            logger.info(f"[COMBINED_CONTEXT] ✅ Using semantic context ({len(combined_context)} chars)")
+            
             # 💾 PERFORMANCE: Cache context for future fast retrieval
             self.cache_manager.cache_db_query(query_key, combined_context, ttl=2400)  # 40 minutes TTL
             
@@ -1298,6 +2141,31 @@ Provide a response that is appropriate for the user's actual business type."""
             logger.error(f"[COMBINED_CONTEXT] Error getting context from Chroma: {e}")
             return ""
     
+    def generate_batch(self, questions_with_sessions, **batch_options):
+        """
+        Answer many (question, session) pairs through the OpenAI Batch API - for offline replay and
+        evaluation of stored conversations only (results can take up to 24h; live chat stays synchronous).
+        Prompts are built exactly like the live enhanced-context path; caches and validation are skipped.
+
+        Args:
+            questions_with_sessions: Iterable of (question, session) pairs
+            **batch_options: Passed to run_chat_completion_batch (poll_interval, max_wait)
+
+        Returns:
+            List of answers in input order (None where a request failed)
+        """
+        requests = {}
+        for index, (question, session) in enumerate(questions_with_sessions):
+            lang = _question_language(question, session)
+            context = _format_context(self._get_enhanced_context_retrieval(question, None, lang),
+                                      self._build_enriched_context(question, session))
+            
+            model, messages, max_tokens, _ = self._build_enhanced_request(question, session, context, lang)
+            requests[f"q{index}"] = {"model": model, "messages": messages, "temperature": 0.7, "max_tokens": max_tokens}
+        
+        answers = run_chat_completion_batch(self.openai_client, requests, **batch_options)
+        return [answers.get(custom_id) for custom_id in requests]
+
     def get_cache_stats(self):
         """Get cache performance statistics"""
         return self.cache_manager.get_advanced_stats()
@@ -1309,6 +2177,9 @@ Provide a response that is appropriate for the user's actual business type."""
             logger.info(f"[CACHE] Cleared cache entries matching pattern: {pattern}")
         else:
             self.cache_manager.clear()
+            self.semantic_cache.clear()
+            self._knowledge_collection = None
+            self.knowledge_index.invalidate()
             logger.info("[CACHE] Cleared all cache entries")
     
     def log_cache_performance(self):
@@ -1326,6 +2197,9 @@ Provide a response that is appropriate for the user's actual business type."""
         
         return {
             "cache_performance": cache_stats,
+            "semantic_cache": self.semantic_cache.get_stats(),
+            "knowledge_index": self.knowledge_index.get_stats(),
+            "openai_circuit": _OPENAI_BREAKER.get_stats(),
             "response_variation": variation_stats,
             "optimization_status": "Caching + Response variation enabled for fast, natural responses"
         }
@@ -1346,30 +2220,10 @@ Provide a response that is appropriate for the user's actual business type."""
 
     def _build_contextual_prompt(self, question, context, context_type="general"):
         """Build enhanced prompt with context"""
-        if context_type == "lead_confirmation":
-            base_prompt = f"""The user has provided complete lead information (name, email, phone). 
-            A lead notification has been sent to the team. 
-            Now provide a warm, professional confirmation message that:
-            1. Thanks them for their interest
-            2. Confirms their details were received
-            3. Mentions someone will contact them soon
-            4. Maintains the conversational tone
-            
-            User message: {question}
-            
-            Available context: {context}
-            
-            Respond naturally and warmly."""
-        else:
-            base_prompt = f"""User question: {question}
-            
-            Relevant context: {context}
-            
-            Provide a helpful, accurate response using the context provided."""
-        
-        return base_prompt
+        template = self._LEAD_CONFIRMATION_TEMPLATE if context_type == "lead_confirmation" else self._GENERAL_CONTEXT_TEMPLATE
+        return template.format(question=question, context=context)
 
-    def _get_conversation_context(self, question, session):
+    def _get_conversation_context(self, question, session, question_lower=None, signals=None):
         """Analyze conversation history to understand follow-up questions in context"""
         history = session.get("history", [])
         if len(history) < 2:
@@ -1380,58 +2234,25 @@ Provide a response that is appropriate for the user's actual business type."""
         
         # Simplified topic extraction
         context_text = " ".join([msg.get("content", "") for msg in recent_context]).lower()
-        question_lower = question.lower()
-        
-        # Fast pattern matching
-        contextual_intent = None
-        context_info = {}
-        
-        # WhatsApp + Meta context
-        if any(term in context_text for term in ["whatsapp", "וואטסאפ"]) and \
-           any(term in question_lower for term in ["meta", "approval", "אישור", "verification", "מאומת", "operator"]):
-            contextual_intent = "faq"
-            context_info = {
-                "topic": "whatsapp_meta_verification",
-                "specific_question": "Meta business verification for WhatsApp integration"
-            }
-            logger.info(f"[CONTEXT_BRIDGE] Detected WhatsApp+Meta follow-up question")
-        
-        # CRM + Integration context
-        elif any(term in context_text for term in ["crm", "integration", "אינטגרציה", "מערכות"]) and \
-             any(term in question_lower for term in ["how", "איך", "possible", "אפשר", "requirements", "דרישות"]):
-            contextual_intent = "faq" 
-            context_info = {
-                "topic": "crm_integration",
-                "specific_question": "CRM and system integration capabilities"
-            }
-            logger.info(f"[CONTEXT_BRIDGE] Detected CRM integration follow-up question")
-        
-        # Pricing + Plans context
-        elif any(term in context_text for term in ["price", "cost", "מחיר", "עלות", "שח"]) and \
-             any(term in question_lower for term in ["what about", "מה לגבי", "other", "אחר", "more", "עוד"]):
-            contextual_intent = "pricing"
-            context_info = {
-                "topic": "pricing_details", 
-                "specific_question": "Additional pricing information or plan details"
-            }
-            logger.info(f"[CONTEXT_BRIDGE] Detected pricing follow-up question")
-        
-        # Business use cases context
-        elif any(term in context_text for term in ["business", "עסק", "industry", "תחום"]) and \
-             any(term in question_lower for term in ["example", "דוגמה", "how", "איך", "like mine", "כמו שלי"]):
-            contextual_intent = "chatbot_use_cases"
-            context_info = {
-                "topic": "business_specific_examples",
-                "specific_question": "Industry-specific chatbot use cases"
-            }
-            logger.info(f"[CONTEXT_BRIDGE] Detected business use case follow-up question")
+        if question_lower is None:
+            question_lower = question.lower()
         
-        if contextual_intent:
-            logger.info(f"[CONTEXT_BRIDGE] ✅ Contextual intent detected: {contextual_intent} | Topic: {context_info.get('topic')}")
-            return contextual_intent, context_info
+        # ⚡ PERFORMANCE: The question side comes from the shared signal scan, the history side
+        # from one automaton pass - first matching bridge wins
+        if signals is None:
+            signals = _scan_signals(question_lower)
+        context_bridges = _BRIDGE_CONTEXT_MATCHER.scan(context_text)
+        for bridge, contextual_intent, topic, specific_question, label in _BRIDGES:
+            if bridge in context_bridges and f"followup_{bridge}" in signals:
+                context_info = {"topic": topic, "specific_question": specific_question}
+                logger.info(f"[CONTEXT_BRIDGE] Detected {label} follow-up question")
+                break
         else:
             logger.debug(f"[CONTEXT_BRIDGE] No specific context detected for follow-up")
             return None, None
+        
+        logger.info(f"[CONTEXT_BRIDGE] ✅ Contextual intent detected: {contextual_intent} | Topic: {context_info.get('topic')}")
+        return contextual_intent, context_info
 
     def _build_enriched_context(self, question, session, greeting_context=None):
         """Build enriched context from all detection signals for GPT"""
@@ -1444,38 +2265,38 @@ Provide a response that is appropriate for the user's actual business type."""
             elif greeting_context.get("is_repeat_greeting"):
                 context_signals.append("CONTEXT: This is a repeat greeting in an ongoing conversation - respond naturally and continue.")
         
-        # Use case context
-        if session.get("specific_use_case"):
-            context_signals.append(f"CONTEXT: User has specific business use case: {session['specific_use_case']}")
-        
-        # Follow-up context
-        if session.get("follow_up_context"):
-            context_signals.append(f"CONTEXT: User is asking follow-up about: {session['follow_up_context']}")
-        
-        # Engagement context
-        if session.get("positive_engagement"):
-            context_signals.append("CONTEXT: User shows positive engagement and interest")
-        
-        # Conversion opportunity
-        if session.get("conversion_opportunity"):
-            context_signals.append("CONTEXT: This is a potential conversion opportunity - be helpful and guide naturally")
-        
-        # Lead collection context
-        if session.get("interested_lead_pending"):
-            context_signals.append("CONTEXT: User may be interested in leaving contact details if appropriate")
+        # Session-flag signals (use case, follow-up, engagement, conversion, lead collection)
+        context_signals.extend(
+            template.format(session[key]) for key, template in _ENRICHED_CONTEXT_SIGNALS if session.get(key)
+        )
         
-        return "\n".join(context_signals) if context_signals else ""
+        return "\n".join(context_signals)
+
+    def _get_knowledge_collection(self):
+        """Get the knowledge collection handle, cached after the first successful lookup"""
+        if self._knowledge_collection is None:
+            self._knowledge_collection = self.db_manager.get_knowledge_collection()
+        return self._knowledge_collection
 
-    def _get_knowledge_by_intent(self, intent_name):
+    def _get_knowledge_by_intent(self, intent_name, include_metadata=True):
         """Retrieve documents from the knowledge collection where metadata.intent == intent_name"""
         try:
-            knowledge_collection = self.db_manager.get_knowledge_collection()
+            # ⚡ PERFORMANCE: The intent's rows don't change between turns - read them from the in-memory index
+            # (reloaded after clear_cache) instead of running a Chroma filter scan every time
+            cached_docs = self.knowledge_index.get_where({"intent": intent_name})
+            if cached_docs is not None:
+                logger.debug(f"[KNOWLEDGE_RETRIEVAL] {len(cached_docs)} in-memory documents for intent '{intent_name}'")
+                return cached_docs
+            
+            knowledge_collection = self._get_knowledge_collection()
             if not knowledge_collection:
                 return []
             
-            results = knowledge_collection.get(where={"intent": intent_name}, include=["documents", "metadatas"])
-            docs = results.get("documents", [])
-            metas = results.get("metadatas", [])
+            # Only ship metadata across the Chroma boundary when the caller uses it
+            include = ["documents", "metadatas"] if include_metadata else ["documents"]
+            results = knowledge_collection.get(where={"intent": intent_name}, include=include)
+            docs = results.get("documents") or []
+            metas = results.get("metadatas") or [{}] * len(docs)
             logger.debug(f"[KNOWLEDGE_RETRIEVAL] Retrieved {len(docs)} documents for intent '{intent_name}'")
             return list(zip(docs, metas))
         except Exception as e:
@@ -1484,20 +2305,31 @@ Provide a response that is appropriate for the user's actual business type."""
 
     def _get_enhanced_context_retrieval(self, question, intent_name, lang="he", n_results=3):
         """⚡ OPTIMIZED context retrieval - fast single-query approach"""
-        logger.debug(f"[ENHANCED_RETRIEVAL] ⚡ Starting fast retrieval for: '{question[:30]}...'")
+        logger.debug("[ENHANCED_RETRIEVAL] ⚡ Starting fast retrieval for: '%.30s...'", question)
         
         try:
-            knowledge_collection = self.db_manager.get_knowledge_collection()
+            knowledge_collection = self._get_knowledge_collection()
             if not knowledge_collection:
                 logger.warning("[ENHANCED_RETRIEVAL] No knowledge collection available")
                 return []
             
+            question_embedding = self._embed_question(question)
+            where = {"language": lang} if lang else None
+            
+            # ⚡ PERFORMANCE: Answer from the in-memory index; Chroma is only queried if it can't be loaded
+            combined_docs = self.knowledge_index.query(question_embedding, n_results=n_results, where=where)
+            if combined_docs is not None:
+                logger.info(f"[ENHANCED_RETRIEVAL] ⚡ In-memory retrieval: {len(combined_docs)} docs")
+                return combined_docs
+            
             # Single semantic search query (fastest approach)
+            # Only pass a filter when there is one - Chroma evaluates even an empty where clause
+            filter_kwargs = {"where": where} if where else {}
             semantic_results = knowledge_collection.query(
-                query_texts=[question],
+                query_embeddings=[question_embedding],
                 n_results=n_results,
-                where={"language": lang} if lang else None,
-                include=["documents", "metadatas"]
+                include=["documents", "metadatas"],
+                **filter_kwargs
             )
             
             # Quick processing without complex deduplication
@@ -1506,9 +2338,12 @@ Provide a response that is appropriate for the user's actual business type."""
                 return []
                 
             semantic_docs = semantic_results["documents"][0]
-            semantic_metas = semantic_results["metadatas"][0] if semantic_results.get("metadatas") else [{}] * len(semantic_docs)
+            if not semantic_docs:
+                return []
+            # Metadata is kept - the caller labels each context block with meta['intent']
+            semantic_metas = (semantic_results.get("metadatas") or [None])[0] or [{}] * len(semantic_docs)
             
-            combined_docs = [(doc, meta) for doc, meta in zip(semantic_docs, semantic_metas)]
+            combined_docs = list(zip(semantic_docs, semantic_metas))
             
             logger.info(f"[ENHANCED_RETRIEVAL] ⚡ Fast retrieval: {len(combined_docs)} docs in single query")
             return combined_docs
@@ -1517,96 +2352,25 @@ Provide a response that is appropriate for the user's actual business type."""
             logger.error(f"[ENHANCED_RETRIEVAL] Fast retrieval failed: {e}")
             return []
 
-    def _detect_business_type(self, text):
+    def _detect_business_type(self, text, signals=None):
         """Detect when user provides business type information"""
-        text_lower = text.strip().lower()
-        
-        # Business type patterns in Hebrew
-        business_patterns_he = [
-            "יש לי חנות", "יש לי מסעדה", "יש לי קליניקה", "יש לי משרד", "יש לי עסק",
-            "אני עובד", "אני מנהל", "אני בעלים", "אני סוכן", "אני רופא", "אני עורך דין",
-            "חנות", "מסעדה", "קליניקה", "משרד", "בית מרקחת", "מרפאה", "סלון", "מכון כושר",
-            "נדל\"ן", "ביטוח", "רכב", "תכשיטים", "אופנה", "טכנולוגיה", "חינוך", "ייעוץ",
-            "אני עוסק", "אני עובד בתחום", "התחום שלי", "העסק שלי", "החברה שלי"
-        ]
-        
-        # Business type patterns in English  
-        business_patterns_en = [
-            "i have a store", "i have a restaurant", "i have a clinic", "i have an office", "i have a business",
-            "i work in", "i manage", "i own", "i am a doctor", "i am a lawyer", "i am an agent",
-            "store", "restaurant", "clinic", "office", "pharmacy", "salon", "gym", "fitness",
-            "real estate", "insurance", "automotive", "jewelry", "fashion", "technology", "education", "consulting",
-            "my business", "my company", "my field", "our business", "our company"
-        ]
+        if signals is None:
+            signals = _scan_signals(text.lower())
         
         # Check for business type indicators
-        is_business_response = (
-            any(pattern in text_lower for pattern in business_patterns_he) or
-            any(pattern in text_lower for pattern in business_patterns_en)
-        )
-        
-        if is_business_response:
+        if "business" in signals:
             logger.info(f"[BUSINESS_TYPE] Detected business type in: '{text}'")
             return True
         
         return False
 
-    def _detect_specific_use_case(self, text):
+    def _detect_specific_use_case(self, text, signals=None):
         """Detect when user describes a specific business use case or pain point"""
-        text_lower = text.strip().lower()
-        
-        # Education/Teaching use case patterns
-        education_patterns = [
-            "מורה", "מלמד", "בית ספר", "תלמידים", "לימודים", "חומר לימודי", "נושא לימודי",
-            "מתמטיקה", "מדעים", "היסטוריה", "שפות", "כיתה", "חינוך", "אקדמיה", "אוניברסיטה",
-            "teacher", "teaching", "school", "students", "education", "learning material", "subject",
-            "mathematics", "science", "history", "languages", "classroom", "university", "academic"
-        ]
-        
-        # Recruitment/HR use case patterns
-        recruitment_patterns = [
-            "מגייס עובדים", "גיוס עובדים", "מגייס אנשים", "מחפש עובדים", "רוצה לגייס",
-            "מקבל טלפונים", "מלא טלפונים", "הרבה טלפונים", "טלפונים ללא הפסקה",
-            "לסנן", "לסנן אנשים", "לסנן מועמדים", "סינון", "לא רלוונטי", "לא מתאים",
-            "recruiting", "hiring", "hr", "human resources", "filter candidates", "screen applicants",
-            "too many calls", "phone overload", "unqualified", "irrelevant candidates"
-        ]
-        
-        # Restaurant/Food service patterns
-        restaurant_patterns = [
-            "מסעדה", "בר", "קפה", "אוכל", "תפריט", "הזמנות", "מקומות", "שולחנות",
-            "restaurant", "cafe", "bar", "food", "menu", "reservations", "tables", "booking"
-        ]
-        
-        # Retail/Store patterns  
-        retail_patterns = [
-            "חנות", "קמעונאות", "מוצרים", "מלאי", "מבצעים", "קניות", "לקוחות",
-            "store", "retail", "shop", "products", "inventory", "sales", "customers", "shopping"
-        ]
-        
-        # Real estate patterns
-        realestate_patterns = [
-            "נדל\"ן", "דירות", "בתים", "השכרה", "מכירה", "נכסים", "סיורים",
-            "real estate", "apartments", "houses", "rental", "property", "tours", "listings"
-        ]
-        
-        # Medical/Clinic patterns
-        medical_patterns = [
-            "קליניקה", "רופא", "מרפאה", "תורים", "חולים", "ביטוח", "טיפול",
-            "clinic", "doctor", "medical", "appointments", "patients", "insurance", "treatment"
-        ]
+        if signals is None:
+            signals = _scan_signals(text.lower())
         
         # Check for specific use cases
-        use_cases = {
-            "education": any(pattern in text_lower for pattern in education_patterns),
-            "recruitment": any(pattern in text_lower for pattern in recruitment_patterns),
-            "restaurant": any(pattern in text_lower for pattern in restaurant_patterns),
-            "retail": any(pattern in text_lower for pattern in retail_patterns),
-            "real_estate": any(pattern in text_lower for pattern in realestate_patterns),
-            "medical": any(pattern in text_lower for pattern in medical_patterns)
-        }
-        
-        detected_use_cases = [use_case for use_case, detected in use_cases.items() if detected]
+        detected_use_cases = [use_case for use_case in _USE_CASE_PRIORITY if use_case in signals]
         
         if detected_use_cases:
             logger.info(f"[USE_CASE] Detected use case(s): {detected_use_cases} in: '{text}'")
@@ -1614,13 +2378,18 @@ Provide a response that is appropriate for the user's actual business type."""
         
         return None
 
-    def _should_initiate_lead_collection_from_engagement(self, session):
-        """✅ ENHANCED: Determine if high engagement warrants immediate lead collection"""
+    def _should_initiate_lead_collection_from_engagement(self, session, answer_pending=False):
+        """
+        ✅ ENHANCED: Determine if high engagement warrants immediate lead collection
+        
+        Args:
+            answer_pending: Evaluate as if the answer being generated has already been counted as helpful
+        """
         # Check for strong positive engagement signals
         positive_count = session.get("positive_engagement_count", 0)
         has_recent_positive = session.get("positive_engagement", False)
-        info_provided = session.get("information_provided", False)
-        helpful_count = session.get("helpful_responses_count", 0)
+        info_provided = session.get("information_provided", False) or answer_pending
+        helpful_count = session.get("helpful_responses_count", 0) + answer_pending
         
         # ✅ HIGH ENGAGEMENT CRITERIA:
         # 1. Multiple positive engagement signals OR
@@ -1641,206 +2410,109 @@ Provide a response that is appropriate for the user's actual business type."""
         
         return False
 
-    def _detect_positive_engagement(self, text):
+    def _detect_positive_engagement(self, text, signals=None):
         """Detect when user shows positive engagement or interest"""
-        text_lower = text.strip().lower()
-        
-        # ✅ ENHANCED: Positive engagement patterns in Hebrew (including excitement expressions)
-        positive_patterns_he = [
-            "זה נשמע טוב", "זה מעניין", "אני מעוניין", "אני רוצה", "זה בדיוק מה שאני צריך",
-            "זה יכול לעזור", "זה נראה טוב", "אני אוהב את זה", "זה נהדר", "זה מושלם",
-            "כן", "בטח", "אפשר", "למה לא", "בואו ננסה", "אני רוצה לנסות",
-            # ✅ NEW: High excitement and satisfaction expressions
-            "אה וואו", "מהמם", "וואו", "איזה כיף", "זה מדהים", "פנטסטי", "מושלם",
-            "בדיוק מה שחיפשתי", "זה נראה מדהים", "אני נרגש", "אני מתרגש", "זה בטח יעזור לי",
-            "אני חייב את זה", "זה בדיוק מה שאני צריך", "זה יכול לשנות הכל", "זה גאוני"
-        ]
-        
-        # ✅ ENHANCED: Positive engagement patterns in English (including excitement expressions)  
-        positive_patterns_en = [
-            "sounds good", "interesting", "i'm interested", "i want", "this is exactly what i need",
-            "this could help", "this looks good", "i like this", "this is great", "this is perfect",
-            "yes", "sure", "okay", "why not", "let's try", "i want to try",
-            # ✅ NEW: High excitement and satisfaction expressions
-            "oh wow", "amazing", "awesome", "fantastic", "incredible", "brilliant", "excellent",
-            "that's exactly what I was looking for", "this looks amazing", "I'm excited", "I love it",
-            "I need this", "this could change everything", "this is genius", "impressive",
-            # 🔧 QA FIX: Missing business enthusiasm patterns
-            "perfect for my business", "sounds perfect", "exactly what my business needs",
-            "this is perfect for us", "perfect solution", "ideal for my company",
-            "this fits perfectly", "exactly what we're looking for", "this would be great for us"
-        ]
+        if signals is None:
+            signals = _scan_signals(text.lower())
         
         # Check for positive engagement
-        is_positive = (
-            any(pattern in text_lower for pattern in positive_patterns_he) or
-            any(pattern in text_lower for pattern in positive_patterns_en)
-        )
-        
-        if is_positive:
-            logger.info(f"[ENGAGEMENT] Detected positive engagement in: '{text}'")
+        if "positive" in signals:
+            logger.info("[ENGAGEMENT] Detected positive engagement in: '%s'", text)
             return True
         
         return False
 
     # REMOVED: Automatic pricing detection functions - all responses now come from context only
     
-    def _is_technical_question(self, question):
+    def _is_technical_question(self, question, question_lower=None):
         """Check if the question is asking about technical details"""
-        text_lower = question.lower().strip()
-        technical_patterns = [
-            "איך זה עובד", "איך הבוט עובד", "טכני", "אינטגרציה", "וואטסאפ", "טכנולוגיה",
-            "how does it work", "how does the bot work", "technical", "integration", "whatsapp", "technology"
-        ]
-        return any(pattern in text_lower for pattern in technical_patterns)
+        text_lower = question_lower if question_lower is not None else question.lower()
+        return _is_technical_text(text_lower)
     
-    def _is_goodbye_or_thanks(self, question):
+    def _is_goodbye_or_thanks(self, question, question_lower=None):
         """Check if the question is a goodbye or thank you message"""
-        text_lower = question.lower().strip()
-        goodbye_patterns = [
-            "ביי", "להתראות", "תודה", "תודה רבה", "תודות", 
-            "bye", "goodbye", "thank you", "thanks", "farewell"
-        ]
-        return any(pattern in text_lower for pattern in goodbye_patterns)
+        text_lower = question_lower if question_lower is not None else question.lower()
+        return _is_goodbye_text(text_lower)
 
-    def _detect_product_market_fit(self, question, session):
+    def _detect_product_market_fit(self, question, session, question_lower=None):
         """Detect when there's clear alignment between user needs and product capabilities"""
-        question_lower = question.lower()
-        history = session.get("history", [])
-        
-        # Check for strong conversion signals - require more specific commitment language
-        conversion_signals = [
-            # Direct buying/purchase intent (strongest signal)
-            "אני רוצה לקנות", "רוצה לקנות", "רוצה לרכוש", "אני רוצה לרכוש",
-            "i want to buy", "want to buy", "want to purchase", "i want to purchase",
-            
-            # Direct implementation/setup questions (stronger commitment)
-            "איך בונים", "איך מקימים", "איך מתחילים", "איך נתחיל", "איך אפשר להתחיל",
-            "how do we build", "how do we set up", "how do we start", "how can we start",
-            
-            # Specific personal use case questions (stronger intent)
-            "אם אני רוצה לבנות", "אם אני רוצה להקים", "אם אני רוצה ליצור",
-            "if i want to build", "if i want to set up", "if i want to create",
-            
-            # Direct process/next steps questions
-            "מה התהליך", "מה השלבים", "מה צריך לעשות", "איך ממשיכים",
-            "what's the process", "what are the steps", "what do we need to do", "how do we proceed",
-            
-            # Ready-to-start language
-            "רוצה להתחיל", "רוצים להתחיל", "מוכן להתחיל", "איך נקדם",
-            "want to get started", "ready to start", "how do we move forward"
-        ]
-        
-        # Exclude questions that are just seeking general information
-        information_seeking_patterns = [
-            "מה דוגמאות", "איזה דוגמאות", "אפשר דוגמאות", "תן לי דוגמאות",
-            "what examples", "give me examples", "can you give examples",
-            "איך זה עובד בעסקים", "איך זה עובד למסעדות", "איך זה עובד בכלל",
-            "how does it work for businesses", "how does it work in general",
-            "איזה צבע", "איזה עיצוב", "איך זה יראה", "מה אפשר לעשות",
-            "what color", "what design", "how will it look", "what can we do"
-        ]
-        
-        # Don't trigger if this is just an information request
-        is_information_seeking = any(pattern in question_lower for pattern in information_seeking_patterns)
-        
-        # Check for conversion signals in current question (but exclude information seeking)
-        has_conversion_signal = (
-            any(signal in question_lower for signal in conversion_signals) and 
-            not is_information_seeking
+        if question_lower is None:
+            question_lower = question.lower()
+        # Bind the session lookup once - every session field below is read exactly once
+        get = session.get
+        
+        # ⚡ PERFORMANCE: Session flags first - a conversion signal only counts with business
+        # context and recent positive engagement, so without them only buying intent can match
+        has_use_case = get("specific_use_case") is not None
+        has_business_type = get("business_type_detected", False)
+        # Positive engagement in the current or previous user turn (the last 4 messages) -
+        # each user message is classified once when it arrives
+        recent_positive_engagement = (
+            len(get("history", [])) >= 2 and
+            get("last_positive_engagement_turn", -10) >= get("turn_count", 0) - 1
         )
         
-        # Check for positive engagement in recent history
-        recent_positive_engagement = False
-        if len(history) >= 2:
-            recent_messages = history[-4:]  # Last 4 messages
-            for msg in recent_messages:
-                if msg.get("role") == "user" and self._detect_positive_engagement(msg.get("content", "")):
-                    recent_positive_engagement = True
-                    break
-        
-        # Check for use case detection in session
-        has_use_case = session.get("specific_use_case") is not None
-        
-        # Check for business type detection
-        has_business_type = session.get("business_type_detected", False)
-        
-        # Check for direct buying intent first (strongest signal)
-        buying_intent_patterns = [
-            "אני רוצה לקנות", "רוצה לקנות", "רוצה לרכוש", "אני רוצה לרכוש",
-            "i want to buy", "want to buy", "want to purchase", "i want to purchase"
-        ]
-        
-        has_direct_buying_intent = any(pattern in question_lower for pattern in buying_intent_patterns)
-        
-        # Determine if there's clear product-market fit
-        product_market_fit = (
-            # Direct buying intent (immediate trigger)
-            has_direct_buying_intent or
-            # Strong conversion signal with context AND positive engagement
-            (has_conversion_signal and recent_positive_engagement and (has_use_case or has_business_type)) or
-            # Multiple positive indicators together with clear intent
-            (recent_positive_engagement and has_use_case and has_business_type and has_conversion_signal)
-        )
+        if not (recent_positive_engagement and (has_use_case or has_business_type)):
+            # Direct buying intent (immediate trigger) is the only way left
+            if "direct_buying" in _scan_signals(question_lower):
+                logger.info("[PRODUCT_MARKET_FIT] ✅ Detected clear alignment - direct buying intent")
+                return True
+            return False
         
-        if product_market_fit:
-            logger.info(f"[PRODUCT_MARKET_FIT] ✅ Detected clear alignment - direct buying intent: {has_direct_buying_intent}, conversion signal: {has_conversion_signal}, positive engagement: {recent_positive_engagement}, use case: {has_use_case}, business type: {has_business_type}")
+        # The request's shared automaton scan already classified the question for all phrase buckets
+        question_signals = _scan_signals(question_lower)
+        has_direct_buying_intent = "direct_buying" in question_signals
+        # Conversion signal that isn't just an information request
+        has_conversion_signal = "conversion" in question_signals and "information_seeking" not in question_signals
+        
+        pmf_index = ((has_direct_buying_intent << 4) | (has_conversion_signal << 3) |
+                     (recent_positive_engagement << 2) | (has_use_case << 1) | bool(has_business_type))
+        if _PMF_TABLE[pmf_index]:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("[PRODUCT_MARKET_FIT] ✅ Detected clear alignment - direct buying intent: %s, conversion signal: %s, "
+                            "positive engagement: %s, use case: %s, business type: %s",
+                            has_direct_buying_intent, has_conversion_signal, recent_positive_engagement,
+                            has_use_case, has_business_type)
             return True
         
         return False
 
     def _mark_information_provided(self, session):
         """Mark that helpful information has been provided to the user"""
+        helpful_count = session.get("helpful_responses_count", 0) + 1
         session["information_provided"] = True
-        session["helpful_responses_count"] = session.get("helpful_responses_count", 0) + 1
-        logger.info(f"[INFO_PROVIDED] Marked information as provided. Count: {session['helpful_responses_count']}")
+        session["helpful_responses_count"] = helpful_count
+        logger.info("[INFO_PROVIDED] Marked information as provided. Count: %d", helpful_count)
     
-    def _should_trigger_lead_collection(self, question, session):
+    def _should_trigger_lead_collection(self, question, session, question_lower=None):
         """Determine if lead collection should be triggered"""
+        if question_lower is None:
+            question_lower = question.lower()
+        
         # Always trigger for direct buying intent
-        if detect_buying_intent(question):
+        if detect_buying_intent(question, question_lower):
             return True
         
         # Trigger if information has been provided and user shows interest
-        if session.get("information_provided", False) and session.get("helpful_responses_count", 0) >= 1:
+        get = session.get
+        if get("information_provided", False) and get("helpful_responses_count", 0) >= 1:
             # Check for interest signals
-            interest_signals = [
-                "זה נשמע", "זה מעניין", "זה טוב", "זה מושלם", "זה בדיוק",
-                "sounds good", "interesting", "perfect", "exactly what"
-            ]
-            question_lower = question.lower()
-            if any(signal in question_lower for signal in interest_signals):
+            if "interest" in _scan_signals(question_lower):
                 return True
         
         return False
     
     def _generate_lead_transition_message(self, session, lang="he"):
         """Generate a smooth transition message to lead collection based on context"""
-        use_case = session.get("specific_use_case")
-        business_type = session.get("business_type_detected", False)
-        
-        if lang == "he":
-            if use_case == "education":
-                return "נשמע שזה בדיוק מה שאתה צריך! רוצה שנתחיל להקים את הבוט לבית הספר שלך? אשמח לקבל את הפרטים שלך כדי שנוכל להתחיל."
-            elif use_case == "restaurant":
-                return "זה נשמע כמו פתרון מושלם למסעדה שלך! רוצה שנתחיל להקים את הבוט? אשמח לקבל את הפרטים שלך כדי שנוכל להתחיל."
-            elif use_case == "recruitment":
-                return "זה בדיוק מה שיעזור לך עם הגיוס! רוצה שנתחיל להקים את הבוט? אשמח לקבל את הפרטים שלך."
-            elif business_type:
-                return "נשמע שזה בדיוק מה שהעסק שלך צריך! רוצה שנתחיל להקים את הבוט? אשמח לקבל את הפרטים שלך."
-            else:
-                return "נשמע שזה בדיוק מה שאתה צריך! רוצה שנתחיל להקים את הבוט? אשמח לקבל את הפרטים שלך."
+        get = session.get
+        use_case = get("specific_use_case")
+        business_type = get("business_type_detected", False)
+        
+        if use_case in ("education", "restaurant", "recruitment"):
+            key = use_case
         else:
-            if use_case == "education":
-                return "This sounds exactly like what you need! Want to start setting up the bot for your school? I'd love to get your details so we can get started."
-            elif use_case == "restaurant":
-                return "This sounds like the perfect solution for your restaurant! Want to start setting up the bot? I'd love to get your details so we can get started."
-            elif use_case == "recruitment":
-                return "This is exactly what will help with your recruitment! Want to start setting up the bot? I'd love to get your details."
-            elif business_type:
-                return "This sounds exactly like what your business needs! Want to start setting up the bot? I'd love to get your details."
-            else:
-                return "This sounds exactly like what you need! Want to start setting up the bot? I'd love to get your details."
+            key = "business" if business_type else "default"
+        return _LEAD_TRANSITIONS["he" if lang == "he" else "en", key]
 
     # Note: Response variation and deduplication are handled by the existing
     # ResponseVariationService which is already working properly
\ No newline at end of file
@@ -1,10 +1,25 @@
+import hashlib
 import logging
 import re
+from collections import deque
+from functools import lru_cache
 from typing import Dict, List, Optional, Set
 from utils.text_utils import detect_language
+from utils.phrase_matcher import PhraseMatcher
 
 logger = logging.getLogger(__name__)
 
+# Most recent distinct question topics kept per user profile
+_MAX_MENTIONED_TOPICS = 32
+# Most recent corrections kept per user profile (only the latest is read)
+_MAX_CORRECTIONS = 8
+
+# History roles shown in the response context
+_HISTORY_SPEAKERS = {"user": "User", "assistant": "Bot"}
+
+# Distinct normalized questions whose business type lookup is memoized
+_MATCH_CACHE_SIZE = 2048
+
 class ContextManager:
     """
     Advanced context management system to maintain user context throughout conversations
@@ -48,98 +63,144 @@ class ContextManager:
             "לא", "לא נכון", "לא קשור", "לא זה", "אני לא", "זה לא",
             "no", "not", "not related", "that's not", "i'm not", "it's not"
         ]
+        
+        # Off-topic words a reply must not contain for a given business type (validate_response_context)
+        self.violation_indicators = {
+            "makeup_artist": ["מסעדה", "restaurant", "אוכל", "food", "תפריט", "menu"],
+            "restaurant": ["איפור", "makeup", "קוסמטיקה", "cosmetics", "יופי", "beauty"]
+        }
+        self.violation_labels = {
+            "makeup_artist": "Asked about restaurants to makeup artist",
+            "restaurant": "Asked about makeup to restaurant owner"
+        }
+        
+        # ⚡ PERFORMANCE: One automaton pass per text instead of a substring scan per pattern -
+        # questions are tagged with every business type plus "correction"; replies are only checked
+        # against their business type's own indicators, stopping at the first hit
+        self._question_matcher = PhraseMatcher({**self.business_patterns, "correction": self.correction_patterns})
+        self._violation_matchers = {
+            business_type: PhraseMatcher({business_type: indicators})
+            for business_type, indicators in self.violation_indicators.items()
+        }
+        # Repeat questions skip the scan entirely
+        self._match_business = lru_cache(maxsize=_MATCH_CACHE_SIZE)(self._scan_business)
     
     def get_session_id(self, session):
         """Generate consistent session ID"""
-        import hashlib
-        history_str = str(session.get("history", []))
-        return hashlib.md5(history_str.encode()).hexdigest()[:8]
+        history = session.get("history", [])
+        # ⚡ PERFORMANCE: The id only changes when the history does - reuse it until ChatService
+        # records another write (the length also catches resets of the history list)
+        cache_key = [session.get("_history_version"), len(history)]
+        if cache_key[0] is not None and session.get("_ctx_sid_key") == cache_key:
+            return session["_ctx_sid"]
+        
+        # Not security-sensitive: a 4-byte BLAKE2b digest is the 8 hex chars directly (faster than MD5)
+        session_id = hashlib.blake2b(str(history).encode(), digest_size=4).hexdigest()
+        if cache_key[0] is not None:
+            session["_ctx_sid_key"] = cache_key
+            session["_ctx_sid"] = session_id
+        return session_id
     
-    def detect_business_type(self, text: str) -> Optional[str]:
+    def detect_business_type(self, text: str, text_lower: Optional[str] = None) -> Optional[str]:
         """
-        Detect business type from user text
+        Detect business type from user text (text_lower: text.strip().lower() if the caller has it)
         """
-        text_lower = text.strip().lower()
-        
-        for business_type, patterns in self.business_patterns.items():
-            if any(pattern in text_lower for pattern in patterns):
-                logger.info(f"[CONTEXT] Detected business type: {business_type} in: '{text}'")
+        if text_lower is None:
+            text_lower = text.strip().lower()
+        business_type = self._match_business(text_lower)
+        if business_type:
+            logger.info(f"[CONTEXT] Detected business type: {business_type} in: '{text}'")
+        return business_type
+    
+    def _scan_business(self, text_lower: str) -> Optional[str]:
+        """First business type (in declaration order) whose patterns appear in the normalized text"""
+        found = self._question_matcher.scan(text_lower)
+        for business_type in self.business_patterns:
+            if business_type in found:
                 return business_type
-        
         return None
     
-    def detect_correction(self, text: str) -> bool:
+    def detect_correction(self, text: str, text_lower: Optional[str] = None) -> bool:
         """
-        Detect if user is correcting previous information
+        Detect if user is correcting previous information (text_lower: text.strip().lower() if the caller has it)
         """
-        text_lower = text.strip().lower()
-        return any(pattern in text_lower for pattern in self.correction_patterns)
+        if text_lower is None:
+            text_lower = text.strip().lower()
+        return self._question_matcher.matches(text_lower, "correction")
     
-    def update_user_context(self, session, question: str, bot_response: str = None):
+    def update_user_context(self, session, question: str, bot_response: str = None, question_lower: Optional[str] = None):
         """
         Update user context based on the current interaction
         """
+        # Normalize once for both detectors
+        if question_lower is None:
+            question_lower = question.strip().lower()
         session_id = self.get_session_id(session)
         
         # Initialize user profile if not exists
         if session_id not in self.user_profiles:
             self.user_profiles[session_id] = {
                 "business_type": None,
-                "corrections": [],
+                "corrections": deque(maxlen=_MAX_CORRECTIONS),
+                "latest_correction": None,
+                "_context_prefix": "",  # Preformatted profile lines for build_context_for_response
                 "preferences": set(),
-                "mentioned_topics": set(),
+                "mentioned_topics": deque(maxlen=_MAX_MENTIONED_TOPICS),
+                "_topics_seen": set(),  # Membership index for mentioned_topics
                 "last_update": None
             }
         
         user_profile = self.user_profiles[session_id]
         
         # Detect business type
-        detected_business = self.detect_business_type(question)
+        detected_business = self.detect_business_type(question, question_lower)
         if detected_business:
             # Check if this is a correction
-            if self.detect_correction(question):
+            if self.detect_correction(question, question_lower):
                 # User is correcting previous assumption
-                user_profile["corrections"].append({
+                correction = {
                     "previous_assumption": user_profile.get("business_type"),
                     "correction": detected_business,
                     "text": question
-                })
+                }
+                user_profile["corrections"].append(correction)
+                user_profile["latest_correction"] = correction
                 logger.info(f"[CONTEXT] User corrected business type: {user_profile.get('business_type')} -> {detected_business}")
             
             user_profile["business_type"] = detected_business
             user_profile["last_update"] = "business_type"
+            user_profile["_context_prefix"] = self._format_profile_context(user_profile)
         
-        # Track mentioned topics
-        user_profile["mentioned_topics"].add(question[:50])  # First 50 chars as topic
+        # Track mentioned topics (first 50 chars as topic; bounded, oldest dropped first)
+        topic = question[:50]
+        topics_seen = user_profile["_topics_seen"]
+        if topic not in topics_seen:
+            mentioned_topics = user_profile["mentioned_topics"]
+            if len(mentioned_topics) == mentioned_topics.maxlen:
+                topics_seen.discard(mentioned_topics[0])  # About to be evicted by the append
+            mentioned_topics.append(topic)
+            topics_seen.add(topic)
         
         # Update session with context
         session["user_business_type"] = user_profile["business_type"]
-        session["user_corrections"] = user_profile["corrections"]
+        session["user_corrections"] = list(user_profile["corrections"])  # Session must stay JSON-serializable
         session["context_updated"] = True
         
         logger.debug(f"[CONTEXT] Updated context for session {session_id}: {user_profile}")
     
-    def build_context_for_response(self, session, question: str) -> str:
+    def build_context_for_response(self, session, question: str, question_lower: Optional[str] = None) -> str:
         """
         Build comprehensive context for the bot response
         """
         session_id = self.get_session_id(session)
         user_profile = self.user_profiles.get(session_id, {})
         
-        context_parts = []
-        
-        # User's business type
-        if user_profile.get("business_type"):
-            context_parts.append(f"USER_BUSINESS_TYPE: {user_profile['business_type']}")
-        
-        # Recent corrections
-        if user_profile.get("corrections"):
-            latest_correction = user_profile["corrections"][-1]
-            context_parts.append(f"RECENT_CORRECTION: User corrected from '{latest_correction['previous_assumption']}' to '{latest_correction['correction']}'")
-            context_parts.append(f"CORRECTION_TEXT: '{latest_correction['text']}'")
+        # ⚡ PERFORMANCE: Business type and correction lines are formatted once per profile change
+        prefix = user_profile.get("_context_prefix")
+        context_parts = [prefix] if prefix else []
         
         # Current question context
-        detected_business = self.detect_business_type(question)
+        detected_business = self.detect_business_type(question, question_lower)
         if detected_business:
             context_parts.append(f"CURRENT_QUESTION_BUSINESS_TYPE: {detected_business}")
         
@@ -150,10 +211,9 @@ class ContextManager:
             recent_messages = history[-3:]  # Last 3 messages
             context_parts.append("RECENT_CONVERSATION:")
             for msg in recent_messages:
-                if msg.get("role") == "user":
-                    context_parts.append(f"  User: {msg.get('content', '')[:100]}...")
-                elif msg.get("role") == "assistant":
-                    context_parts.append(f"  Bot: {msg.get('content', '')[:100]}...")
+                speaker = _HISTORY_SPEAKERS.get(msg.get("role"))
+                if speaker:
+                    context_parts.append(f"  {speaker}: {msg.get('content', '')[:100]}...")
         
         # Build final context
         context = "\n".join(context_parts)
@@ -161,11 +221,28 @@ class ContextManager:
         logger.debug(f"[CONTEXT] Built context for session {session_id}: {context[:200]}...")
         return context
     
-    def get_context_aware_prompt(self, session, question: str, base_prompt: str) -> str:
+    @staticmethod
+    def _format_profile_context(user_profile) -> str:
+        """Profile part of the response context: business type and latest correction"""
+        lines = []
+        
+        # User's business type
+        if user_profile.get("business_type"):
+            lines.append(f"USER_BUSINESS_TYPE: {user_profile['business_type']}")
+        
+        # Recent corrections
+        latest_correction = user_profile.get("latest_correction")
+        if latest_correction:
+            lines.append(f"RECENT_CORRECTION: User corrected from '{latest_correction['previous_assumption']}' to '{latest_correction['correction']}'")
+            lines.append(f"CORRECTION_TEXT: '{latest_correction['text']}'")
+        
+        return "\n".join(lines)
+    
+    def get_context_aware_prompt(self, session, question: str, base_prompt: str, question_lower: Optional[str] = None) -> str:
         """
         Create context-aware prompt that prevents incorrect assumptions
         """
-        context = self.build_context_for_response(session, question)
+        context = self.build_context_for_response(session, question, question_lower)
         
         # Enhanced prompt with context awareness
         enhanced_prompt = f"""{base_prompt}
@@ -187,6 +264,12 @@ Provide a helpful response that respects the user's context and avoids incorrect
 
         return enhanced_prompt
     
+    def has_violation_indicators(self, session) -> bool:
+        """
+        Whether replies in this session can fail validate_response_context (its business type has off-limit words)
+        """
+        return session.get("user_business_type") in self._violation_matchers
+    
     def validate_response_context(self, response: str, session) -> bool:
         """
         Validate that the response doesn't contradict user context
@@ -198,27 +281,13 @@ Provide a helpful response that respects the user's context and avoids incorrect
             return True  # No context to validate against
         
         business_type = user_profile["business_type"]
-        response_lower = response.lower()
-        
-        # Check for context violations
-        violations = []
-        
-        if business_type == "makeup_artist":
-            # Check for restaurant-related questions
-            restaurant_indicators = ["מסעדה", "restaurant", "אוכל", "food", "תפריט", "menu"]
-            for indicator in restaurant_indicators:
-                if indicator in response_lower:
-                    violations.append(f"Asked about restaurants to makeup artist")
-        
-        elif business_type == "restaurant":
-            # Check for makeup-related questions
-            makeup_indicators = ["איפור", "makeup", "קוסמטיקה", "cosmetics", "יופי", "beauty"]
-            for indicator in makeup_indicators:
-                if indicator in response_lower:
-                    violations.append(f"Asked about makeup to restaurant owner")
-        
-        if violations:
-            logger.warning(f"[CONTEXT_VALIDATION] Context violations detected: {violations}")
+        violation_matcher = self._violation_matchers.get(business_type)
+        if violation_matcher is None:
+            return True  # Nothing is off-limits for this business type
+        
+        # Check for context violations (e.g. restaurant questions to a makeup artist)
+        if violation_matcher.matches(response.lower()):
+            logger.warning(f"[CONTEXT_VALIDATION] Context violations detected: {self.violation_labels[business_type]}")
             return False
         
         return True
@@ -1,5 +1,6 @@
 import os
 import smtplib
+import threading
 from email.mime.text import MIMEText
 import logging
 from dotenv import load_dotenv
@@ -7,6 +8,9 @@ from dotenv import load_dotenv
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+SMTP_HOST = "smtp.gmail.com"
+SMTP_PORT = 465
+
 class EmailService:
     def __init__(self):
         self.email_user = os.getenv("EMAIL_USER")
@@ -19,12 +23,52 @@ class EmailService:
         logger.info(f"   EMAIL_PASS: {'*' * len(self.email_pass) if self.email_pass else 'None'}")
         logger.info(f"   EMAIL_TARGET: {self.email_target}")
         
+        # ⚡ PERFORMANCE: One authenticated SMTP connection reused across emails
+        # (skips the TCP + TLS + LOGIN handshake on every lead notification)
+        self._smtp = None
+        self._lock = threading.Lock()
+        
+    def _connect(self):
+        """Open and authenticate a new SMTP connection"""
+        server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT)
+        server.login(self.email_user, self.email_pass)
+        logger.info("📧 SMTP connection established")
+        return server
+    
+    def _get_conn(self):
+        """Return the cached SMTP connection, reconnecting if the server dropped it (caller holds the lock)"""
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except smtplib.SMTPException:
+                pass
+            self._close_conn()
+        self._smtp = self._connect()
+        return self._smtp
+    
+    def _close_conn(self):
+        """Drop the cached SMTP connection (caller holds the lock)"""
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._smtp = None
+    
+    def close(self):
+        """Close the persistent SMTP connection (on shutdown)"""
+        with self._lock:
+            self._close_conn()
+        
     def send_email_notification(self, subject, message):
         """Send email notification for leads"""
         logger.info(f"📧 Attempting to send email...")
-        logger.info(f"Subject: {subject}")
-        logger.debug(f"Content:\n{message}")
-        logger.debug(f"From: {self.email_user} → To: {self.email_target}")
+        logger.info("Subject: %s", subject)
+        # Lazy %-formatting: the full body is only formatted when DEBUG is on
+        logger.debug("Content:\n%s", message)
+        logger.debug("From: %s → To: %s", self.email_user, self.email_target)
 
         try:
             msg = MIMEText(message)
@@ -32,14 +76,21 @@ class EmailService:
             msg["From"] = self.email_user
             msg["To"] = self.email_target
 
-            with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-                server.login(self.email_user, self.email_pass)
-                server.send_message(msg)
+            with self._lock:
+                try:
+                    self._get_conn().send_message(msg)
+                except smtplib.SMTPServerDisconnected:
+                    # Connection went away between the liveness check and the send - retry once
+                    logger.warning("📧 SMTP connection lost, reconnecting...")
+                    self._close_conn()
+                    self._get_conn().send_message(msg)
 
             logger.info("✅ Email sent successfully!")
             return True
         except Exception as e:
             logger.error(f"❌ Error sending email: {e}")
+            # Don't reuse a connection left in an unknown state
+            self.close()
             return False
     
     def send_lead_notification(self, lead_text):
@@ -1,5 +1,5 @@
 import logging
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
 from utils.validation_utils import detect_business_type, detect_specific_use_case, detect_positive_engagement
 
 logger = logging.getLogger(__name__)
@@ -8,36 +8,46 @@ class IntentService:
     def __init__(self, db_manager):
         self.db_manager = db_manager
         self.fuzzy_threshold = 70
+        # Lowered intent texts, rebuilt only when a different intents list is passed in
+        self._choices_source = None
+        self._choices = []
     
-    def detect_intent(self, user_input, intents, threshold=70):
-        """Detect intent using fuzzy matching"""
-        best_match = None
-        best_score = 0
+    def detect_intent(self, user_input, intents, threshold=70, text_lower=None):
+        """Detect intent using fuzzy matching (text_lower: user_input.lower() if the caller has it)"""
+        if text_lower is None:
+            text_lower = user_input.lower()
         
-        for intent in intents:
-            score = fuzz.ratio(user_input.lower(), intent['text'].lower())
-            if score > best_score and score >= threshold:
-                best_score = score
-                best_match = intent
+        if intents is not self._choices_source:
+            self._choices = [intent['text'].lower() for intent in intents]
+            self._choices_source = intents
         
-        return best_match
+        # ⚡ PERFORMANCE: One C-level search with score_cutoff pruning instead of a Python loop
+        match = process.extractOne(text_lower, self._choices, scorer=fuzz.ratio, score_cutoff=threshold)
+        return intents[match[2]] if match else None
     
-    def detect_intent_fuzzy(self, user_input, intents):
+    def detect_intent_fuzzy(self, user_input, intents, text_lower=None):
         """Fuzzy intent detection"""
-        return self.detect_intent(user_input, intents, self.fuzzy_threshold)
+        return self.detect_intent(user_input, intents, self.fuzzy_threshold, text_lower)
     
-    def detect_intent_chroma(self, user_question, threshold=1.2):
-        """Detect intent using ChromaDB semantic search"""
+    def detect_intent_chroma(self, user_question, threshold=1.2, query_embedding=None):
+        """Detect intent using ChromaDB semantic search (pass query_embedding to reuse an existing question embedding)"""
         try:
             intents_collection = self.db_manager.get_intents_collection()
             if not intents_collection:
                 logger.warning("No intents collection available")
                 return None
             
-            results = intents_collection.query(
-                query_texts=[user_question],
-                n_results=1
-            )
+            if query_embedding is not None:
+                # ⚡ PERFORMANCE: Skip Chroma's own embedding call for the question
+                results = intents_collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=1
+                )
+            else:
+                results = intents_collection.query(
+                    query_texts=[user_question],
+                    n_results=1
+                )
             
             if results and results['distances'] and results['distances'][0]:
                 distance = results['distances'][0][0]
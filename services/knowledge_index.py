@@ -0,0 +1,139 @@
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class KnowledgeIndex:
+    """
+    In-process copy of the knowledge collection for nearest-neighbour lookups.
+    The (small, mostly static) collection is loaded once into an L2-normalized float32 matrix,
+    so a query is one BLAS gemv plus argpartition instead of a Chroma query round trip.
+    Call invalidate() after the collection changes - the next query reloads it.
+    """
+
+    def __init__(self, collection_getter):
+        """
+        Initialize the index.
+
+        Args:
+            collection_getter: Callable returning the Chroma knowledge collection (or None)
+        """
+        self.collection_getter = collection_getter
+
+        self._matrix: Optional[np.ndarray] = None
+        self._documents: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._masks: Dict[tuple, np.ndarray] = {}  # Metadata filter -> row mask, reset on reload
+        self._version = 0
+        self._loaded_version = -1
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        """Mark the loaded copy stale (e.g. after knowledge upserts)"""
+        self._version += 1
+
+    def _ensure_loaded(self) -> bool:
+        """Load the collection if the copy is missing or stale. Returns False when unavailable."""
+        if self._loaded_version == self._version:
+            return self._matrix is not None
+
+        with self._lock:
+            version = self._version
+            if self._loaded_version == version:
+                return self._matrix is not None
+
+            matrix = None
+            documents, metadatas = [], []
+            try:
+                collection = self.collection_getter()
+                if collection is not None:
+                    results = collection.get(include=["embeddings", "documents", "metadatas"])
+                    embeddings = results.get("embeddings")
+                    if embeddings is not None and len(embeddings):
+                        matrix = np.asarray(embeddings, dtype=np.float32)
+                        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                        norms[norms == 0] = 1.0
+                        matrix /= norms
+                        documents = list(results.get("documents") or [""] * len(matrix))
+                        metadatas = [meta or {} for meta in (results.get("metadatas") or [None] * len(matrix))]
+            except Exception as e:
+                logger.warning(f"[KNOWLEDGE_INDEX] Failed to load knowledge collection: {e}")
+
+            self._matrix, self._documents, self._metadatas = matrix, documents, metadatas
+            self._masks = {}
+            self._loaded_version = version
+            if matrix is not None:
+                logger.info(f"[KNOWLEDGE_INDEX] ⚡ Loaded {matrix.shape[0]} docs (dim={matrix.shape[1]}) into memory")
+            return matrix is not None
+
+    def query(self, embedding, n_results: int = 3,
+              where: Optional[Dict[str, Any]] = None) -> Optional[List[Tuple[str, Dict[str, Any]]]]:
+        """
+        Find the documents closest to an embedding.
+
+        Args:
+            embedding: Query embedding vector
+            n_results: Number of documents to return
+            where: Optional metadata equality filter (e.g. {"language": "he"})
+
+        Returns:
+            List of (document, metadata) pairs, best first, or None if the index is unavailable
+            (the caller should fall back to querying Chroma)
+        """
+        if not self._ensure_loaded():
+            return None
+
+        query = np.asarray(embedding, dtype=np.float32)
+        if query.shape[0] != self._matrix.shape[1]:
+            logger.warning(f"[KNOWLEDGE_INDEX] Query dimension {query.shape[0]} != index dimension {self._matrix.shape[1]}")
+            return None
+
+        scores = self._matrix @ query
+        if where:
+            mask = self._filter_mask(where)
+            scores = np.where(mask, scores, -np.inf)
+            n_results = min(n_results, int(mask.sum()))
+
+        n_results = min(n_results, scores.shape[0])
+        if n_results <= 0:
+            return []
+
+        # Top-k without sorting the whole score vector
+        top = np.argpartition(-scores, n_results - 1)[:n_results]
+        top = top[np.argsort(-scores[top])]
+        return [(self._documents[i], self._metadatas[i]) for i in top.tolist()]
+
+    def get_where(self, where: Dict[str, Any]) -> Optional[List[Tuple[str, Dict[str, Any]]]]:
+        """
+        All documents matching a metadata equality filter, in collection order (like collection.get(where=...)).
+
+        Returns:
+            List of (document, metadata) pairs, or None if the index is unavailable
+        """
+        if not self._ensure_loaded():
+            return None
+        rows = np.flatnonzero(self._filter_mask(where))
+        return [(self._documents[i], self._metadatas[i]) for i in rows.tolist()]
+
+    def _filter_mask(self, where: Dict[str, Any]) -> np.ndarray:
+        """Boolean row mask for a metadata equality filter (memoized per filter)"""
+        key = tuple(sorted(where.items()))
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = np.fromiter(
+                (all(meta.get(field) == value for field, value in key) for meta in self._metadatas),
+                dtype=bool, count=len(self._metadatas)
+            )
+            self._masks[key] = mask
+        return mask
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get knowledge index statistics"""
+        return {
+            "documents": 0 if self._matrix is None else int(self._matrix.shape[0]),
+            "version": self._version,
+            "loaded": self._loaded_version == self._version and self._matrix is not None
+        }
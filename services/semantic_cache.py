@@ -0,0 +1,244 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class SemanticCache:
+    """
+    Answer cache keyed by question embeddings.
+    Paraphrased questions are matched with a single matrix-vector cosine similarity
+    against all cached embeddings instead of requiring an exact string match.
+    Large caches switch to a random-projection LSH prefilter so only candidate rows are scored.
+    """
+
+    def __init__(self, embed_fn: Callable[[str], List[float]], max_size: int = 1000, threshold: float = 0.92,
+                 lsh_tables: int = 4, lsh_bits: int = 8, lsh_min_size: int = 2048, ttl_seconds: Optional[float] = None):
+        """
+        Initialize the semantic cache.
+
+        Args:
+            embed_fn: Callable returning the embedding vector for a single text
+            max_size: Maximum number of cached questions (oldest rows are overwritten first)
+            threshold: Minimum cosine similarity for a query-to-query hit
+            lsh_tables: Number of LSH hash tables (L)
+            lsh_bits: Random projection planes per table (k)
+            lsh_min_size: Entry count from which lookups use the LSH prefilter (full gemv is faster below)
+            ttl_seconds: Optional entry lifetime - older answers are ignored by lookups and overwritten in turn
+        """
+        self.embed_fn = embed_fn
+        self.max_size = max_size
+        self.threshold = threshold
+        self.lsh_tables = lsh_tables
+        self.lsh_bits = lsh_bits
+        self.lsh_min_size = lsh_min_size
+        self.ttl_seconds = ttl_seconds
+
+        # LSH state, created together with the matrix once the embedding dimension is known.
+        # A cache that can never reach lsh_min_size skips the projections and buckets entirely
+        self._use_lsh = max_size >= lsh_min_size
+        self._planes: Optional[np.ndarray] = None  # (L * k, d) random projection planes
+        self._bit_weights = 1 << np.arange(lsh_bits, dtype=np.int64)
+        self._buckets: List[Dict[int, Set[int]]] = [{} for _ in range(lsh_tables)]
+        self._row_keys: List[Optional[np.ndarray]] = [None] * max_size
+
+        # Preallocated (max_size, d) buffer of L2-normalized embeddings, created on first insert
+        self._matrix: Optional[np.ndarray] = None
+        self._namespaces = np.empty(max_size, dtype=object)
+        self._questions: List[Optional[str]] = [None] * max_size
+        self._answers: List[Any] = [None] * max_size
+        self._created = np.zeros(max_size, dtype=np.float64)
+        self._size = 0
+        self._next_row = 0
+
+        # One-entry memo so a miss followed by set() embeds the question only once
+        self._last_embedding = (None, None)
+
+        self._stats = {"hits": 0, "misses": 0, "errors": 0}
+        # Guards the rows and LSH buckets - Flask serves requests on several threads
+        self._lock = threading.Lock()
+
+        logger.info(f"[SEMANTIC_CACHE] Initialized with max_size={max_size}, threshold={threshold}")
+
+    def _embed(self, question: str) -> Optional[np.ndarray]:
+        """Embed and L2-normalize a question. Returns None if embedding fails."""
+        # Read the memo once - another thread may replace it between two reads
+        memo_question, memo_vector = self._last_embedding
+        if memo_question == question:
+            return memo_vector
+
+        try:
+            vector = np.asarray(self.embed_fn(question), dtype=np.float32)
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"[SEMANTIC_CACHE] Embedding failed: {e}")
+            return None
+
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return None
+
+        vector /= norm
+        self._last_embedding = (question, vector)
+        return vector
+
+    def get(self, question: str, namespace: Optional[str] = None) -> Optional[Any]:
+        """
+        Look up the answer of the most similar cached question.
+
+        Args:
+            question: User question
+            namespace: Optional partition (e.g. language) the hit must belong to
+
+        Returns:
+            Cached answer if similarity >= threshold, otherwise None
+        """
+        if not self._size:
+            self._stats["misses"] += 1
+            return None
+
+        # Embed outside the lock (network call), score under it
+        query = self._embed(question)
+        if query is None:
+            self._stats["misses"] += 1
+            return None
+
+        with self._lock:
+            return self._lookup(question, query, namespace)
+
+    def _lookup(self, question: str, query: np.ndarray, namespace: Optional[str]) -> Optional[Any]:
+        """Best cached answer for a normalized query vector (caller holds the lock)"""
+        if not self._size or query.shape[0] != self._matrix.shape[1]:
+            self._stats["misses"] += 1
+            return None
+
+        if self._size >= self.lsh_min_size:
+            # Score only the rows sharing an LSH bucket with the query
+            rows = self._lsh_candidates(query)
+            if not rows:
+                self._stats["misses"] += 1
+                return None
+            rows = np.fromiter(rows, dtype=np.int64, count=len(rows))
+            scores = self._matrix[rows] @ query
+            namespaces = self._namespaces[rows]
+            created = self._created[rows]
+        else:
+            # Single BLAS gemv over all cached embeddings
+            rows = None
+            scores = self._matrix[:self._size] @ query
+            namespaces = self._namespaces[:self._size]
+            created = self._created[:self._size]
+
+        if namespace is not None:
+            scores = np.where(namespaces == namespace, scores, -1.0)
+        if self.ttl_seconds is not None:
+            scores = np.where(created >= time.time() - self.ttl_seconds, scores, -1.0)
+
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        idx = int(rows[best]) if rows is not None else best
+        if score >= self.threshold:
+            self._stats["hits"] += 1
+            logger.info(f"[SEMANTIC_CACHE] Hit ({score:.3f}) for '{question[:30]}...' ~ '{self._questions[idx][:30]}...'")
+            return self._answers[idx]
+
+        self._stats["misses"] += 1
+        logger.debug(f"[SEMANTIC_CACHE] Miss (best {score:.3f}) for '{question[:30]}...'")
+        return None
+
+    def set(self, question: str, answer: Any, namespace: Optional[str] = None) -> None:
+        """
+        Cache an answer under the question's embedding.
+
+        Args:
+            question: User question
+            answer: Answer to return for similar questions
+            namespace: Optional partition (e.g. language) for the entry
+        """
+        vector = self._embed(question)
+        if vector is None:
+            return
+
+        with self._lock:
+            self._insert(question, vector, answer, namespace)
+
+    def _insert(self, question: str, vector: np.ndarray, answer: Any, namespace: Optional[str]) -> None:
+        """Write an entry into the next row (caller holds the lock)"""
+        if self._matrix is None:
+            self._matrix = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+            if self._use_lsh:
+                rng = np.random.default_rng(0)
+                self._planes = rng.standard_normal((self.lsh_tables * self.lsh_bits, vector.shape[0])).astype(np.float32)
+        elif vector.shape[0] != self._matrix.shape[1]:
+            logger.warning(f"[SEMANTIC_CACHE] Embedding dimension changed ({vector.shape[0]} != {self._matrix.shape[1]}) - skipping")
+            return
+
+        row = self._next_row
+        if self._use_lsh:
+            self._index_row(row, vector)
+        self._matrix[row] = vector
+        self._namespaces[row] = namespace
+        self._questions[row] = question
+        self._answers[row] = answer
+        self._created[row] = time.time()
+
+        self._next_row = (row + 1) % self.max_size
+        self._size = min(self._size + 1, self.max_size)
+
+    def _lsh_keys(self, vector: np.ndarray) -> np.ndarray:
+        """Bucket key per table: the sign pattern of the vector against that table's k planes."""
+        bits = (self._planes @ vector > 0).reshape(self.lsh_tables, self.lsh_bits)
+        return bits @ self._bit_weights
+
+    def _index_row(self, row: int, vector: np.ndarray) -> None:
+        """Move a row into the LSH buckets of its new vector (dropping the overwritten entry)."""
+        old_keys = self._row_keys[row]
+        if old_keys is not None:
+            for table, key in zip(self._buckets, old_keys.tolist()):
+                bucket = table.get(key)
+                if bucket is not None:
+                    bucket.discard(row)
+                    if not bucket:
+                        del table[key]
+
+        keys = self._lsh_keys(vector)
+        for table, key in zip(self._buckets, keys.tolist()):
+            table.setdefault(key, set()).add(row)
+        self._row_keys[row] = keys
+
+    def _lsh_candidates(self, query: np.ndarray) -> Set[int]:
+        """Union of the query's buckets across all tables."""
+        candidates = set()
+        for table, key in zip(self._buckets, self._lsh_keys(query).tolist()):
+            candidates |= table.get(key, set())
+        return candidates
+
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        with self._lock:
+            self._size = 0
+            self._next_row = 0
+            self._buckets = [{} for _ in range(self.lsh_tables)]
+            self._row_keys = [None] * self.max_size
+            self._questions = [None] * self.max_size
+            self._answers = [None] * self.max_size
+            self._last_embedding = (None, None)
+        logger.info("[SEMANTIC_CACHE] Cleared all entries")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get semantic cache statistics."""
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            "entries": self._size,
+            "max_size": self.max_size,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "lsh_active": self._size >= self.lsh_min_size,
+            "hits": self._stats["hits"],
+            "misses": self._stats["misses"],
+            "errors": self._stats["errors"],
+            "hit_rate_percent": round(self._stats["hits"] / lookups * 100, 2) if lookups else 0.0
+        }
@@ -0,0 +1,90 @@
+import json
+import logging
+import sqlite3
+import time
+from contextlib import closing
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+STREAM_SESSION_TTL = Config.PERMANENT_SESSION_LIFETIME.total_seconds()
+
+class StreamSessionStore:
+    """
+    Server-side session state for streamed turns.
+    A streamed response has already sent its headers (and session cookie) when the turn finishes,
+    so the updated session - history, lead flow flags, language - is kept here, keyed by an id stored
+    in the cookie, and picked up by the next request (streamed or not) on any worker.
+
+    Entries live in a SQLite file shared by all worker processes on the host. Each carries the
+    session's _history_version (bumped on every history write), and a stored state is only used
+    while it is newer than the cookie's - a leftover entry can never roll a newer cookie back.
+    Entries expire after STREAM_SESSION_TTL idle seconds.
+    """
+
+    def __init__(self, db_path=None, ttl_seconds=STREAM_SESSION_TTL):
+        self.db_path = db_path or Config.STREAM_SESSION_DB_PATH
+        self.ttl_seconds = ttl_seconds
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writing worker
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS stream_sessions ("
+                "key TEXT PRIMARY KEY, version INTEGER NOT NULL, saved_at REAL NOT NULL, state TEXT NOT NULL)"
+            )
+
+    def _connect(self):
+        # A short-lived connection per call - safe across request threads and forked workers
+        return closing(sqlite3.connect(self.db_path, timeout=5, isolation_level=None))
+
+    @staticmethod
+    def _version(session):
+        return session.get("_history_version") or 0
+
+    def load(self, key, cookie_session):
+        """Session for the next turn: the last streamed turn's state if it is newer than the cookie's, else the cookie's"""
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT version, saved_at, state FROM stream_sessions WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"[STREAM_SESSION] Failed to load session state: {e}")
+            return cookie_session
+
+        if row is None:
+            return cookie_session
+        version, saved_at, state = row
+        if time.time() - saved_at > self.ttl_seconds or version <= self._version(cookie_session):
+            # Expired, or the cookie has moved on (another request already carried this state forward)
+            self.discard(key, version)
+            return cookie_session
+        # The stored state started from the cookie's - it wins outright, so keys removed
+        # during streamed turns (e.g. finished lead flow flags) stay removed
+        return json.loads(state)
+
+    def save(self, key, session):
+        """Remember the session after a streamed turn (never replacing a newer stored state)"""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO stream_sessions (key, version, saved_at, state) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET version = excluded.version, saved_at = excluded.saved_at, "
+                    "state = excluded.state WHERE excluded.version >= stream_sessions.version",
+                    (key, self._version(session), now, json.dumps(session, ensure_ascii=False))
+                )
+                conn.execute("DELETE FROM stream_sessions WHERE saved_at < ?", (now - self.ttl_seconds,))
+        except sqlite3.Error as e:
+            logger.warning(f"[STREAM_SESSION] Failed to save session state: {e}")
+
+    def discard(self, key, version=None):
+        """Forget the stored state once it has been written back to the cookie (only up to version, if given)"""
+        try:
+            with self._connect() as conn:
+                if version is None:
+                    conn.execute("DELETE FROM stream_sessions WHERE key = ?", (key,))
+                else:
+                    conn.execute("DELETE FROM stream_sessions WHERE key = ? AND version <= ?", (key, version))
+        except sqlite3.Error as e:
+            logger.warning(f"[STREAM_SESSION] Failed to discard session state: {e}")
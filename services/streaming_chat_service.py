@@ -1,8 +1,12 @@
 import logging
 import json
+import queue
 import time
+from concurrent.futures import ThreadPoolExecutor
 from flask import Response
 from services.chat_service import ChatService
+from services.context_manager import context_manager
+from services.stream_session_store import StreamSessionStore
 from utils.text_utils import detect_language, is_greeting
 
 logger = logging.getLogger(__name__)
@@ -15,15 +19,20 @@ class StreamingChatService(ChatService):
     def __init__(self, db_manager, openai_client):
         super().__init__(db_manager, openai_client)
         self.typing_delay = 0.03  # Delay between characters for typing effect
+        # Separate pool so streamed requests never starve the parent's speculative corrections
+        self._stream_executor = ThreadPoolExecutor(max_workers=8)
+        # Session state of streamed turns (the response cookie is already sent when they finish)
+        self.session_store = StreamSessionStore()
         
-    def stream_response(self, question, session):
+    def stream_response(self, question, session, session_key=None):
         """
-        Stream response in chunks for better perceived performance
+        Stream response in chunks for better perceived performance.
+        With session_key the updated session is saved to session_store once the turn completes.
         """
         try:
-            # Check cache first for instant response
+            # Check cache first for instant response - except mid lead flow, where the answer depends on the session
             cache_key = self._get_cache_key(question, session)
-            cached_response = self.cache_manager.get(cache_key)
+            cached_response = None if session.get("interested_lead_pending") else self.cache_manager.get(cache_key)
             
             if cached_response:
                 logger.info(f"[STREAMING] Cache hit for: {question}")
@@ -45,21 +54,44 @@ class StreamingChatService(ChatService):
             yield self._format_stream_chunk("cache_hit", False)
             yield self._format_stream_chunk("processing", "Searching knowledge base...")
             
-            # Process the question with timing
+            # Process the question in a worker and relay model tokens as they arrive
             start_time = time.time()
-            result = self.handle_question(question, session)
+            deltas = queue.Queue()
+            future = self._stream_executor.submit(self.handle_question, question, session, None, deltas.put)
+            
+            streamed_text = ""
+            buffered = None
+            while not future.done() or not deltas.empty():
+                try:
+                    delta = deltas.get(timeout=0.05)
+                except queue.Empty:
+                    continue
+                if buffered is None:
+                    # handle_question has updated the user context by the first token - if this business type
+                    # has off-limit words the answer may still be replaced by validation, so hold it back
+                    buffered = context_manager.has_violation_indicators(session)
+                    if not buffered:
+                        yield self._format_stream_chunk("typing", True)
+                if buffered:
+                    continue
+                streamed_text += delta
+                yield self._format_stream_chunk("text", streamed_text)
+            
+            answer, updated_session = future.result()
             response_time = time.time() - start_time
+            if session_key is not None:
+                self.session_store.save(session_key, updated_session)
             
-            if result and result.get("answer"):
-                yield self._format_stream_chunk("processing", "Generating response...")
-                yield self._format_stream_chunk("typing", True)
-                
-                # Stream the answer with typing effect
-                for chunk in self._stream_text_with_typing(result["answer"]):
-                    yield chunk
+            if answer:
+                if not streamed_text:
+                    # Answer came from a non-streamed path (fast response, cache, lead flow) or was held back for validation
+                    yield self._format_stream_chunk("typing", True)
+                    for chunk in self._stream_text_with_typing(answer):
+                        yield chunk
                 
+                # The final answer may differ from the streamed text (sentence completion, lead offers)
                 yield self._format_stream_chunk("complete", {
-                    "answer": result["answer"],
+                    "answer": answer,
                     "response_time": response_time,
                     "cached": False
                 })
@@ -145,7 +177,7 @@ class StreamingResponseHandler:
         
         return Response(
             generate(),
-            mimetype='text/plain',
+            mimetype='text/event-stream',
             headers={
                 'Cache-Control': 'no-cache',
                 'Connection': 'keep-alive',
@@ -0,0 +1,82 @@
+import unittest
+from unittest import mock
+
+from core.circuit_breaker import CircuitBreaker
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("core.circuit_breaker.time.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker("openai", fail_max=3, reset_timeout=30)
+
+    def _trip(self):
+        for _ in range(self.breaker.fail_max):
+            self.breaker.record_failure()
+
+    def test_closed_until_fail_max_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow())
+
+    def test_success_resets_the_failure_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertEqual(self.breaker.get_stats()["consecutive_failures"], 2)
+
+    def test_open_until_reset_timeout(self):
+        self._trip()
+        self.now += 29.9
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow())
+        self.now += 0.1
+        self.assertEqual(self.breaker.state, "half-open")
+
+    def test_half_open_lets_a_single_trial_through(self):
+        self._trip()
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        # Everyone else waits while the trial call is in flight
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.state, "open")
+
+    def test_successful_trial_closes(self):
+        self._trip()
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.get_stats()["consecutive_failures"], 0)
+
+    def test_failed_trial_reopens_for_another_period(self):
+        self._trip()
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.now += 5
+        self.breaker.record_failure()  # One failure is enough while not closed
+        self.assertEqual(self.breaker.state, "open")
+        self.now += 29
+        self.assertFalse(self.breaker.allow())
+        self.now += 1
+        self.assertTrue(self.breaker.allow())
+
+    def test_stats(self):
+        self._trip()
+        self.assertEqual(self.breaker.get_stats(), {"name": "openai", "state": "open", "consecutive_failures": 3})
+
+
+if __name__ == "__main__":
+    unittest.main()
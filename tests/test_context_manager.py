@@ -0,0 +1,94 @@
+import unittest
+
+from services.context_manager import ContextManager
+
+# Restaurant / makeup indicators the reply validation used to check inline
+_OLD_VIOLATION_INDICATORS = {
+    "makeup_artist": ["מסעדה", "restaurant", "אוכל", "food", "תפריט", "menu"],
+    "restaurant": ["איפור", "makeup", "קוסמטיקה", "cosmetics", "יופי", "beauty"],
+}
+
+QUESTIONS = [
+    "יש לי מסעדה בתל אביב",
+    "I run a small restaurant",
+    "אני מאפרת ויש לי סלון יופי",      # makeup_artist, also "יופי"
+    "I'm a makeup artist",
+    "we sell products in our store",
+    "our clinic needs appointments",
+    "real estate agent with apartments",
+    "אני מורה בבית ספר",
+    "teacher at a cafe",               # Two types - declaration order decides
+    "לא, זה לא נכון, אני לא מסעדה",
+    "that's not what I said",
+    "No, I'm NOT a restaurant",
+    "  Menu?  ",
+    "מה המחיר?",
+    "hello there",
+    "",
+]
+
+REPLIES = [
+    "Here is our menu for your restaurant",
+    "Great makeup tips for you",
+    "אנחנו יכולים לעזור עם התפריט",
+    "נשמח לעזור עם איפור וקוסמטיקה",
+    "Beauty matters",
+    "FOOD and drinks",
+    "How many clients do you have?",
+    "",
+]
+
+
+def _old_detect_business_type(manager, text):
+    text_lower = text.strip().lower()
+    for business_type, patterns in manager.business_patterns.items():
+        if any(pattern in text_lower for pattern in patterns):
+            return business_type
+    return None
+
+
+def _old_detect_correction(manager, text):
+    text_lower = text.strip().lower()
+    return any(pattern in text_lower for pattern in manager.correction_patterns)
+
+
+def _old_validate_response_context(business_type, response):
+    response_lower = response.lower()
+    indicators = _OLD_VIOLATION_INDICATORS.get(business_type, [])
+    return not any(indicator in response_lower for indicator in indicators)
+
+
+class ContextManagerMatchingTest(unittest.TestCase):
+    """The automaton-backed detectors against the substring checks they replaced"""
+
+    def setUp(self):
+        self.manager = ContextManager()
+
+    def test_detect_business_type(self):
+        for text in QUESTIONS:
+            with self.subTest(text=text):
+                self.assertEqual(self.manager.detect_business_type(text), _old_detect_business_type(self.manager, text))
+
+    def test_declaration_order_wins(self):
+        self.assertEqual(self.manager.detect_business_type("teacher at a cafe"), "restaurant")
+
+    def test_detect_correction(self):
+        for text in QUESTIONS:
+            with self.subTest(text=text):
+                self.assertEqual(self.manager.detect_correction(text), _old_detect_correction(self.manager, text))
+
+    def test_validate_response_context(self):
+        for business_type in (None, *self.manager.business_patterns):
+            session = {"history": [{"role": "user", "content": str(business_type)}]}
+            if business_type:
+                self.manager.user_profiles[self.manager.get_session_id(session)] = {"business_type": business_type}
+            self.assertEqual(self.manager.has_violation_indicators({"user_business_type": business_type}),
+                             business_type in _OLD_VIOLATION_INDICATORS)
+            for reply in REPLIES:
+                with self.subTest(business_type=business_type, reply=reply):
+                    self.assertEqual(self.manager.validate_response_context(reply, session),
+                                     _old_validate_response_context(business_type, reply))
+
+
+if __name__ == "__main__":
+    unittest.main()
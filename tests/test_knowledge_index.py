@@ -0,0 +1,119 @@
+import unittest
+
+import numpy as np
+
+from services.knowledge_index import KnowledgeIndex
+
+
+class _FakeCollection:
+    """
+    Chroma collection stand-in: get() returns the stored rows and query() is an exact
+    brute-force search with Chroma's default (squared L2) distance, like the old lookups
+    """
+
+    def __init__(self, embeddings, documents, metadatas):
+        self.embeddings = np.asarray(embeddings, dtype=np.float32)
+        self.documents = documents
+        self.metadatas = metadatas
+        self.get_calls = 0
+
+    def get(self, include=None, where=None):
+        self.get_calls += 1
+        rows = self._rows(where)
+        return {
+            "embeddings": self.embeddings[rows],
+            "documents": [self.documents[i] for i in rows],
+            "metadatas": [self.metadatas[i] for i in rows],
+        }
+
+    def query(self, query_embeddings, n_results, where=None):
+        rows = self._rows(where)
+        distances = ((self.embeddings[rows] - np.asarray(query_embeddings[0])) ** 2).sum(axis=1)
+        best = [rows[i] for i in np.argsort(distances, kind="stable")[:n_results]]
+        return {
+            "documents": [[self.documents[i] for i in best]],
+            "metadatas": [[self.metadatas[i] for i in best]],
+        }
+
+    def _rows(self, where):
+        return [
+            i for i, meta in enumerate(self.metadatas)
+            if not where or all(meta.get(field) == value for field, value in where.items())
+        ]
+
+
+def _unit_rows(rng, count, dim):
+    # Stored embeddings are unit-length (OpenAI embeddings are), so L2 and cosine order agree
+    rows = rng.standard_normal((count, dim)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+class KnowledgeIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(5)
+        count = 200
+        self.collection = _FakeCollection(
+            _unit_rows(self.rng, count, 16),
+            [f"doc {i}" for i in range(count)],
+            [{"language": "he" if i % 3 else "en", "intent": f"intent_{i % 7}"} for i in range(count)],
+        )
+        self.index = KnowledgeIndex(lambda: self.collection)
+
+    def _expected(self, embedding, n_results, where=None):
+        results = self.collection.query(query_embeddings=[embedding], n_results=n_results, where=where)
+        return list(zip(results["documents"][0], results["metadatas"][0]))
+
+    def test_top_k_matches_collection_query(self):
+        for n_results in (1, 3, 10):
+            for query in _unit_rows(self.rng, 20, 16):
+                with self.subTest(n_results=n_results):
+                    self.assertEqual(self.index.query(query, n_results=n_results), self._expected(query, n_results))
+
+    def test_where_filter_matches_collection_query(self):
+        for where in ({"language": "en"}, {"language": "he", "intent": "intent_2"}):
+            for query in _unit_rows(self.rng, 10, 16):
+                with self.subTest(where=where):
+                    self.assertEqual(self.index.query(query, n_results=5, where=where), self._expected(query, 5, where))
+
+    def test_more_results_than_matching_rows(self):
+        where = {"intent": "intent_0", "language": "en"}
+        query = _unit_rows(self.rng, 1, 16)[0]
+        self.assertEqual(self.index.query(query, n_results=1000, where=where), self._expected(query, 1000, where))
+        self.assertEqual(self.index.query(query, n_results=3, where={"language": "fr"}), [])
+
+    def test_unnormalized_query_keeps_the_order(self):
+        query = _unit_rows(self.rng, 1, 16)[0]
+        self.assertEqual(self.index.query(query * 7.5, n_results=5), self._expected(query, 5))
+
+    def test_get_where_keeps_collection_order(self):
+        where = {"intent": "intent_3"}
+        expected = self.collection.get(where=where)
+        self.assertEqual(self.index.get_where(where), list(zip(expected["documents"], expected["metadatas"])))
+
+    def test_unavailable_collection_returns_none(self):
+        index = KnowledgeIndex(lambda: None)
+        self.assertIsNone(index.query(np.ones(16), n_results=3))
+        self.assertIsNone(index.get_where({"intent": "intent_0"}))
+        self.assertFalse(index.get_stats()["loaded"])
+
+    def test_dimension_mismatch_returns_none(self):
+        self.assertIsNone(self.index.query(np.ones(8), n_results=3))
+
+    def test_loads_once_and_reloads_after_invalidate(self):
+        query = _unit_rows(self.rng, 1, 16)[0]
+        self.index.query(query, n_results=3)
+        self.index.get_where({"language": "en"})
+        self.assertEqual(self.collection.get_calls, 1)
+
+        # Knowledge upsert: the nearest document changes
+        self.collection.embeddings[0] = query
+        self.assertNotEqual(self.index.query(query, n_results=1)[0][0], "doc 0")
+        self.index.invalidate()
+        self.assertEqual(self.index.query(query, n_results=1)[0][0], "doc 0")
+        self.assertEqual(self.collection.get_calls, 2)
+        self.assertTrue(self.index.get_stats()["loaded"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import random
+import unittest
+
+from utils.phrase_matcher import PhraseMatcher
+
+CATEGORIES = {
+    "restaurant": ["מסעדה", "תפריט", "restaurant", "menu", "bar"],
+    "business": ["עסק", "מסעדה", "business", "restaurant"],   # Phrases shared with restaurant
+    "correction": ["לא", "לא נכון", "no", "not", "that's not"],  # Phrases nested in each other
+    "hebrew_only": ["שלום", "תודה"],
+    "mixed": ["בוט ai", "chatbot לעסק"],                        # Non-ASCII phrases containing ASCII
+}
+
+
+def _reference_scan(text, categories=CATEGORIES):
+    """The substring checks the automaton replaced: any(phrase in text) per category"""
+    return frozenset(
+        category for category, phrases in categories.items()
+        if any(phrase in text for phrase in phrases)
+    )
+
+
+def _random_texts(count, seed=11):
+    """Texts mixing whole phrases, phrase fragments and filler in both scripts"""
+    rng = random.Random(seed)
+    phrases = [phrase for phrases in CATEGORIES.values() for phrase in phrases]
+    fragments = [phrase[:rng.randint(1, len(phrase))] for phrase in phrases]
+    filler = ["hello", "אני", "רוצה", "price", "?", " ", "123", "ai", "עס", "ב", "n", "o"]
+    texts = []
+    for _ in range(count):
+        pieces = rng.choices(phrases + fragments + filler * 3, k=rng.randint(0, 6))
+        texts.append(rng.choice(["", " "]).join(pieces))
+    return texts
+
+
+class PhraseMatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.matcher = PhraseMatcher(CATEGORIES)
+
+    def _assert_matches_reference(self, text):
+        expected = _reference_scan(text)
+        self.assertEqual(self.matcher.scan(text), expected)
+        self.assertEqual(self.matcher.matches(text), bool(expected))
+        for category in CATEGORIES:
+            self.assertEqual(self.matcher.matches(text, category), category in expected, category)
+
+    def test_examples_match_substring_semantics(self):
+        texts = [
+            "יש לי מסעדה",                    # Shared phrase -> both categories
+            "i own a restaurant",             # ASCII text, shared phrase
+            "that's not what i meant",        # Nested ASCII phrases
+            "לא נכון, זה עסק",                 # Nested Hebrew phrases
+            "menubar",                        # Overlapping ASCII matches
+            "שלום, what's on the menu?",      # Mixed script
+            "i want a chatbot לעסק",          # Mixed-script phrase
+            "בוט ai",
+            "ai bot",                         # ASCII text - mixed phrases can't match
+            "barely",                         # Substring inside a longer word still counts
+            "xyz",                            # Shares no first character with the vocabulary
+            "",
+        ]
+        for text in texts:
+            with self.subTest(text=text):
+                self._assert_matches_reference(text)
+
+    def test_random_texts_match_substring_semantics(self):
+        for text in _random_texts(500):
+            with self.subTest(text=text):
+                self._assert_matches_reference(text)
+
+    def test_ascii_text_uses_the_ascii_automaton(self):
+        self.assertIs(self.matcher._automaton_for("my restaurant menu"), self.matcher._ascii_automaton)
+        self.assertIs(self.matcher._automaton_for("my מסעדה menu"), self.matcher._automaton)
+
+    def test_hebrew_only_vocabulary_has_no_ascii_automaton(self):
+        matcher = PhraseMatcher({"greeting": ["שלום", "תודה"]})
+        self.assertIsNone(matcher._ascii_automaton)
+        self.assertEqual(matcher.scan("shalom"), frozenset())
+        self.assertFalse(matcher.matches("thanks"))
+        self.assertEqual(matcher.scan("שלום"), frozenset({"greeting"}))
+
+    def test_first_char_prefilter_skips_unrelated_text(self):
+        self.assertIsNone(self.matcher._automaton_for("xyz 42"))
+        self.assertEqual(self.matcher.scan("xyz 42"), frozenset())
+
+    def test_matches_batch(self):
+        texts = _random_texts(50, seed=3)
+        for category in (None, *CATEGORIES):
+            with self.subTest(category=category):
+                expected = [
+                    bool(_reference_scan(text)) if category is None else category in _reference_scan(text)
+                    for text in texts
+                ]
+                self.assertEqual(self.matcher.matches_batch(texts, category).tolist(), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import itertools
+import unittest
+
+from services.chat_service import ChatService, _PMF_TABLE
+
+
+def _reference_product_market_fit(direct_buying, conversion, positive, use_case, business_type):
+    """The product-market fit expression as originally written in _detect_product_market_fit"""
+    return (
+        direct_buying or
+        (conversion and positive and (use_case or business_type)) or
+        (positive and use_case and business_type and conversion)
+    )
+
+
+class ProductMarketFitTableTest(unittest.TestCase):
+
+    def test_table_matches_original_expression(self):
+        self.assertEqual(len(_PMF_TABLE), 32)
+        for flags in itertools.product((False, True), repeat=5):
+            index = sum(flag << shift for flag, shift in zip(flags, (4, 3, 2, 1, 0)))
+            with self.subTest(flags=flags):
+                self.assertEqual(bool(_PMF_TABLE[index]), bool(_reference_product_market_fit(*flags)))
+
+
+class DetectProductMarketFitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.service = ChatService.__new__(ChatService)
+        # Positive engagement in the previous user turn, with a stated use case
+        self.engaged = {"history": [{"role": "user", "content": "amazing!"}, {"role": "assistant", "content": "..."}],
+                        "turn_count": 3, "last_positive_engagement_turn": 2, "specific_use_case": "bookings"}
+
+    def test_direct_buying_intent_always_fits(self):
+        self.assertTrue(self.service._detect_product_market_fit("I want to buy this", {}))
+        self.assertTrue(self.service._detect_product_market_fit("אני רוצה לקנות", {}))
+
+    def test_conversion_signal_needs_engagement_and_context(self):
+        self.assertFalse(self.service._detect_product_market_fit("how do we start?", {}))
+        self.assertTrue(self.service._detect_product_market_fit("how do we start?", self.engaged))
+
+    def test_stale_engagement_does_not_count(self):
+        stale = dict(self.engaged, last_positive_engagement_turn=0)
+        self.assertFalse(self.service._detect_product_market_fit("how do we start?", stale))
+
+    def test_information_request_is_not_a_conversion_signal(self):
+        self.assertFalse(self.service._detect_product_market_fit("what's the process? give me examples", self.engaged))
+
+
+if __name__ == "__main__":
+    unittest.main()
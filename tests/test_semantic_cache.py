@@ -0,0 +1,170 @@
+import time
+import unittest
+
+import numpy as np
+
+from services.semantic_cache import SemanticCache
+
+
+def _unit(*components):
+    vector = np.asarray(components, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class _FakeEmbedder:
+    """Embedding function over a fixed question -> vector table"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return self.vectors[text]
+
+
+class SemanticCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.embedder = _FakeEmbedder({
+            "what is the price": _unit(1, 0, 0),
+            "how much does it cost": _unit(0.97, 0.24, 0),   # cos ~0.97 to the first
+            "how does it work": _unit(0.8, 0.6, 0),          # cos 0.8 to the first
+            "unrelated": _unit(0, 0, 1),
+            "zero": np.zeros(3),
+        })
+
+    def _cache(self, **kwargs):
+        return SemanticCache(self.embedder, **kwargs)
+
+    def test_paraphrase_above_threshold_hits(self):
+        cache = self._cache(threshold=0.92)
+        cache.set("what is the price", "600 NIS")
+        self.assertEqual(cache.get("how much does it cost"), "600 NIS")
+
+    def test_below_threshold_misses(self):
+        cache = self._cache(threshold=0.92)
+        cache.set("what is the price", "600 NIS")
+        self.assertIsNone(cache.get("how does it work"))
+        self.assertIsNone(cache.get("unrelated"))
+
+    def test_threshold_is_inclusive_of_exact_match(self):
+        cache = self._cache(threshold=1.0 - 1e-6)
+        cache.set("what is the price", "600 NIS")
+        self.assertEqual(cache.get("what is the price"), "600 NIS")
+        self.assertIsNone(cache.get("how much does it cost"))
+
+    def test_best_match_wins(self):
+        cache = self._cache(threshold=0.5)
+        cache.set("how does it work", "process")
+        cache.set("what is the price", "600 NIS")
+        self.assertEqual(cache.get("how much does it cost"), "600 NIS")
+
+    def test_namespace_isolation(self):
+        cache = self._cache()
+        cache.set("what is the price", "600 ש\"ח", namespace="he")
+        self.assertIsNone(cache.get("what is the price", namespace="en"))
+        self.assertEqual(cache.get("what is the price", namespace="he"), "600 ש\"ח")
+
+        cache.set("what is the price", "600 NIS", namespace="en")
+        self.assertEqual(cache.get("how much does it cost", namespace="en"), "600 NIS")
+        self.assertEqual(cache.get("how much does it cost", namespace="he"), "600 ש\"ח")
+
+    def test_ttl_expires_entries(self):
+        cache = self._cache(ttl_seconds=60)
+        cache.set("what is the price", "600 NIS")
+        self.assertEqual(cache.get("what is the price"), "600 NIS")
+
+        cache._created[:cache._size] -= 61  # Age the entry past its lifetime
+        self.assertIsNone(cache.get("what is the price"))
+
+    def test_no_ttl_keeps_entries(self):
+        cache = self._cache()
+        cache.set("what is the price", "600 NIS")
+        cache._created[:cache._size] = time.time() - 365 * 24 * 3600
+        self.assertEqual(cache.get("what is the price"), "600 NIS")
+
+    def test_oldest_row_is_overwritten(self):
+        cache = self._cache(max_size=2, threshold=0.99)
+        cache.set("what is the price", "price")
+        cache.set("how does it work", "process")
+        cache.set("unrelated", "other")
+        self.assertIsNone(cache.get("what is the price"))
+        self.assertEqual(cache.get("how does it work"), "process")
+        self.assertEqual(cache.get("unrelated"), "other")
+
+    def test_zero_vector_is_not_cached(self):
+        cache = self._cache()
+        cache.set("zero", "nothing")
+        self.assertEqual(cache.get_stats()["entries"], 0)
+
+    def test_miss_then_set_embeds_once(self):
+        cache = self._cache()
+        cache.set("unrelated", "other")
+        calls = self.embedder.calls
+        self.assertIsNone(cache.get("what is the price"))
+        cache.set("what is the price", "600 NIS")
+        self.assertEqual(self.embedder.calls, calls + 1)
+
+    def test_clear(self):
+        cache = self._cache()
+        cache.set("what is the price", "600 NIS")
+        cache.clear()
+        self.assertIsNone(cache.get("what is the price"))
+        self.assertEqual(cache.get_stats()["entries"], 0)
+
+
+class SemanticCacheLSHTest(unittest.TestCase):
+    """The LSH prefilter against the full scan it replaces for large caches"""
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        base = rng.standard_normal((600, 32)).astype(np.float32)
+        self.vectors = {f"q{i}": vector for i, vector in enumerate(base)}
+        # Paraphrases: small perturbations of a cached question (cosine well above the threshold)
+        for i in range(0, 600, 20):
+            self.vectors[f"p{i}"] = base[i] + 0.05 * rng.standard_normal(32).astype(np.float32)
+        self.embedder = lambda text: self.vectors[text]
+
+    def _filled(self, **kwargs):
+        cache = SemanticCache(self.embedder, max_size=1000, threshold=0.9, **kwargs)
+        for i in range(600):
+            cache.set(f"q{i}", i, namespace="he" if i % 2 else "en")
+        return cache
+
+    def test_lsh_finds_the_same_paraphrase_hits_as_the_full_scan(self):
+        full_scan = self._filled(lsh_min_size=10**6)
+        lsh = self._filled(lsh_min_size=100)
+        self.assertFalse(full_scan.get_stats()["lsh_active"])
+        self.assertTrue(lsh.get_stats()["lsh_active"])
+
+        for i in range(0, 600, 20):
+            namespace = "he" if i % 2 else "en"
+            with self.subTest(question=f"p{i}"):
+                self.assertEqual(full_scan.get(f"p{i}", namespace=namespace), i)
+                self.assertEqual(lsh.get(f"p{i}", namespace=namespace), i)
+
+    def test_lsh_never_returns_a_miss_as_a_hit(self):
+        lsh = self._filled(lsh_min_size=100)
+        self.vectors["far"] = -self.vectors["q0"]
+        self.assertIsNone(lsh.get("far"))
+
+    def test_overwritten_rows_leave_the_buckets(self):
+        cache = SemanticCache(self.embedder, max_size=100, threshold=0.9, lsh_min_size=50)
+        for i in range(150):
+            cache.set(f"q{i}", i)
+        indexed_rows = set().union(*(rows for table in cache._buckets for rows in table.values()))
+        self.assertEqual(indexed_rows, set(range(100)))
+        self.assertIsNone(cache.get("q10"))   # Overwritten by q110
+        self.assertEqual(cache.get("q110"), 110)
+
+    def test_small_cache_skips_lsh_state(self):
+        cache = SemanticCache(self.embedder, max_size=1000, threshold=0.9)  # Below the default lsh_min_size
+        cache.set("q1", 1)
+        self.assertIsNone(cache._planes)
+        self.assertFalse(any(cache._buckets))
+        self.assertEqual(cache.get("q1"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
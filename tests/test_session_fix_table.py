@@ -0,0 +1,53 @@
+import itertools
+import unittest
+
+from services.chat_service import ChatService, _SESSION_FIX_TABLE
+
+_LEAD_FLAGS = ("lead_collected", "interested_lead_pending", "lead_request_count",
+               "buying_intent_detected", "conversion_critical_moment")
+
+
+def _reference_validate_session_state(session):
+    """The original rule-by-rule _validate_session_state (rules 1-5)"""
+    if session.get("lead_collected") and session.get("interested_lead_pending"):
+        session.pop("interested_lead_pending", None)
+        session.pop("lead_request_count", None)
+    if session.get("lead_collected") and session.get("lead_request_count"):
+        session.pop("lead_request_count", None)
+    if session.get("lead_request_count") and not session.get("interested_lead_pending"):
+        session.pop("lead_request_count", None)
+    if session.get("buying_intent_detected") and not session.get("interested_lead_pending") and not session.get("lead_collected"):
+        session.pop("buying_intent_detected", None)
+    if session.get("lead_collected") and session.get("conversion_critical_moment"):
+        session.pop("conversion_critical_moment", None)
+
+
+class SessionFixTableTest(unittest.TestCase):
+
+    def setUp(self):
+        # _validate_session_state only touches the session it is given
+        self.service = ChatService.__new__(ChatService)
+
+    def test_table_has_every_signature(self):
+        self.assertEqual(len(_SESSION_FIX_TABLE), 32)
+
+    def test_matches_original_rules_for_every_flag_combination(self):
+        # Present-but-falsy values (False, 0) must behave like missing keys, as in the original
+        for values in itertools.product((None, False, True), (None, False, True), (None, 0, 2),
+                                        (None, False, True), (None, False, True)):
+            session = {key: value for key, value in zip(_LEAD_FLAGS, values) if value is not None}
+            session["history"] = []
+            expected = dict(session)
+            _reference_validate_session_state(expected)
+            with self.subTest(session=dict(session)):
+                self.service._validate_session_state(session)
+                self.assertEqual(session, expected)
+
+    def test_history_is_reset_when_not_a_list(self):
+        session = {"history": "oops"}
+        self.service._validate_session_state(session)
+        self.assertEqual(session["history"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
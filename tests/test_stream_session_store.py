@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+
+from services.stream_session_store import StreamSessionStore
+
+
+def _session(version, **state):
+    return {"stream_session_key": "k", "_history_version": version, **state}
+
+
+class StreamSessionStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self._tmp.name, "stream_sessions.db")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _store(self, **kwargs):
+        return StreamSessionStore(db_path=self.db_path, **kwargs)
+
+    def test_no_entry_returns_cookie(self):
+        cookie = _session(3)
+        self.assertIs(self._store().load("k", cookie), cookie)
+
+    def test_cross_worker(self):
+        # Two workers = two processes = two store instances over the same file
+        worker_a, worker_b = self._store(), self._store()
+        worker_a.save("k", _session(4, interested_lead_pending=True))
+
+        loaded = worker_b.load("k", _session(2))
+        self.assertEqual(loaded["_history_version"], 4)
+        self.assertTrue(loaded["interested_lead_pending"])
+
+    def test_stored_state_wins_over_older_cookie(self):
+        store = self._store()
+        store.save("k", _session(4))  # The streamed turn finished the lead flow
+        loaded = store.load("k", _session(2, interested_lead_pending=True))
+        self.assertNotIn("interested_lead_pending", loaded)
+
+    def test_stale_entry_never_rolls_back_newer_cookie(self):
+        worker_a, worker_b = self._store(), self._store()
+        worker_a.save("k", _session(4, interested_lead_pending=True))
+
+        # Another worker carried the state forward into the cookie, then the session moved on
+        newer_cookie = _session(6, lead_collected=True)
+        self.assertIs(worker_a.load("k", newer_cookie), newer_cookie)
+        # The stale entry is dropped on sight, so no later request on any worker can resurrect it
+        older_cookie = _session(2)
+        self.assertIs(worker_b.load("k", older_cookie), older_cookie)
+
+    def test_equal_version_uses_cookie(self):
+        store = self._store()
+        store.save("k", _session(4, history=["streamed"]))
+        cookie = _session(4, history=["cookie"])
+        self.assertIs(store.load("k", cookie), cookie)
+
+    def test_save_never_replaces_newer_entry(self):
+        worker_a, worker_b = self._store(), self._store()
+        worker_a.save("k", _session(6, step="newer"))
+        worker_b.save("k", _session(4, step="older"))  # A slow worker finishing an older turn
+        self.assertEqual(worker_a.load("k", _session(0))["step"], "newer")
+
+    def test_discard_up_to_version(self):
+        store = self._store()
+        store.save("k", _session(6))
+        store.discard("k", 4)
+        self.assertEqual(store.load("k", _session(0))["_history_version"], 6)
+        store.discard("k", 6)
+        cookie = _session(0)
+        self.assertIs(store.load("k", cookie), cookie)
+
+    def test_expired_entry_ignored(self):
+        store = self._store(ttl_seconds=-1)
+        store.save("k", _session(4))
+        cookie = _session(0)
+        self.assertIs(store.load("k", cookie), cookie)
+
+    def test_keys_are_isolated(self):
+        store = self._store()
+        store.save("k", _session(4, owner="k"))
+        cookie = _session(0)
+        self.assertIs(store.load("other", cookie), cookie)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 import re
+import time
 import logging
 
 logger = logging.getLogger(__name__)
@@ -83,7 +84,7 @@ def format_lead_notification(lead_text):
 💬 Original Message:
 {lead_text}
 
-⏰ Timestamp: {logger.handlers[0].formatter.formatTime(logger.makeRecord('', 0, '', 0, '', (), None)) if logger.handlers else 'Unknown'}
+⏰ Timestamp: {time.strftime('%Y-%m-%d %H:%M:%S')}
 
 ---
 This lead was automatically detected by the Atarize chatbot.
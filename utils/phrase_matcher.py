@@ -0,0 +1,86 @@
+import logging
+import ahocorasick
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class PhraseMatcher:
+    """
+    Multi-category substring matcher backed by a single Aho-Corasick automaton.
+    One linear pass over the text reports every category that has a matching phrase.
+    """
+
+    def __init__(self, categories):
+        """
+        Build the automaton.
+
+        Args:
+            categories: Mapping of category name -> iterable of phrases (matched as plain substrings)
+        """
+        # A phrase may belong to several categories (e.g. "מסעדה" is both business and restaurant)
+        phrase_tags = {}
+        for category, phrases in categories.items():
+            for phrase in phrases:
+                phrase_tags.setdefault(phrase, set()).add(category)
+
+        self.categories = tuple(categories)
+        # Every match starts with one of these characters - text sharing none of them cannot match
+        self._first_chars = frozenset(phrase[0] for phrase in phrase_tags if phrase)
+        self._automaton = self._build_automaton(phrase_tags)
+        # Pure-ASCII text (English) can only match ASCII phrases - scan it with the smaller automaton
+        ascii_tags = {phrase: tags for phrase, tags in phrase_tags.items() if phrase.isascii()}
+        self._ascii_automaton = self._build_automaton(ascii_tags) if ascii_tags else None
+
+        logger.debug(f"[PHRASE_MATCHER] Built automaton: {len(phrase_tags)} phrases, {len(self.categories)} categories")
+
+    @staticmethod
+    def _build_automaton(phrase_tags):
+        automaton = ahocorasick.Automaton()
+        for phrase, tags in phrase_tags.items():
+            automaton.add_word(phrase, frozenset(tags))
+        automaton.make_automaton()
+        return automaton
+
+    def _automaton_for(self, text):
+        """Pick the automaton for text (None when nothing can match)"""
+        if self._first_chars.isdisjoint(text):
+            return None
+        if text.isascii():  # O(1) in CPython
+            return self._ascii_automaton
+        return self._automaton
+
+    def scan(self, text):
+        """Return the frozenset of categories with at least one phrase occurring in text"""
+        automaton = self._automaton_for(text)
+        if automaton is None:
+            return frozenset()
+        found = set()
+        for _, tags in automaton.iter(text):
+            found |= tags
+            if len(found) == len(self.categories):
+                break
+        return frozenset(found)
+
+    def matches(self, text, category=None):
+        """Check whether any phrase (optionally of one category) occurs in text"""
+        automaton = self._automaton_for(text)
+        if automaton is None:
+            return False
+        if category is None:
+            return next(automaton.iter(text), None) is not None
+        return any(category in tags for _, tags in automaton.iter(text))
+
+    def matches_batch(self, texts, category=None):
+        """
+        Convenience wrapper for offline analytics / replay jobs: calls matches() once per text
+        and collects the flags into a numpy array (not vectorized - the loop runs in Python).
+
+        Args:
+            texts: Iterable of already-lowered texts (e.g. every user message of many sessions)
+            category: Optional category to test for
+
+        Returns:
+            Boolean numpy array, one flag per text
+        """
+        texts = list(texts)
+        return np.fromiter((self.matches(text, category) for text in texts), dtype=bool, count=len(texts))
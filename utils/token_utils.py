@@ -1,19 +1,45 @@
 import tiktoken
 import logging
+import queue
+import threading
+from functools import lru_cache
 from config.settings import Config
 
 logger = logging.getLogger(__name__)
 
-def count_tokens(messages, model="gpt-4-turbo"):
-    """Count tokens in messages using tiktoken"""
+# Background token logging: requests enqueue their prompt, one daemon thread tokenizes and logs
+_TOKEN_LOG_QUEUE_SIZE = 256
+_token_log_queue = queue.Queue(maxsize=_TOKEN_LOG_QUEUE_SIZE)
+_token_log_worker = None
+_token_log_worker_lock = threading.Lock()
+
+@lru_cache(maxsize=4)
+def _get_encoding(model):
+    """Tokenizer for a model, loaded once per process (None if it can't be loaded - not retried)"""
     try:
         if model.startswith("gpt-4"):
             # Both gpt-4 and gpt-4-turbo use the same encoding
-            encoding = tiktoken.encoding_for_model("gpt-4")
-        elif model.startswith("gpt-3.5"):
-            encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
-        else:
-            encoding = tiktoken.get_encoding("cl100k_base")  # Default
+            return tiktoken.encoding_for_model("gpt-4")
+        if model.startswith("gpt-3.5"):
+            return tiktoken.encoding_for_model("gpt-3.5-turbo")
+        return tiktoken.get_encoding("cl100k_base")  # Default
+    except Exception as e:
+        logger.error(f"[TOKEN_COUNT] Failed to load tokenizer for {model}: {e}")
+        return None
+
+def estimate_text_tokens(text, model="gpt-4-turbo"):
+    """Token count of one text, falling back to the ~4 chars per token rule if the tokenizer is unavailable"""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+def count_tokens(messages, model="gpt-4-turbo"):
+    """Count tokens in messages using tiktoken"""
+    try:
+        encoding = _get_encoding(model)
+        if encoding is None:
+            return 0
         
         total_tokens = 0
         for message in messages:
@@ -28,9 +54,10 @@ def count_tokens(messages, model="gpt-4-turbo"):
         logger.error(f"[TOKEN_COUNT] Error counting tokens: {e}")
         return 0
 
-def log_token_usage(messages, model="gpt-4-turbo"):
-    """Log token usage with warnings if approaching limits"""
-    token_count = count_tokens(messages, model)
+def log_token_usage(messages, model="gpt-4-turbo", token_count=None):
+    """Log token usage with warnings if approaching limits (pass token_count if it was already counted)"""
+    if token_count is None:
+        token_count = count_tokens(messages, model)
     limit = Config.GPT4_TOKEN_LIMIT if model.startswith("gpt-4") else Config.GPT35_TOKEN_LIMIT
     
     logger.debug(f"[TOKEN_USAGE] 📏 Token count: {token_count}")
@@ -47,4 +74,45 @@ def log_token_usage(messages, model="gpt-4-turbo"):
     else:
         logger.debug(f"[TOKEN_USAGE] ✅ Token usage OK")
     
-    return token_count
\ No newline at end of file
+    return token_count
+
+def _token_log_loop():
+    while True:
+        messages, model = _token_log_queue.get()
+        try:
+            log_token_usage(messages, model)
+        except Exception as e:
+            logger.error(f"[TOKEN_USAGE] Background token logging failed: {e}")
+
+def log_token_usage_async(messages, model="gpt-4-turbo"):
+    """
+    Queue a prompt for log_token_usage on a background thread, keeping tokenization
+    off the request's latency path. Drops the entry if the queue is full.
+    """
+    global _token_log_worker
+    if _token_log_worker is None:
+        with _token_log_worker_lock:
+            if _token_log_worker is None:
+                _token_log_worker = threading.Thread(target=_token_log_loop, name="token-logger", daemon=True)
+                _token_log_worker.start()
+    try:
+        # Snapshot the list - callers may keep appending to theirs
+        _token_log_queue.put_nowait((list(messages), model))
+    except queue.Full:
+        logger.debug("[TOKEN_USAGE] Token log queue full - skipping entry")
+
+def log_completion_usage(completion, model="gpt-4-turbo"):
+    """Log token usage reported by the OpenAI response (no local tokenization needed)"""
+    usage = getattr(completion, "usage", None)
+    if usage is None:
+        return None
+    
+    limit = Config.GPT4_TOKEN_LIMIT if model.startswith("gpt-4") else Config.GPT35_TOKEN_LIMIT
+    logger.debug(f"[TOKEN_USAGE] 📏 {model}: prompt={usage.prompt_tokens}, completion={usage.completion_tokens}, total={usage.total_tokens}")
+    
+    if usage.prompt_tokens > limit * 0.9:  # 90% of limit
+        logger.warning(f"[TOKEN_USAGE] ⚠️  WARNING: Approaching token limit! ({usage.prompt_tokens}/{limit})")
+    elif usage.prompt_tokens > limit * 0.7:  # 70% of limit
+        logger.warning(f"[TOKEN_USAGE] 🔶 CAUTION: High token usage ({usage.prompt_tokens}/{limit})")
+    
+    return usage.total_tokens
@@ -3,54 +3,44 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-def detect_buying_intent(text):
-    """Detect when user shows clear buying/purchase intent"""
-    text_lower = text.lower().strip()
-    
-    # Direct buying/purchase intent patterns (VERY specific to avoid false positives)
-    buying_patterns = [
-        # Hebrew buying intent - ONLY direct commitment phrases
-        "אני רוצה לקנות", "רוצה לקנות", "רוצה לרכוש", "אני רוצה לרכוש",
-        "אני רוצה להזמין", "רוצה להזמין", "רוצה את השירות", "רוצה בוט",
-        "אני רוצה להתחיל", "רוצה להתחיל", "איך אפשר להתחיל", "איך מתחילים",
-        "אני רוצה לעשות בוט", "רוצה לעשות בוט", "אני מעוניינת לקנות", "מעוניינת לקנות",
-        # 🔧 QA FIX: Additional Hebrew buying intent patterns
-        "אני רוצה להמשיך", "רוצה להמשיך", "בואו נתחיל", "בואו נמשיך",
-        "אני מוכן להתחיל", "מוכנה להתחיל", "יש לי כבר את המחירים", "אני כבר יודע את המחיר",
-        
-        # English buying intent - ONLY direct commitment phrases  
-        "i want to buy", "want to buy", "want to purchase", "i want to purchase",
-        "i want to order", "want to order", "want your service", "want a bot",
-        "i want to get started", "how do i get started", "how to get started",
-        "i want to create a bot", "want to create a bot", "hello, i want to buy",
-        "i want to buy a chatbot", "want to buy a chatbot", "want a chatbot",
-        # 🔧 QA FIX: Additional English buying intent patterns
-        "i want to proceed", "want to proceed", "let's move forward", "let's get started",
-        "i'm ready to start", "ready to start", "i already know your pricing", "i know the pricing",
-        "let's do this", "i'm ready", "ready to proceed", "want to move forward"
-    ]
-    
-    # Check for buying intent patterns FIRST
-    has_buying_intent = any(pattern in text_lower for pattern in buying_patterns)
+# Direct buying/purchase intent patterns (VERY specific to avoid false positives)
+_BUYING_INTENT_PATTERNS = (
+    # Hebrew buying intent - ONLY direct commitment phrases
+    "אני רוצה לקנות", "רוצה לקנות", "רוצה לרכוש", "אני רוצה לרכוש",
+    "אני רוצה להזמין", "רוצה להזמין", "רוצה את השירות", "רוצה בוט",
+    "אני רוצה להתחיל", "רוצה להתחיל", "איך אפשר להתחיל", "איך מתחילים",
+    "אני רוצה לעשות בוט", "רוצה לעשות בוט", "אני מעוניינת לקנות", "מעוניינת לקנות",
+    # 🔧 QA FIX: Additional Hebrew buying intent patterns
+    "אני רוצה להמשיך", "רוצה להמשיך", "בואו נתחיל", "בואו נמשיך",
+    "אני מוכן להתחיל", "מוכנה להתחיל", "יש לי כבר את המחירים", "אני כבר יודע את המחיר",
+    
+    # English buying intent - ONLY direct commitment phrases
+    "i want to buy", "want to buy", "want to purchase", "i want to purchase",
+    "i want to order", "want to order", "want your service", "want a bot",
+    "i want to get started", "how do i get started", "how to get started",
+    "i want to create a bot", "want to create a bot", "hello, i want to buy",
+    "i want to buy a chatbot", "want to buy a chatbot", "want a chatbot",
+    # 🔧 QA FIX: Additional English buying intent patterns
+    "i want to proceed", "want to proceed", "let's move forward", "let's get started",
+    "i'm ready to start", "ready to start", "i already know your pricing", "i know the pricing",
+    "let's do this", "i'm ready", "ready to proceed", "want to move forward"
+)
+_BUYING_INTENT_RE = re.compile("|".join(map(re.escape, _BUYING_INTENT_PATTERNS)))
+
+def detect_buying_intent(text, text_lower=None):
+    """
+    Detect when user shows clear buying/purchase intent.
+    Pass text_lower when the caller already has the lowercased text.
+    """
+    if text_lower is None:
+        text_lower = text.lower()
     
-    # If buying intent is detected, return True regardless of other patterns
+    # Buying intent wins regardless of other content
     # This handles cases like "אני רוצה לקנות את הבוט. כמה זה עולה?"
-    if has_buying_intent:
+    if _BUYING_INTENT_RE.search(text_lower):
         logger.info(f"[BUYING_INTENT] ✅ Detected buying intent in: '{text}'")
         return True
     
-    # Only check exclusion patterns if NO buying intent was found
-    exclude_patterns = [
-        "רק רוצה מידע", "רק רוצה לדעת", "רק רוצה להבין", "רוצה לשמוע",
-        "מעוניין לשמוע", "כמה זה עולה", "מה המחיר", "מה העלות",
-        "just want info", "just want to know", "just want to understand", "want to hear",
-        "interested to hear", "how much does it cost", "what's the price", "pricing"
-    ]
-    
-    has_exclusion = any(pattern in text_lower for pattern in exclude_patterns)
-    if has_exclusion:
-        return False
-    
     return False
 
 def detect_lead_info(text):